@@ -23,6 +23,7 @@ from qtpy.QtGui import QColor
 from qtpy.QtWidgets import QApplication
 
 from cnapy.cnadata import CnaData
+from cnapy.coloring import COLORMAPS, SCALES
 from cnapy.gui_elements.mainwindow import MainWindow
 from cnapy.legacy import try_matlab_engine, try_octave_engine
 
@@ -76,6 +77,7 @@ class CellNetAnalyzer:
 
     def set_model(self, model: cobra.Model):
         self.appdata.project.cobra_py_model = model
+        self.appdata.project.unused_metabolites = True
 
     def read_config(self):
         ''' Try to read data from cnapy-config.txt into appdata'''
@@ -155,6 +157,32 @@ class CellNetAnalyzer:
                 self.appdata.abs_tol = float(abs_tol)
             except (KeyError, NoOptionError):
                 print("Could not find abs_tol in cnapy-config.txt")
+            try:
+                painted_boxes = config_parser.get(
+                    'cnapy-config', 'painted_boxes')
+                self.appdata.painted_boxes = painted_boxes == "True"
+            except (KeyError, NoOptionError):
+                print("Could not find painted_boxes in cnapy-config.txt")
+            try:
+                tiles_on_disk = config_parser.get(
+                    'cnapy-config', 'tiles_on_disk')
+                self.appdata.tiles_on_disk = tiles_on_disk == "True"
+            except (KeyError, NoOptionError):
+                print("Could not find tiles_on_disk in cnapy-config.txt")
+            try:
+                heat_colormap = config_parser.get(
+                    'cnapy-config', 'heat_colormap')
+                if heat_colormap in COLORMAPS:
+                    self.appdata.heat_colormap = heat_colormap
+            except (KeyError, NoOptionError):
+                print("Could not find heat_colormap in cnapy-config.txt")
+            try:
+                heat_scale = config_parser.get(
+                    'cnapy-config', 'heat_scale')
+                if heat_scale in SCALES:
+                    self.appdata.heat_scale = heat_scale
+            except (KeyError, NoOptionError):
+                print("Could not find heat_scale in cnapy-config.txt")
         except NoSectionError:
             print("Could not find section cnapy-config in cnapy-config.txt")
 
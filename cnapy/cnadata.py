@@ -10,6 +10,10 @@ import pkg_resources
 from qtpy.QtCore import Qt
 from qtpy.QtGui import QColor
 
+from cnapy.core import load_scenario_into_model
+from cnapy.lp_cache import LPCache
+from cnapy.search_index import ModelSearchIndex
+
 
 class CnaData:
     ''' The application data '''
@@ -32,6 +36,10 @@ class CnaData:
         self.default_color = Qt.gray
         self.abs_tol = 0.0001
         self.rounding = 3
+        self.painted_boxes = False  # paint the reaction boxes instead of using widgets
+        self.tiles_on_disk = False  # keep the rendered map background tiles in the temp dir
+        self.heat_colormap = "green-red"
+        self.heat_scale = "linear"
         self.cna_path = ""
         self.selected_engine = None
         self.work_directory = str(os.path.join(
@@ -123,17 +131,13 @@ class ProjectData:
         self.modes: Dict[str, Tuple[float, float]] = []
         self.compute_color_type = 1
         self.meta_data = {}
+        self.lp_cache = LPCache()
+        self.search_index = ModelSearchIndex()
+        # set when reactions were removed or changed, metabolites may have become unused
+        self.unused_metabolites = True
 
     def load_scenario_into_model(self, model):
-        for x in self.scen_values:
-            try:
-                y = model.reactions.get_by_id(x)
-            except KeyError:
-                print('reaction', x, 'not found!')
-            else:
-                (vl, vu) = self.scen_values[x]
-                y.lower_bound = vl
-                y.upper_bound = vu
+        load_scenario_into_model(model, self.scen_values)
 
 
 def CnaMap(name):
@@ -0,0 +1,97 @@
+"""Vectorized heatmap and on/off coloring of flux values"""
+from typing import Callable, Dict, List, Tuple
+
+import numpy
+
+NO_VALUE = (numpy.nan, numpy.nan)
+
+
+def value_arrays(ids: List[str], scen_values: Dict, comp_values: Dict,
+                 rounding: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    '''
+    Lower and upper bounds of the values of the reactions in ids rounded to
+    rounding digits, scenario values take precedence over computed values.
+    Reactions without a value get NaN.
+    '''
+    bounds = numpy.array([_bounds(scen_values.get(k, comp_values.get(k, NO_VALUE)))
+                          for k in ids], dtype=float).reshape(len(ids), 2)
+    bounds = numpy.round(bounds, rounding)
+    return (bounds[:, 0], bounds[:, 1])
+
+
+def value_range(scen_values: Dict, comp_values: Dict) -> Tuple[float, float]:
+    '''Lowest and highest mean of all values, both include 0'''
+    means = numpy.array([_bounds(v) for v in scen_values.values()] +
+                        [_bounds(v) for v in comp_values.values()], dtype=float).reshape(-1, 2).mean(axis=1)
+    return (float(numpy.min(means, initial=0.0)), float(numpy.max(means, initial=0.0)))
+
+
+def _bounds(value) -> Tuple[float, float]:
+    if isinstance(value, (int, float)):
+        return (value, value)
+    return value
+
+
+def linear_scale(means: numpy.ndarray, low: float, high: float) -> numpy.ndarray:
+    '''positive means relative to high, negative means relative to low, in [-1, 1]'''
+    scaled = numpy.zeros(len(means))
+    pos = means > 0
+    neg = means < 0
+    scaled[pos] = means[pos] / high if high > 0 else 1.0
+    scaled[neg] = -means[neg] / low if low < 0 else -1.0
+    return numpy.clip(scaled, -1.0, 1.0)
+
+
+def log_scale(means: numpy.ndarray, low: float, high: float) -> numpy.ndarray:
+    '''like linear_scale on log(1 + |mean|), small values remain distinguishable'''
+    return linear_scale(numpy.sign(means) * numpy.log1p(numpy.abs(means)),
+                        -numpy.log1p(-low), numpy.log1p(high))
+
+
+def green_red(scaled: numpy.ndarray) -> numpy.ndarray:
+    '''white to green for positive, white to red for negative values'''
+    fade = 255 - numpy.rint(255 * numpy.abs(scaled))
+    rgb = numpy.full((len(scaled), 3), 255.0)
+    pos = scaled > 0
+    neg = scaled < 0
+    rgb[pos, 0] = fade[pos]
+    rgb[pos, 2] = fade[pos]
+    rgb[neg, 1] = fade[neg]
+    rgb[neg, 2] = fade[neg]
+    return rgb
+
+
+def blue_red(scaled: numpy.ndarray) -> numpy.ndarray:
+    '''diverging, white to red for positive, white to blue for negative values'''
+    fade = 255 - numpy.rint(255 * numpy.abs(scaled))
+    rgb = numpy.full((len(scaled), 3), 255.0)
+    pos = scaled > 0
+    neg = scaled < 0
+    rgb[pos, 1] = fade[pos]
+    rgb[pos, 2] = fade[pos]
+    rgb[neg, 0] = fade[neg]
+    rgb[neg, 1] = fade[neg]
+    return rgb
+
+
+SCALES: Dict[str, Callable] = {"linear": linear_scale, "log": log_scale}
+COLORMAPS: Dict[str, Callable] = {"green-red": green_red, "blue-red": blue_red}
+
+
+def pack_rgb(rgb: numpy.ndarray) -> numpy.ndarray:
+    '''one 0xffRRGGBB integer per row of rgb'''
+    rgb = rgb.astype(numpy.uint32)
+    return 0xff000000 | (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+
+def heat_colors(vl: numpy.ndarray, vu: numpy.ndarray, low: float, high: float,
+                colormap: str = "green-red", scale: str = "linear") -> numpy.ndarray:
+    '''packed RGB colors of the means of the bounds vl and vu'''
+    scaled = SCALES[scale]((vl + vu) / 2, low, high)
+    return pack_rgb(COLORMAPS[colormap](scaled))
+
+
+def onoff_colors(vl: numpy.ndarray, vu: numpy.ndarray) -> numpy.ndarray:
+    '''packed RGB colors, green where a flux is possible, red where it is 0'''
+    on = (vl < 0) | (vu > 0)
+    return numpy.where(on, numpy.uint32(0xff00ff00), numpy.uint32(0xffff0000))
@@ -1,14 +1,157 @@
 """UI independent computations"""
 
-from typing import Dict, Tuple
+from multiprocessing import Pool
+from typing import Dict, List, Tuple
 
 import cobra
 import numpy
 from cobra.util.array import create_stoichiometric_matrix
+from optlang.interface import OPTIMAL, UNBOUNDED
+from optlang.symbolics import Zero
 
 import efmtool_link.efmtool4cobra as efmtool4cobra
 import efmtool_link.efmtool_extern as efmtool_extern
 from cnapy.flux_vector_container import FluxVectorMemmap
+from cnapy.lp_cache import LPCache, LPSnapshot
+
+
+def load_scenario_into_model(model: cobra.Model, scen_values: Dict[str, Tuple[float, float]]):
+    for x in scen_values:
+        try:
+            y = model.reactions.get_by_id(x)
+        except KeyError:
+            print('reaction', x, 'not found!')
+        else:
+            (vl, vu) = scen_values[x]
+            y.lower_bound = vl
+            y.upper_bound = vu
+
+
+def fba(job, lp_cache: LPCache, snapshot: LPSnapshot,
+        objective: Dict[str, float] = None) -> cobra.Solution:
+    '''FBA job, optionally with the given objective coefficients instead of the model objective'''
+    lp = lp_cache.update(snapshot, objective)
+    key = lp_cache.key("fba")
+    solution = lp_cache.get(key)
+    if solution is None:
+        solution = lp.optimize()
+        lp_cache.put(key, solution)
+    return solution
+
+
+def pfba(job, lp_cache: LPCache, snapshot: LPSnapshot) -> cobra.Solution:
+    lp = lp_cache.update(snapshot)
+    key = lp_cache.key("pfba")
+    solution = lp_cache.get(key)
+    if solution is None:
+        solution = cobra.flux_analysis.pfba(lp)
+        lp_cache.put(key, solution)
+    return solution
+
+
+def fva(job, lp_cache: LPCache, snapshot: LPSnapshot, fraction_of_optimum=0.0,
+        reactions: List[str] = None) -> Dict[str, Tuple[float, float]]:
+    '''FVA job that reports the (min, max) values of each finished chunk of reactions
+
+    The chunks are distributed over cobra.Configuration().processes worker
+    processes. When reactions is given only these reactions are analysed.
+    With fraction_of_optimum > 0 the model objective is kept at that fraction
+    of its optimum, otherwise the objective is ignored.
+    '''
+    if fraction_of_optimum > 0:
+        lp = lp_cache.update(snapshot)
+    else:
+        lp = lp_cache.update(snapshot, objective={})
+    if reactions is None:
+        reactions = [r.id for r in lp.reactions]
+    key = lp_cache.key("fva", fraction_of_optimum, tuple(reactions))
+    result = lp_cache.get(key)
+    if result is not None:
+        job.report_partial_result(result)
+        return result
+
+    result = {}
+    with lp as lp:
+        if fraction_of_optimum > 0:
+            optimum = lp.slim_optimize(error_value=None)
+            if optimum is None:
+                raise cobra.exceptions.Infeasible("The scenario is infeasible")
+            constraint = lp.problem.Constraint(lp.objective.expression,
+                                               name="fva_fraction_of_optimum")
+            if lp.objective_direction == 'max':
+                constraint.lb = fraction_of_optimum * optimum
+            else:
+                constraint.ub = fraction_of_optimum * optimum
+            lp.add_cons_vars(constraint)
+        lp.objective = lp.problem.Objective(Zero, direction='max')
+        if lp.slim_optimize(error_value=None) is None:
+            raise cobra.exceptions.Infeasible("The scenario is infeasible")
+
+        processes = min(cobra.Configuration().processes, len(reactions))
+        chunk_size = max(1, min(50, len(reactions) // (8 * max(processes, 1))))
+        chunks = [reactions[i:i+chunk_size]
+                  for i in range(0, len(reactions), chunk_size)]
+        if processes > 1:
+            with Pool(processes, initializer=_fva_init_worker, initargs=(lp,)) as pool:
+                for values in pool.imap_unordered(_fva_worker_chunk, chunks):
+                    if job.is_cancelled():
+                        break
+                    result.update(values)
+                    job.report_partial_result(values)
+                    job.report_progress(len(result), len(reactions))
+        else:
+            for chunk in chunks:
+                if job.is_cancelled():
+                    break
+                values = _fva_chunk(lp, chunk)
+                result.update(values)
+                job.report_partial_result(values)
+                job.report_progress(len(result), len(reactions))
+
+    if not job.is_cancelled():
+        lp_cache.put(key, result)
+    return result
+
+
+_fva_model = None
+
+
+def _fva_init_worker(model: cobra.Model):
+    global _fva_model
+    _fva_model = model
+
+
+def _fva_worker_chunk(reactions: List[str]) -> Dict[str, Tuple[float, float]]:
+    return _fva_chunk(_fva_model, reactions)
+
+
+def _fva_chunk(model: cobra.Model, reactions: List[str]) -> Dict[str, Tuple[float, float]]:
+    '''Minimize and maximize each reaction, the model objective must be zero'''
+    result = {}
+    for r_id in reactions:
+        r = model.reactions.get_by_id(r_id)
+        model.solver.objective.set_linear_coefficients(
+            {r.forward_variable: 1, r.reverse_variable: -1})
+        model.solver.objective.direction = 'min'
+        vmin = _fva_value(model, -numpy.inf)
+        model.solver.objective.direction = 'max'
+        vmax = _fva_value(model, numpy.inf)
+        model.solver.objective.set_linear_coefficients(
+            {r.forward_variable: 0, r.reverse_variable: 0})
+        result[r_id] = (vmin, vmax)
+    return result
+
+
+def _fva_value(model: cobra.Model, unbounded_value: float) -> float:
+    model.slim_optimize()
+    status = model.solver.status
+    if status == OPTIMAL:
+        return model.solver.objective.value
+    elif status == UNBOUNDED:
+        return unbounded_value
+    else:
+        return numpy.nan
+
 
 def efm_computation(model: cobra.Model, scen_values: Dict[str, Tuple[float, float]], constraints: bool):
     stdf = create_stoichiometric_matrix(
@@ -0,0 +1,185 @@
+"""Storage and set operations for minimal cut sets"""
+from typing import Iterable, List
+
+import cobra
+import numpy
+import scipy.sparse
+
+from cnapy.flux_vector_container import FluxVectorContainer
+
+
+class CutSetContainer(FluxVectorContainer):
+    '''
+    Cut sets as the rows of a CSR matrix with one column per reaction that is 1
+    for the reactions of a cut set, so that they can be used like other modes.
+    values[k] is the value shown for the reaction of the k-th stored entry,
+    0 for a cut (removed) reaction. Cut sets that are added with extend while
+    a computation runs are collected and only merged into the matrix when it
+    is used.
+    '''
+
+    def __init__(self, matORfname, reac_id=None, values=None):
+        self._pending = []
+        if type(matORfname) is str:
+            l = numpy.load(matORfname)
+            shape = tuple(l['shape'])
+            mat = scipy.sparse.csr_matrix((numpy.ones(len(l['indices']), dtype=numpy.int8),
+                                           l['indices'], l['indptr']), shape=shape)
+            reac_id = list(l['reac_id'])
+            values = l['values']
+        else:
+            mat = scipy.sparse.csr_matrix(matORfname, dtype=numpy.int8)
+            mat.data[:] = 1
+        super().__init__(mat, reac_id)
+        if values is None:
+            values = numpy.zeros(mat.nnz, dtype=numpy.int8)
+        self.values = numpy.asarray(values, dtype=numpy.int8)
+        self.reac_idx = {r: i for (i, r) in enumerate(self.reac_id)}
+
+    @classmethod
+    def from_reactions(cls, mcs: Iterable[Iterable[str]], reac_id: List[str]):
+        '''container with the cut sets given as reaction ids, the columns are reac_id'''
+        container = cls(scipy.sparse.csr_matrix((0, len(reac_id))), list(reac_id))
+        container.extend(mcs)
+        return container
+
+    @classmethod
+    def from_triples(cls, reactions, cut_sets, values, reac_id: List[str]):
+        '''
+        container from the reaction index, cut set index and value of each entry,
+        the indices start at 0 and the cut sets are numbered consecutively
+        '''
+        reactions = numpy.asarray(reactions, dtype=numpy.int64).ravel()
+        cut_sets = numpy.asarray(cut_sets, dtype=numpy.int64).ravel()
+        values = numpy.asarray(values).ravel()
+        num_mcs = cut_sets.max() + 1 if len(cut_sets) > 0 else 0
+        order = numpy.lexsort((reactions, cut_sets))
+        indptr = numpy.zeros(num_mcs + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(cut_sets, minlength=num_mcs), out=indptr[1:])
+        mat = scipy.sparse.csr_matrix((numpy.ones(len(order), dtype=numpy.int8),
+                                       reactions[order], indptr), shape=(num_mcs, len(reac_id)))
+        return cls(mat, list(reac_id), values[order])
+
+    @property
+    def fv_mat(self):
+        if len(self._pending) > 0:
+            self._merge_pending()
+        return self._fv_mat
+
+    @fv_mat.setter
+    def fv_mat(self, mat):
+        self._fv_mat = mat
+        self._pending = []
+        self._by_reaction = None
+
+    def extend(self, mcs: Iterable[Iterable[str]]):
+        '''adds cut sets given as reaction ids'''
+        self._pending.extend(numpy.sort(numpy.array([self.reac_idx[r] for r in m], dtype=numpy.int32))
+                             for m in mcs)
+
+    def _merge_pending(self):
+        pending = self._pending
+        indptr = numpy.zeros(len(pending) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(m) for m in pending], out=indptr[1:])
+        indices = numpy.concatenate(pending) if len(pending) > 0 else numpy.zeros(0, dtype=numpy.int32)
+        added = scipy.sparse.csr_matrix((numpy.ones(len(indices), dtype=numpy.int8), indices, indptr),
+                                        shape=(len(pending), self._fv_mat.shape[1]))
+        self.fv_mat = scipy.sparse.vstack((self._fv_mat, added), format='csr')
+        self.values = numpy.concatenate((self.values, numpy.zeros(len(indices), dtype=numpy.int8)))
+
+    def __len__(self):
+        return self._fv_mat.shape[0] + len(self._pending)
+
+    def __getitem__(self, idx):
+        mat = self.fv_mat
+        (start, end) = (mat.indptr[idx], mat.indptr[idx+1])
+        return {self.reac_id[i]: int(v) for (i, v) in
+                zip(mat.indices[start:end].tolist(), self.values[start:end].tolist())}
+
+    def sizes(self) -> numpy.ndarray:
+        '''number of reactions in each cut set'''
+        return numpy.diff(self.fv_mat.indptr)
+
+    def containing(self, reaction: str) -> numpy.ndarray:
+        '''indices of the cut sets that contain reaction'''
+        by_reaction = self._columns()
+        col = self.reac_idx[reaction]
+        return by_reaction.indices[by_reaction.indptr[col]:by_reaction.indptr[col+1]]
+
+    def _columns(self) -> scipy.sparse.csc_matrix:
+        '''the matrix in CSC format with sorted row indices in each column'''
+        if self._by_reaction is None or self._by_reaction.shape[0] != len(self):
+            self._by_reaction = self.fv_mat.tocsc()
+            self._by_reaction.sort_indices()
+        return self._by_reaction
+
+    def subsets_of(self, reactions: Iterable[str]) -> numpy.ndarray:
+        '''indices of the cut sets that only consist of the given reactions'''
+        covered = self._count_in(reactions)
+        return numpy.flatnonzero(covered == self.sizes())
+
+    def supersets_of(self, reactions: Iterable[str]) -> numpy.ndarray:
+        '''indices of the cut sets that contain all the given reactions'''
+        reactions = set(reactions)
+        return numpy.flatnonzero(self._count_in(reactions) == len(reactions))
+
+    def _count_in(self, reactions: Iterable[str]) -> numpy.ndarray:
+        selected = numpy.zeros(self.fv_mat.shape[1], dtype=numpy.int32)
+        selected[[self.reac_idx[r] for r in set(reactions)]] = 1
+        return self.fv_mat @ selected
+
+    def minimal(self, chunk_rows=1000) -> numpy.ndarray:
+        '''
+        Boolean array that is False for the cut sets that contain another one
+        of the container and for the repetitions of a cut set
+        '''
+        mat = self.fv_mat.astype(numpy.int32)
+        by_reaction = self._columns()
+        sizes = self.sizes()
+        result = numpy.full(len(self), True, dtype=bool)
+        if mat.nnz == 0:
+            return result
+        # a cut set can only be contained in those with its least frequent reaction
+        frequency = numpy.diff(by_reaction.indptr)
+        row = numpy.repeat(numpy.arange(len(self)), sizes)
+        order = numpy.lexsort((frequency[mat.indices], row))
+        nonempty = numpy.flatnonzero(sizes > 0)
+        rarest = mat.indices[order[mat.indptr[nonempty]]]
+        groups = numpy.argsort(rarest, kind='stable')
+        bounds = numpy.flatnonzero(numpy.diff(rarest[groups])) + 1
+        for group in numpy.split(groups, bounds):
+            r = rarest[group[0]]
+            candidates = by_reaction.indices[by_reaction.indptr[r]:by_reaction.indptr[r+1]]
+            for start in range(0, len(group), chunk_rows):
+                subsets = nonempty[group[start:start+chunk_rows]]
+                common = (mat[subsets] @ mat[candidates].T).tocoo()
+                (sub, sup) = (subsets[common.row], candidates[common.col])
+                contained = (common.data == sizes[sub]) & (sub != sup) & \
+                    ((sizes[sub] < sizes[sup]) | (sub < sup))
+                result[sup[contained]] = False
+        return result
+
+    def disabled_by_genes(self, model: cobra.Model, genes: Iterable[str]) -> numpy.ndarray:
+        '''indices of the cut sets whose reactions are all switched off by knocking out the genes'''
+        with model as ko:
+            for g in genes:
+                ko.genes.get_by_id(g).knock_out()
+            disabled = [r.id for r in ko.reactions
+                        if r.lower_bound == 0 and r.upper_bound == 0 and r.id in self.reac_idx]
+        return self.subsets_of(disabled)
+
+    def save(self, fname):
+        mat = self.fv_mat
+        numpy.savez_compressed(fname, storage='cut_sets', indices=mat.indices, indptr=mat.indptr,
+                               shape=mat.shape, values=self.values, reac_id=self.reac_id)
+
+    def clear(self):
+        '''removes all cut sets, further ones can still be added'''
+        self.fv_mat = scipy.sparse.csr_matrix((0, len(self.reac_id)), dtype=numpy.int8)
+        self.values = numpy.zeros(0, dtype=numpy.int8)
+
+
+def is_cut_set_file(fname: str) -> bool:
+    '''whether fname was written by CutSetContainer.save'''
+    with numpy.load(fname) as l:
+        return 'storage' in l and str(l['storage']) == 'cut_sets'
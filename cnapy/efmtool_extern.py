@@ -34,7 +34,12 @@ if configParser.has_option('cnapy-config', 'cna_path'):
 else:
     efmtool_jar = r'E:\gwdg_owncloud\CNAgit\CellNetAnalyzer\code\ext\efmtool\lib\metabolic-efm-all.jar'
 
-def calculate_flux_modes(st : numpy.array, reversible, reaction_names=None, metabolite_names=None, java_executable=None):
+def calculate_flux_modes(st : numpy.array, reversible, reaction_names=None, metabolite_names=None, java_executable=None,
+                         memmap_fname=None) -> numpy.array:
+    # returns the EFMs as the columns of an array like read_efms_from_mat did; they are read chunk by chunk
+    # into a preallocated array or, if memmap_fname is given, into a memory map of which a transposed view is returned
+    # note that CNApy itself computes EFMs through efmtool_link.efmtool_extern (see cnapy.core.efm_computation)
+    # and opens the binary-doubles file with FluxVectorMemmap, this function is for use as a library
     if java_executable is None:
         java_executable = _java_executable
     if reaction_names is None:
@@ -55,7 +60,7 @@ def calculate_flux_modes(st : numpy.array, reversible, reaction_names=None, meta
             '-compression', 'default', '-log', 'console', '-level', 'INFO',
             '-maxthreads', '-1', '-normalize', 'min', '-adjacency-method', 'pattern-tree-minzero', 
             '-rowordering', 'MostZerosOrAbsLexMin', '-tmpdir', '.', '-stoich', 'stoich.txt', '-rev', 
-            'revs.txt', '-meta', 'mnames.txt', '-reac', 'rnames.txt', '-out', 'matlab', 'efms.mat'],
+            'revs.txt', '-meta', 'mnames.txt', '-reac', 'rnames.txt', '-out', 'binary-doubles', 'efms.bin'],
             stdout = subprocess.PIPE, stderr = subprocess.PIPE, universal_newlines=True)
             # might there be a danger of deadlock in case an error produces a large text output that blocks the pipe?
             while cp.poll() is None:
@@ -69,7 +74,7 @@ def calculate_flux_modes(st : numpy.array, reversible, reaction_names=None, meta
         
         os.chdir(curr_dir)
         if success:
-            efms = read_efms_from_mat(work_dir)
+            efms = read_efms_from_bin(os.path.join(work_dir, 'efms.bin'), memmap_fname).T
         else:
             print("Emftool failure")
             efms = None
@@ -85,6 +90,26 @@ def write_efmtool_input(st, reversible, reaction_names, metabolite_names):
     with open('rnames.txt', 'w') as file:
         file.write(' '.join('"' + x + '"' for x in reaction_names))
 
+def read_efms_from_bin(binary_doubles_file : str, memmap_fname=None, chunk_bytes=2**26) -> numpy.array:
+    # reads the efmtool binary-doubles format chunk by chunk, each EFM becomes a row of the result;
+    # the header consists of the number of EFMs (int64), the number of reactions (int32) and one further byte;
+    # a memory map holds the values big-endian like the efmtool file, without the header
+    with open(binary_doubles_file, 'rb') as fh:
+        num_efm = int(numpy.fromfile(fh, dtype='>i8', count=1)[0])
+        num_reac = int(numpy.fromfile(fh, dtype='>i4', count=1)[0])
+        fh.seek(13)
+        if memmap_fname is None:
+            efms = numpy.empty((num_efm, num_reac))
+        else:
+            efms = numpy.memmap(memmap_fname, mode='w+', dtype='>d', shape=(num_efm, num_reac))
+        chunk_rows = max(1, chunk_bytes // (8 * max(num_reac, 1)))
+        for start in range(0, num_efm, chunk_rows):
+            rows = min(chunk_rows, num_efm - start)
+            efms[start:start+rows, :] = numpy.fromfile(fh, dtype='>d', count=rows*num_reac).reshape(rows, num_reac)
+    if memmap_fname is not None:
+        efms.flush()
+    return efms
+
 def read_efms_from_mat(folder : str) -> numpy.array:
     # taken from https://gitlab.com/csb.ethz/efmtool/
     # efmtool stores the computed EFMs in one or more .mat files. This function
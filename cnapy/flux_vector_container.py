@@ -1,12 +1,129 @@
 import os
 import numpy
+import scipy.sparse
+
+# densities below which the sparse storages need less memory than the next denser one
+CSR_MAX_DENSITY = 1/32  # 32 bit column index per nonzero vs. 1 bit per entry
+PACKED_MAX_DENSITY = 0.9  # 1 bit per entry plus the values vs. the dense matrix
+# memory for the dense blocks that conversions and chunked passes work on
+CHUNK_BYTES = 2**27
+
+
+def rows_per_chunk(num_reac: int, max_memory=CHUNK_BYTES) -> int:
+    '''number of rows in a dense float64 block of at most max_memory bytes'''
+    return max(1, max_memory // (8 * max(num_reac, 1)))
+
+
+class PackedFluxVectors:
+    '''
+    Flux vectors stored as bit-packed support pattern with the nonzero values kept separately;
+    row_ptr[i]:row_ptr[i+1] are the values of row i
+    '''
+
+    def __init__(self, support, values, row_ptr, num_reac):
+        self.support = support
+        self.values = values
+        self.row_ptr = row_ptr
+        self.num_reac = int(num_reac)
+
+    @classmethod
+    def from_dense(cls, mat, dtype=numpy.float64, chunk_rows=100000):
+        support = []
+        values = []
+        counts = []
+        for start in range(0, mat.shape[0], chunk_rows):
+            chunk = numpy.asarray(mat[start:start+chunk_rows])
+            nz = chunk != 0
+            support.append(numpy.packbits(nz, axis=1))
+            values.append(chunk[nz].astype(dtype))
+            counts.append(numpy.count_nonzero(nz, axis=1))
+        row_ptr = numpy.zeros(mat.shape[0] + 1, dtype=numpy.int64)
+        if mat.shape[0] > 0:
+            numpy.cumsum(numpy.concatenate(counts), out=row_ptr[1:])
+            support = numpy.concatenate(support)
+            values = numpy.concatenate(values)
+        else:
+            support = numpy.zeros((0, (mat.shape[1] + 7) // 8), dtype=numpy.uint8)
+            values = numpy.zeros(0, dtype=dtype)
+        return cls(support, values, row_ptr, mat.shape[1])
+
+    @classmethod
+    def from_csr(cls, mat: scipy.sparse.csr_matrix, dtype=numpy.float64, chunk_rows=100000):
+        mat = mat.copy()
+        mat.sum_duplicates()  # also sorts the column indices
+        mat.eliminate_zeros()
+        support = numpy.zeros((mat.shape[0], (mat.shape[1] + 7) // 8), dtype=numpy.uint8)
+        for start in range(0, mat.shape[0], chunk_rows):
+            block = mat[start:start+chunk_rows]
+            nz = numpy.zeros(block.shape, dtype=bool)
+            nz[numpy.repeat(numpy.arange(block.shape[0]), numpy.diff(block.indptr)), block.indices] = True
+            support[start:start+block.shape[0]] = numpy.packbits(nz, axis=1)
+        return cls(support, mat.data.astype(dtype), mat.indptr.astype(numpy.int64), mat.shape[1])
+
+    def tocsr(self, dtype=numpy.float64, chunk_rows=100000) -> scipy.sparse.csr_matrix:
+        indices = numpy.zeros(len(self.values), dtype=numpy.int32)
+        for start in range(0, self.shape[0], chunk_rows):
+            nz = numpy.unpackbits(self.support[start:start+chunk_rows], axis=1,
+                                  count=self.num_reac).astype(bool)
+            (begin, end) = (self.row_ptr[start], self.row_ptr[min(start + chunk_rows, self.shape[0])])
+            indices[begin:end] = numpy.nonzero(nz)[1]
+        return scipy.sparse.csr_matrix((self.values.astype(dtype), indices, self.row_ptr.copy()),
+                                       shape=self.shape)
+
+    @property
+    def shape(self):
+        return (self.support.shape[0], self.num_reac)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def row(self, idx) -> numpy.array:
+        row = numpy.zeros(self.num_reac, dtype=self.values.dtype)
+        nz = numpy.unpackbits(self.support[idx], count=self.num_reac).astype(bool)
+        row[nz] = self.values[self.row_ptr[idx]:self.row_ptr[idx+1]]
+        return row
+
+    def nonzero(self, idx):
+        '''column indices and values of the nonzeros in row idx'''
+        nz = numpy.flatnonzero(numpy.unpackbits(self.support[idx], count=self.num_reac))
+        return nz, self.values[self.row_ptr[idx]:self.row_ptr[idx+1]]
+
+    def rows(self, idx) -> numpy.array:
+        '''dense matrix of the rows selected by idx (a slice or an index array)'''
+        if isinstance(idx, slice):
+            idx = numpy.arange(*idx.indices(self.shape[0]))
+        else:
+            idx = numpy.asarray(idx)
+        nz = numpy.unpackbits(self.support[idx], axis=1, count=self.num_reac).astype(bool)
+        starts = self.row_ptr[idx]
+        counts = self.row_ptr[idx + 1] - starts
+        # positions of the values of the selected rows in self.values
+        pos = numpy.repeat(starts - numpy.cumsum(counts) + counts, counts) + numpy.arange(counts.sum())
+        mat = numpy.zeros(nz.shape, dtype=self.values.dtype)
+        mat[nz] = self.values[pos]
+        return mat
+
+    def toarray(self) -> numpy.array:
+        return self.rows(slice(None))
 
 
 class FluxVectorContainer:
-    def __init__(self, matORfname, reac_id=None, irreversible=None, unbounded=None):
+    '''
+    The flux vectors are the rows of fv_mat which is either a dense numpy array (possibly a memmap),
+    a scipy.sparse.csr_matrix or a PackedFluxVectors object, see convert() for the available storages
+    '''
+
+    def __init__(self, matORfname, reac_id=None, irreversible=None, unbounded=None, storage=None):
         if type(matORfname) is str:
             l = numpy.load(matORfname)  # actually has got a memmap option
-            self.fv_mat = l['fv_mat']
+            if 'fv_mat' in l:
+                self.fv_mat = l['fv_mat']
+            elif l['storage'] == 'csr':
+                self.fv_mat = scipy.sparse.csr_matrix((l['data'], l['indices'], l['indptr']),
+                                                      shape=tuple(l['shape']))
+            else:
+                self.fv_mat = PackedFluxVectors(l['support'], l['values'], l['row_ptr'], l['shape'][1])
             self.reac_id = l['reac_id']
             self.irreversible = l['irreversible']
             self.unbounded = l['unbounded']
@@ -23,16 +140,165 @@ class FluxVectorContainer:
                 self.unbounded = numpy.array(0)
             else:
                 self.unbounded = unbounded
+        if storage is not None:
+            self.convert(storage)
 
     def __len__(self):
         return self.fv_mat.shape[0]
 
     def __getitem__(self, idx):
-        return{self.reac_id[i]: float(self.fv_mat[idx, i]) for i in range(len(self.reac_id)) if self.fv_mat[idx, i] != 0}
+        (nz, values) = self.nonzero(idx)
+        return {self.reac_id[i]: v for i, v in zip(nz.tolist(), values.tolist())}
+
+    def nonzero(self, idx):
+        '''column indices and values of the nonzeros of flux vector idx'''
+        if isinstance(self.fv_mat, PackedFluxVectors):
+            return self.fv_mat.nonzero(idx)
+        elif scipy.sparse.issparse(self.fv_mat):
+            start, end = self.fv_mat.indptr[idx], self.fv_mat.indptr[idx+1]
+            return self.fv_mat.indices[start:end], self.fv_mat.data[start:end]
+        else:
+            row = numpy.asarray(self.fv_mat[idx, :])
+            nz = numpy.nonzero(row)[0]
+            return nz, row[nz]
+
+    def row(self, idx) -> numpy.array:
+        '''The flux vector idx as dense array'''
+        if isinstance(self.fv_mat, numpy.ndarray):
+            return self.fv_mat[idx, :]
+        elif isinstance(self.fv_mat, PackedFluxVectors):
+            return self.fv_mat.row(idx)
+        else:
+            return self.fv_mat[idx, :].toarray()[0]
+
+    def rows(self, idx) -> numpy.array:
+        '''The flux vectors selected by idx (a slice or an index array) as dense matrix'''
+        if isinstance(self.fv_mat, PackedFluxVectors):
+            return self.fv_mat.rows(idx)
+        elif scipy.sparse.issparse(self.fv_mat):
+            return self.fv_mat[idx, :].toarray()
+        else:
+            return numpy.asarray(self.fv_mat[idx, :])
+
+    def rows_sparse(self, idx) -> scipy.sparse.csr_matrix:
+        '''The flux vectors selected by idx (a slice or an index array) as CSR matrix'''
+        if scipy.sparse.issparse(self.fv_mat):
+            return self.fv_mat[idx, :]
+        else:
+            return scipy.sparse.csr_matrix(self.rows(idx))
+
+    def chunks(self, chunk_rows=None, max_memory=CHUNK_BYTES):
+        '''
+        Iterates over (start, dense matrix) for consecutive blocks of flux vectors,
+        each with at most chunk_rows rows and max_memory bytes
+        '''
+        max_rows = rows_per_chunk(self.fv_mat.shape[1], max_memory)
+        chunk_rows = max_rows if chunk_rows is None else min(chunk_rows, max_rows)
+        for start in range(0, len(self), chunk_rows):
+            yield start, self.rows(slice(start, min(start + chunk_rows, len(self))))
+
+    def storage(self) -> str:
+        if isinstance(self.fv_mat, PackedFluxVectors):
+            return 'packed'
+        elif scipy.sparse.issparse(self.fv_mat):
+            return 'csr'
+        elif self.fv_mat.dtype == numpy.float32:
+            return 'float32'
+        else:
+            return 'dense'
+
+    def density(self) -> float:
+        if isinstance(self.fv_mat, PackedFluxVectors):
+            nnz = len(self.fv_mat.values)
+        elif scipy.sparse.issparse(self.fv_mat):
+            nnz = self.fv_mat.nnz
+        else:
+            chunk_rows = rows_per_chunk(self.fv_mat.shape[1])
+            nnz = sum(numpy.count_nonzero(self.fv_mat[i:i+chunk_rows])
+                      for i in range(0, self.fv_mat.shape[0], chunk_rows))
+        size = self.fv_mat.shape[0] * self.fv_mat.shape[1]
+        return nnz / size if size > 0 else 1.0
+
+    def convert(self, storage='auto'):
+        '''
+        Change the storage of fv_mat to one of
+        'dense': float64 numpy array
+        'float32': float32 numpy array
+        'csr': scipy.sparse.csr_matrix
+        'packed': PackedFluxVectors
+        'auto': 'csr' or 'packed' when they need less memory than a dense matrix, with
+                float32 values in all cases where this does not change the values
+        '''
+        if storage == 'auto':
+            density = self.density()
+            if density < CSR_MAX_DENSITY:
+                storage = 'csr'
+            elif density < PACKED_MAX_DENSITY:
+                storage = 'packed'
+            else:
+                storage = 'dense'
+            dtype = numpy.float32 if self._float32_is_lossless() else numpy.float64
+        elif storage == 'float32':
+            dtype = numpy.float32
+            storage = 'dense'
+        else:
+            dtype = numpy.float64
+
+        chunk_rows = rows_per_chunk(self.fv_mat.shape[1])
+        current = self.storage()
+        if current == 'float32':
+            current = 'dense'
+        if current == storage:
+            if self.fv_mat.dtype != dtype:
+                if storage == 'packed':
+                    self.fv_mat.values = self.fv_mat.values.astype(dtype)
+                elif storage == 'csr':
+                    self.fv_mat = self.fv_mat.astype(dtype)
+                else:
+                    self.fv_mat = numpy.asarray(self.fv_mat, dtype=dtype)
+        elif storage == 'dense':
+            self.fv_mat = numpy.asarray(self.fv_mat.toarray(), dtype=dtype)
+        elif storage == 'csr':
+            if current == 'packed':
+                self.fv_mat = self.fv_mat.tocsr(dtype=dtype, chunk_rows=chunk_rows)
+            else:
+                self.fv_mat = scipy.sparse.vstack(
+                    [scipy.sparse.csr_matrix(numpy.asarray(self.fv_mat[start:start+chunk_rows]), dtype=dtype)
+                     for start in range(0, max(len(self), 1), chunk_rows)], format='csr')
+        elif storage == 'packed':
+            if current == 'csr':
+                self.fv_mat = PackedFluxVectors.from_csr(self.fv_mat, dtype=dtype, chunk_rows=chunk_rows)
+            else:
+                self.fv_mat = PackedFluxVectors.from_dense(self.fv_mat, dtype=dtype, chunk_rows=chunk_rows)
+        else:
+            raise ValueError('unknown storage ' + str(storage))
+
+    def _float32_is_lossless(self) -> bool:
+        if isinstance(self.fv_mat, PackedFluxVectors):
+            values = self.fv_mat.values
+            return numpy.array_equal(values.astype(numpy.float32).astype(values.dtype), values)
+        elif scipy.sparse.issparse(self.fv_mat):
+            values = self.fv_mat.data
+            return numpy.array_equal(values.astype(numpy.float32).astype(values.dtype), values)
+        chunk_rows = rows_per_chunk(self.fv_mat.shape[1])
+        for i in range(0, self.fv_mat.shape[0], chunk_rows):
+            chunk = numpy.asarray(self.fv_mat[i:i+chunk_rows])
+            if not numpy.array_equal(chunk.astype(numpy.float32).astype(chunk.dtype), chunk):
+                return False
+        return True
 
     def save(self, fname):
-        numpy.savez_compressed(fname, fv_mat=self.fv_mat, reac_id=self.reac_id, irreversible=self.irreversible,
-                               unbounded=self.unbounded)
+        if isinstance(self.fv_mat, PackedFluxVectors):
+            numpy.savez_compressed(fname, storage='packed', support=self.fv_mat.support, values=self.fv_mat.values,
+                                   row_ptr=self.fv_mat.row_ptr, shape=self.fv_mat.shape, reac_id=self.reac_id,
+                                   irreversible=self.irreversible, unbounded=self.unbounded)
+        elif scipy.sparse.issparse(self.fv_mat):
+            numpy.savez_compressed(fname, storage='csr', data=self.fv_mat.data, indices=self.fv_mat.indices,
+                                   indptr=self.fv_mat.indptr, shape=self.fv_mat.shape, reac_id=self.reac_id,
+                                   irreversible=self.irreversible, unbounded=self.unbounded)
+        else:
+            numpy.savez_compressed(fname, fv_mat=self.fv_mat, reac_id=self.reac_id, irreversible=self.irreversible,
+                                   unbounded=self.unbounded)
 
     def clear(self):
         self.fv_mat = numpy.zeros((0, 0))
@@ -1,8 +1,8 @@
 """The central widget"""
 from ast import literal_eval as make_tuple
+from typing import Set
 
 import cobra
-from cobra.manipulation.delete import prune_unused_metabolites
 from qtconsole.inprocess import QtInProcessKernelManager
 from qtconsole.rich_jupyter_widget import RichJupyterWidget
 from qtpy.QtCore import Qt
@@ -15,7 +15,8 @@ from cnapy.gui_elements.metabolite_list import MetaboliteList
 from cnapy.gui_elements.modenavigator import ModeNavigator
 from cnapy.gui_elements.model_info import ModelInfo
 from cnapy.gui_elements.reactions_list import ReactionList
-from cnapy.utils import SignalThrottler
+from cnapy.utils import (ALL_CHANGES, COMP_VALUES, MAPS, MODE_VALUES, MODEL,
+                         MODES, SCENARIO, RefreshScheduler, SignalThrottler)
 
 
 class CentralWidget(QWidget):
@@ -33,6 +34,10 @@ class CentralWidget(QWidget):
         self.searchbar.textChanged.connect(self.throttler.throttle)
         self.throttler.triggered.connect(self.update_selected)
 
+        self.refresh_scheduler = RefreshScheduler()
+        self.refresh_scheduler.triggered.connect(self.refresh)
+        self.outdated_maps: Set[str] = set()
+
         self.tabs = QTabWidget()
         self.reaction_list = ReactionList(self.appdata)
         self.metabolite_list = MetaboliteList(self.appdata)
@@ -92,15 +97,17 @@ class CentralWidget(QWidget):
             self.handle_deleted_reaction)
         self.metabolite_list.metaboliteChanged.connect(
             self.handle_changed_metabolite)
+        self.console.executed.connect(self.handle_console_executed)
         self.metabolite_list.jumpToReaction.connect(self.jump_to_reaction)
         self.metabolite_list.computeInOutFlux.connect(self.in_out_fluxes)
         self.model_info.optimizationDirectionChanged.connect(
             self.handle_changed_optimization_direction)
         self.map_tabs.tabCloseRequested.connect(self.delete_map)
         self.mode_navigator.changedCurrentMode.connect(self.update_mode)
-        self.mode_navigator.modeNavigatorClosed.connect(self.update)
+        self.mode_navigator.modeNavigatorClosed.connect(
+            lambda: self.update(MODES, SCENARIO, COMP_VALUES))
 
-        self.update()
+        self.refresh(set(ALL_CHANGES), set())
 
     def fit_mapview(self):
         self.map_tabs.currentWidget().fit()
@@ -115,30 +122,39 @@ class CentralWidget(QWidget):
 
     def handle_changed_reaction(self, old_id: str, reaction: cobra.Reaction):
         self.parent.unsaved_changes()
+        self.appdata.project.unused_metabolites = True
+        self.appdata.project.lp_cache.invalidate()
+        self.appdata.project.search_index.update_reaction(reaction, old_id)
         for mmap in self.appdata.project.maps:
             if old_id in self.appdata.project.maps[mmap]["boxes"].keys():
                 self.appdata.project.maps[mmap]["boxes"][reaction.id] = self.appdata.project.maps[mmap]["boxes"].pop(
                     old_id)
 
-        # TODO update only relevant reaction boxes on maps
-        self.update_maps()
+        self.update_maps(reactions_changed=True)
 
     def handle_deleted_reaction(self, reaction: cobra.Reaction):
         self.appdata.project.cobra_py_model.remove_reactions(
             [reaction], remove_orphans=True)
+        self.appdata.project.lp_cache.invalidate()
+        self.appdata.project.unused_metabolites = True
+        self.appdata.project.search_index.remove_reaction(reaction.id)
 
         self.parent.unsaved_changes()
         for mmap in self.appdata.project.maps:
             if reaction.id in self.appdata.project.maps[mmap]["boxes"].keys():
                 self.appdata.project.maps[mmap]["boxes"].pop(reaction.id)
 
-        # TODO update only relevant reaction boxes on maps
-        self.update_maps()
+        self.update_maps(reactions_changed=True)
 
     def handle_changed_metabolite(self, old_id: str, metabolite: cobra.Metabolite):
         self.parent.unsaved_changes()
-        # TODO update only relevant reaction boxes on maps
-        self.update_maps()
+        self.appdata.project.lp_cache.invalidate()
+        self.appdata.project.search_index.update_metabolite(metabolite, old_id)
+        self.update_maps(reactions_changed=True)
+
+    def handle_console_executed(self, _msg):
+        # the model may have been edited from the console
+        self.appdata.project.lp_cache.invalidate()
 
     def handle_changed_optimization_direction(self, direction: str):
         self.parent.unsaved_changes()
@@ -168,7 +184,7 @@ class CentralWidget(QWidget):
             except ValueError:
                 (vl, vh) = make_tuple(value)
                 self.appdata.scen_values_set(reaction, (vl, vh))
-        self.reaction_list.update()
+        self.update(SCENARIO)
 
     def update_reaction_maps(self, _reaction: str):
         self.parent.unsaved_changes()
@@ -181,13 +197,19 @@ class CentralWidget(QWidget):
         if idx == 0:
             self.reaction_list.update()
         elif idx == 1:
-            (clean_model, unused_mets) = prune_unused_metabolites(
-                self.appdata.project.cobra_py_model)
-            self.appdata.project.cobra_py_model = clean_model
+            self.remove_unused_metabolites()
             self.metabolite_list.update()
         elif idx == 2:
             self.model_info.update()
 
+    def remove_unused_metabolites(self):
+        '''Remove the metabolites without reactions, only after reactions were changed'''
+        if self.appdata.project.unused_metabolites:
+            model = self.appdata.project.cobra_py_model
+            model.remove_metabolites(
+                [m for m in model.metabolites if len(m.reactions) == 0])
+            self.appdata.project.unused_metabolites = False
+
     def add_map(self):
         while True:
             name = "Map "+str(self.map_counter)
@@ -218,16 +240,18 @@ class CentralWidget(QWidget):
 
     def update_selected(self):
         x = self.searchbar.text()
-        idx = self.tabs.currentIndex()
-        if idx == 0:
-            self.reaction_list.update_selected(x)
-        if idx == 1:
-            self.metabolite_list.update_selected(x)
+        if x == "":
+            (reactions, metabolites) = (None, None)
+        else:
+            (reactions, metabolites) = self.appdata.project.search_index.search(
+                self.appdata.project.cobra_py_model, x)
+        self.reaction_list.update_selected(reactions)
+        self.metabolite_list.update_selected(metabolites)
 
         idx = self.map_tabs.currentIndex()
         if idx >= 0:
             m = self.map_tabs.widget(idx)
-            m.update_selected(x)
+            m.update_selected(reactions)
 
     def update_mode(self):
         if len(self.appdata.project.modes) > self.mode_navigator.current:
@@ -239,40 +263,84 @@ class CentralWidget(QWidget):
             for i in values:
                 self.appdata.project.comp_values[i] = (values[i], values[i])
 
-        self.appdata.modes_coloring = True
-        self.update()
-        self.appdata.modes_coloring = False
-
-    def update(self):
-        if len(self.appdata.project.modes) == 0:
-            self.mode_navigator.hide()
-            self.mode_navigator.current = 0
-        else:
-            self.mode_navigator.show()
-            self.mode_navigator.update()
-
+        self.update(MODES, MODE_VALUES, SCENARIO, COMP_VALUES)
+
+    def update(self, *changes, map_name: str = None):
+        '''
+        Schedule a refresh for what has changed, everything is refreshed when
+        neither changes nor a map_name are given.
+        Several calls in one event loop turn result in a single refresh.
+        '''
+        if len(changes) == 0 and map_name is None:
+            changes = ALL_CHANGES
+        self.refresh_scheduler.request(*changes, map_name=map_name)
+
+    def refresh_now(self):
+        '''Carry out a scheduled refresh right away'''
+        self.refresh_scheduler.flush()
+
+    def refresh(self, changes: Set[str], maps: Set[str]):
+        '''Refresh the parts of the window that show what has changed'''
+        if MODES in changes:
+            if len(self.appdata.project.modes) == 0:
+                self.mode_navigator.hide()
+                self.mode_navigator.current = 0
+            else:
+                self.mode_navigator.show()
+                self.mode_navigator.update()
+
+        values_changed = not changes.isdisjoint(
+            (SCENARIO, COMP_VALUES, MODE_VALUES))
+        self.appdata.modes_coloring = MODE_VALUES in changes
         idx = self.tabs.currentIndex()
         if idx == 0:
-            self.reaction_list.update()
+            if values_changed or MODEL in changes:
+                self.reaction_list.update()
         elif idx == 1:
-            self.metabolite_list.update()
+            if MODEL in changes:
+                self.remove_unused_metabolites()
+                self.metabolite_list.update()
         elif idx == 2:
-            self.model_info.update()
+            if MODEL in changes:
+                self.model_info.update()
+
+        # maps that are not shown are brought up to date in update_map
+        current = self.map_tabs.currentWidget()
+        for idx in range(0, self.map_tabs.count()):
+            m = self.map_tabs.widget(idx)
+            if m is current:
+                if MODEL in changes or m.name in self.outdated_maps:
+                    self.outdated_maps.discard(m.name)
+                    m.update_reactions()
+                elif MAPS in changes or m.name in maps:
+                    m.update()
+                elif values_changed:
+                    m.set_values()
+            elif MODEL in changes:
+                self.outdated_maps.add(m.name)
+        self.appdata.modes_coloring = False
 
+    def update_reaction_values(self, reactions):
+        '''Show the new values of the given reactions on the current map'''
         idx = self.map_tabs.currentIndex()
         if idx >= 0:
-            m = self.map_tabs.widget(idx)
-            m.update()
+            self.map_tabs.widget(idx).set_values(reactions)
 
     def update_map(self, idx):
         m = self.map_tabs.widget(idx)
         if m is not None:
-            m.update()
+            if m.name in self.outdated_maps:
+                self.outdated_maps.discard(m.name)
+                m.update_reactions()
+            else:
+                m.update()
 
-    def update_maps(self):
-        for idx in range(0, self.map_tabs.count()):
-            m = self.map_tabs.widget(idx)
-            m.update()
+    def update_maps(self, reactions_changed=False):
+        '''Schedule an update of the maps, hidden maps are updated when they are shown'''
+        if reactions_changed:
+            self.update(MODEL)
+        else:
+            self.update(MAPS)
 
     def jump_to_map(self, identifier: str, reaction: str):
         for idx in range(0, self.map_tabs.count()):
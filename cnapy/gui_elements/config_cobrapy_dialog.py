@@ -110,6 +110,7 @@ class ConfigCobrapyDialog(QDialog):
         try:
             self.appdata.project.cobra_py_model.solver = self.current_solver.currentText()
             self.appdata.project.cobra_py_model.tolerance = float(self.current_tolerance.text())
+            self.appdata.project.lp_cache.invalidate()
         except Exception as e:
             QMessageBox.critical(self, "Cannot set current solver/tolerance", str(e))
             return
@@ -8,11 +8,12 @@ from tempfile import TemporaryDirectory
 import appdirs
 from qtpy.QtCore import QSize
 from qtpy.QtGui import QDoubleValidator, QIcon, QIntValidator, QPalette
-from qtpy.QtWidgets import (QColorDialog, QComboBox, QDialog, QFileDialog,
+from qtpy.QtWidgets import (QCheckBox, QColorDialog, QComboBox, QDialog, QFileDialog,
                             QHBoxLayout, QLabel, QLineEdit, QPushButton,
                             QVBoxLayout)
 import cnapy.resources
 from cnapy.cnadata import CnaData
+from cnapy.coloring import COLORMAPS, SCALES
 from cnapy.legacy import try_cna, try_matlab_engine, try_octave_engine
 
 
@@ -212,6 +213,31 @@ class ConfigDialog(QDialog):
         h8.addWidget(self.abs_tol)
         self.layout.addItem(h8)
 
+        self.painted_boxes = QCheckBox(
+            "Paint the reaction boxes (faster for maps with many reactions)")
+        self.painted_boxes.setChecked(self.appdata.painted_boxes)
+        self.layout.addWidget(self.painted_boxes)
+
+        self.tiles_on_disk = QCheckBox(
+            "Keep rendered map backgrounds on disk (at most 256 MB)")
+        self.tiles_on_disk.setChecked(self.appdata.tiles_on_disk)
+        self.layout.addWidget(self.tiles_on_disk)
+
+        h9 = QHBoxLayout()
+        label = QLabel("Heatmap colors:")
+        h9.addWidget(label)
+        self.heat_colormap = QComboBox()
+        self.heat_colormap.addItems(list(COLORMAPS))
+        self.heat_colormap.setCurrentText(self.appdata.heat_colormap)
+        h9.addWidget(self.heat_colormap)
+        label = QLabel("scale:")
+        h9.addWidget(label)
+        self.heat_scale = QComboBox()
+        self.heat_scale.addItems(list(SCALES))
+        self.heat_scale.setCurrentText(self.appdata.heat_scale)
+        h9.addWidget(self.heat_scale)
+        self.layout.addItem(h9)
+
         l2 = QHBoxLayout()
         self.button = QPushButton("Apply Changes")
         self.cancel = QPushButton("Close")
@@ -473,6 +499,10 @@ class ConfigDialog(QDialog):
 
         self.appdata.rounding = int(self.rounding.text())
         self.appdata.abs_tol = float(self.abs_tol.text())
+        self.appdata.painted_boxes = self.painted_boxes.isChecked()
+        self.appdata.tiles_on_disk = self.tiles_on_disk.isChecked()
+        self.appdata.heat_colormap = self.heat_colormap.currentText()
+        self.appdata.heat_scale = self.heat_scale.currentText()
 
         parser = configparser.ConfigParser()
         parser.add_section('cnapy-config')
@@ -497,6 +527,12 @@ class ConfigDialog(QDialog):
                    str(self.appdata.rounding))
         parser.set('cnapy-config', 'abs_tol',
                    str(self.appdata.abs_tol))
+        parser.set('cnapy-config', 'painted_boxes',
+                   str(self.appdata.painted_boxes))
+        parser.set('cnapy-config', 'tiles_on_disk',
+                   str(self.appdata.tiles_on_disk))
+        parser.set('cnapy-config', 'heat_colormap', self.appdata.heat_colormap)
+        parser.set('cnapy-config', 'heat_scale', self.appdata.heat_scale)
         parser.set('cnapy-config', 'selected_engine',
                    str(self.appdata.selected_engine))
 
@@ -243,7 +243,7 @@ class EFMDialog(QDialog):
                                     'Modes have not been calculated or do not exist.')
         else:
             self.appdata.project.modes = FluxVectorContainer(
-                ems, [reac_id[int(i)-1] for i in idx[0]], irreversible, unbounded)
+                ems, [reac_id[int(i)-1] for i in idx[0]], irreversible, unbounded, storage='auto')
             self.centralwidget.mode_navigator.current = 0
             self.centralwidget.mode_navigator.scenario = scenario
             self.centralwidget.mode_navigator.title.setText("Mode Navigation")
@@ -0,0 +1,60 @@
+"""The job status widget"""
+from qtpy.QtWidgets import (QHBoxLayout, QLabel, QProgressBar, QPushButton,
+                            QWidget)
+
+from cnapy.job_runner import Job, JobRunner
+
+
+class JobStatus(QWidget):
+    """Shows the running job, its progress and the number of queued jobs"""
+
+    def __init__(self, job_runner: JobRunner):
+        QWidget.__init__(self)
+        self.job_runner = job_runner
+
+        self.label = QLabel()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setToolTip("cancel the running job")
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.label)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.cancel_button)
+        self.setLayout(layout)
+        self.hide()
+
+        self.cancel_button.clicked.connect(self.cancel)
+        self.job_runner.jobStarted.connect(self.job_started)
+        self.job_runner.queueChanged.connect(self.update)
+
+    def job_started(self, job: Job):
+        job.progress.connect(self.set_progress)
+        self.progress_bar.setRange(0, 0)  # busy indicator until progress is reported
+        self.cancel_button.setEnabled(True)
+
+    def set_progress(self, done: int, total: int):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def cancel(self):
+        self.job_runner.cancel()
+        self.cancel_button.setEnabled(False)
+        self.update()
+
+    def update(self):
+        job = self.job_runner.current
+        if job is None:
+            self.hide()
+            return
+
+        txt = job.name
+        if job.is_cancelled():
+            txt += " (cancelling)"
+        queued = len(self.job_runner.queue)
+        if queued > 0:
+            txt += " - " + str(queued) + " queued"
+        self.label.setText(txt)
+        self.show()
@@ -3,7 +3,7 @@ import json
 import os
 import traceback
 from tempfile import TemporaryDirectory
-from typing import Tuple
+from typing import Dict, List, Tuple
 from zipfile import ZipFile
 from cnapy.flux_vector_container import FluxVectorContainer
 
@@ -13,11 +13,13 @@ import numpy as np
 from cobra.manipulation.delete import prune_unused_metabolites
 from qtpy.QtCore import QFileInfo, Qt, Slot
 from qtpy.QtGui import QColor, QIcon, QPalette, QKeySequence
-from qtpy.QtSvg import QGraphicsSvgItem
-from qtpy.QtWidgets import (QAction, QApplication, QFileDialog, QGraphicsItem,
+from qtpy.QtWidgets import (QAction, QApplication, QFileDialog,
                             QMainWindow, QMessageBox, QToolBar, QShortcut)
 
+import cnapy.core
 from cnapy.cnadata import CnaData, ProjectData
+from cnapy.coloring import heat_colors, onoff_colors, value_arrays, value_range
+from cnapy.cut_set_container import CutSetContainer, is_cut_set_file
 from cnapy.gui_elements.about_dialog import AboutDialog
 from cnapy.gui_elements.centralwidget import CentralWidget
 from cnapy.gui_elements.clipboard_calculator import ClipboardCalculator
@@ -29,10 +31,14 @@ from cnapy.gui_elements.map_view import MapView
 from cnapy.gui_elements.mcs_dialog import MCSDialog
 from cnapy.gui_elements.phase_plane_dialog import PhasePlaneDialog
 from cnapy.gui_elements.in_out_flux_dialog import InOutFluxDialog
+from cnapy.gui_elements.job_status import JobStatus
 from cnapy.gui_elements.rename_map_dialog import RenameMapDialog
 from cnapy.gui_elements.yield_optimization_dialog import \
     YieldOptimizationDialog
+from cnapy.job_runner import Job, JobRunner
 from cnapy.legacy import try_cna
+from cnapy.mode_statistics import participation_frequency
+from cnapy.utils import COMP_VALUES, MAPS, MODEL, MODES, SCENARIO
 
 
 class MainWindow(QMainWindow):
@@ -46,6 +52,10 @@ class MainWindow(QMainWindow):
         central_widget = CentralWidget(self)
         self.setCentralWidget(central_widget)
 
+        self.job_runner = JobRunner()
+        self.job_status = JobStatus(self.job_runner)
+        self.statusBar().addPermanentWidget(self.job_status)
+
         self.menu = self.menuBar()
         self.file_menu = self.menu.addMenu("&Project")
 
@@ -217,6 +227,12 @@ class MainWindow(QMainWindow):
         fva_action.triggered.connect(self.fva)
         self.analysis_menu.addAction(fva_action)
 
+        self.fva_current_map_action = QAction(
+            "Flux Variability Analysis (FVA) on current map", self)
+        self.fva_current_map_action.triggered.connect(self.fva_current_map)
+        self.fva_current_map_action.setEnabled(False)
+        self.analysis_menu.addAction(self.fva_current_map_action)
+
         self.analysis_menu.addSeparator()
 
         in_out_flux_action = QAction(
@@ -245,6 +261,11 @@ class MainWindow(QMainWindow):
         self.efm_menu.addAction(self.save_modes_action)
         self.save_modes_action.triggered.connect(self.save_modes)
 
+        participation_action = QAction(
+            "Color by reaction participation in modes", self)
+        self.efm_menu.addAction(participation_action)
+        participation_action.triggered.connect(self.color_by_participation)
+
         self.mcs_action = QAction("Minimal Cut Sets ...", self)
         self.mcs_action.triggered.connect(self.mcs)
         self.analysis_menu.addAction(self.mcs_action)
@@ -305,7 +326,7 @@ class MainWindow(QMainWindow):
 
         update_action = QAction("Default Coloring", self)
         update_action.setIcon(QIcon(":/icons/default-color.png"))
-        update_action.triggered.connect(central_widget.update)
+        update_action.triggered.connect(lambda: central_widget.update())
 
         zoom_in_action = QAction("Zoom in Map", self)
         zoom_in_action.setIcon(QIcon(":/icons/zoom-in.png"))
@@ -336,6 +357,7 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         if self.checked_unsaved():
+            self.job_runner.shutdown()
             event.accept()
         else:
             event.ignore()
@@ -402,6 +424,7 @@ class MainWindow(QMainWindow):
     @Slot()
     def exit_app(self):
         if self.checked_unsaved():
+            self.job_runner.shutdown()
             QApplication.quit()
 
     def set_current_filename(self, filename):
@@ -432,7 +455,8 @@ class MainWindow(QMainWindow):
     @Slot()
     def show_config_dialog(self):
         dialog = ConfigDialog(self.appdata)
-        dialog.exec_()
+        if dialog.exec_():
+            self.centralWidget().update_maps()
 
     @Slot()
     def show_config_cobrapy_dialog(self):
@@ -487,7 +511,7 @@ class MainWindow(QMainWindow):
 
         self.recreate_maps()
         self.unsaved_changes()
-        self.centralWidget().update()
+        self.centralWidget().update(MAPS)
 
     @Slot()
     def load_scenario(self):
@@ -506,7 +530,7 @@ class MainWindow(QMainWindow):
                 self.appdata.scen_values_set(i, values[i])
 
             self.appdata.project.comp_values.clear()
-        self.centralWidget().update()
+        self.centralWidget().update(SCENARIO, COMP_VALUES)
 
     @Slot()
     def load_modes(self):
@@ -516,14 +540,36 @@ class MainWindow(QMainWindow):
         if not filename or len(filename) == 0 or not os.path.exists(filename):
             return
 
-        self.appdata.project.modes = FluxVectorContainer(filename)
+        if is_cut_set_file(filename):
+            self.appdata.project.modes = CutSetContainer(filename)
+            self.centralWidget().mode_navigator.title.setText("MCS Navigation")
+        else:
+            self.appdata.project.modes = FluxVectorContainer(
+                filename, storage='auto')
+            self.centralWidget().mode_navigator.title.setText("Mode Navigation")
         self.centralWidget().mode_navigator.current = 0
         values = self.appdata.project.modes[0]
         self.appdata.project.scen_values.clear()
         self.appdata.project.comp_values.clear()
         for i in values:
             self.appdata.project.comp_values[i] = (values[i], values[i])
-        self.centralWidget().update()
+        self.centralWidget().update(MODES, SCENARIO, COMP_VALUES)
+
+    @Slot()
+    def color_by_participation(self):
+        if len(self.appdata.project.modes) == 0:
+            QMessageBox.information(self, 'No modes',
+                                    'There are no modes loaded.')
+            return
+        self.setCursor(Qt.BusyCursor)
+        frequency = participation_frequency(self.appdata.project.modes)
+        self.setCursor(Qt.ArrowCursor)
+        self.appdata.project.scen_values.clear()
+        self.appdata.project.comp_values.clear()
+        for r in frequency:
+            self.appdata.project.comp_values[r] = (frequency[r], frequency[r])
+        self.centralWidget().update(SCENARIO, COMP_VALUES)
+        self.set_heaton()
 
     @Slot()
     def change_background(self):
@@ -539,12 +585,7 @@ class MainWindow(QMainWindow):
         if filename != '':
             self.appdata.project.maps[name]["background"] = filename
 
-            background = QGraphicsSvgItem(
-                self.appdata.project.maps[name]["background"])
-            background.setFlags(QGraphicsItem.ItemClipsToShape)
-            self.centralWidget().map_tabs.widget(idx).scene.addItem(background)
-
-            self.centralWidget().update()
+            self.centralWidget().update(map_name=name)
             self.centralWidget().map_tabs.setCurrentIndex(idx)
             self.unsaved_changes()
 
@@ -561,7 +602,7 @@ class MainWindow(QMainWindow):
         name = self.centralWidget().map_tabs.tabText(idx)
         self.appdata.project.maps[name]["bg-size"] *= 1.1
         self.unsaved_changes()
-        self.centralWidget().update()
+        self.centralWidget().update(map_name=name)
 
     @Slot()
     def dec_bg_size(self):
@@ -569,7 +610,7 @@ class MainWindow(QMainWindow):
         name = self.centralWidget().map_tabs.tabText(idx)
         self.appdata.project.maps[name]["bg-size"] *= (1/1.1)
         self.unsaved_changes()
-        self.centralWidget().update()
+        self.centralWidget().update(map_name=name)
 
     @Slot()
     def zoom_in(self):
@@ -627,7 +668,7 @@ class MainWindow(QMainWindow):
             last = self.appdata.scenario_past.pop()
             self.appdata.scenario_future.append(last)
             self.appdata.recreate_scenario_from_history()
-            self.centralWidget().update()
+            self.centralWidget().update(SCENARIO, COMP_VALUES)
 
     def redo_scenario_edit(self):
         ''' redo last undo of scenario history '''
@@ -635,14 +676,14 @@ class MainWindow(QMainWindow):
             nex = self.appdata.scenario_future.pop()
             self.appdata.scenario_past.append(nex)
             self.appdata.recreate_scenario_from_history()
-            self.centralWidget().update()
+            self.centralWidget().update(SCENARIO, COMP_VALUES)
 
     def clear_scenario(self):
         self.appdata.scen_values_clear()
         self.appdata.project.comp_values.clear()
         self.appdata.project.high = 0
         self.appdata.project.low = 0
-        self.centralWidget().update()
+        self.centralWidget().update(SCENARIO, COMP_VALUES)
 
     def load_default_scenario(self):
         self.appdata.project.comp_values.clear()
@@ -651,7 +692,7 @@ class MainWindow(QMainWindow):
             if 'cnapy-default' in r.annotation.keys():
                 self.centralWidget().update_reaction_value(
                     r.id, r.annotation['cnapy-default'])
-        self.centralWidget().update()
+        self.centralWidget().update(SCENARIO, COMP_VALUES)
 
     @Slot()
     def new_project(self):
@@ -691,6 +732,7 @@ class MainWindow(QMainWindow):
                 return
             self.new_project()
             self.appdata.project.cobra_py_model = cobra_py_model
+            self.appdata.project.unused_metabolites = True
             self.centralWidget().update()
 
             self.setCursor(Qt.ArrowCursor)
@@ -737,6 +779,7 @@ class MainWindow(QMainWindow):
                     self.appdata.project.maps = maps
                     self.appdata.project.meta_data = meta_data
                     self.appdata.project.cobra_py_model = cobra_py_model
+                    self.appdata.project.unused_metabolites = True
                     self.set_current_filename(filename)
                     self.recreate_maps()
                     self.centralWidget().mode_navigator.clear()
@@ -895,6 +938,7 @@ class MainWindow(QMainWindow):
             self.inc_bg_size_action.setEnabled(True)
             self.dec_bg_size_action.setEnabled(True)
             self.save_box_positions_action.setEnabled(True)
+            self.fva_current_map_action.setEnabled(True)
             self.centralWidget().update_map(idx)
         else:
             self.change_map_name_action.setEnabled(False)
@@ -902,25 +946,26 @@ class MainWindow(QMainWindow):
             self.inc_bg_size_action.setEnabled(False)
             self.dec_bg_size_action.setEnabled(False)
             self.save_box_positions_action.setEnabled(False)
+            self.fva_current_map_action.setEnabled(False)
 
     def copy_to_clipboard(self):
         self.appdata.project.clipboard = self.appdata.project.comp_values.copy()
 
     def paste_clipboard(self):
         self.appdata.project.comp_values = self.appdata.project.clipboard
-        self.centralWidget().update()
+        self.centralWidget().update(COMP_VALUES)
 
     @Slot()
     def clipboard_arithmetics(self):
         dialog = ClipboardCalculator(self.appdata.project)
         dialog.exec_()
-        self.centralWidget().update()
+        self.centralWidget().update(COMP_VALUES)
 
     def add_values_to_scenario(self):
         for key in self.appdata.project.comp_values.keys():
             self.appdata.scen_values_set(
                 key, self.appdata.project.comp_values[key])
-        self.centralWidget().update()
+        self.centralWidget().update(SCENARIO)
 
     def set_model_bounds_to_scenario(self):
         for reaction in self.appdata.project.cobra_py_model.reactions:
@@ -928,7 +973,7 @@ class MainWindow(QMainWindow):
                 (vl, vu) = self.appdata.project.scen_values[reaction.id]
                 reaction.lower_bound = vl
                 reaction.upper_bound = vu
-        self.centralWidget().update()
+        self.centralWidget().update(MODEL)
 
     def set_scenario_to_default_scenario(self):
         ''' write current scenario into sbml annotation '''
@@ -939,83 +984,75 @@ class MainWindow(QMainWindow):
             else:
                 if 'cnapy-default' in reaction.annotation.keys():
                     reaction.annotation.pop('cnapy-default')
-        self.centralWidget().update()
+        self.centralWidget().update(MODEL)
         self.unsaved_changes()
 
     def fba(self):
-        with self.appdata.project.cobra_py_model as model:
-            self.appdata.project.load_scenario_into_model(model)
-            solution = model.optimize()
-            if solution.status == 'optimal':
-                soldict = solution.fluxes.to_dict()
-                for i in soldict:
-                    self.appdata.project.comp_values[i] = (
-                        soldict[i], soldict[i])
-            elif solution.status == 'infeasible':
-                QMessageBox.information(
-                    self, 'No solution!', 'No solution the scenario is infeasible!')
-                self.appdata.project.comp_values.clear()
-            else:
-                QMessageBox.information(
-                    self, 'No solution!', solution.status)
-                self.appdata.project.comp_values.clear()
-            self.centralWidget().update()
+        lp_cache = self.appdata.project.lp_cache
+        job = Job("FBA", cnapy.core.fba, lp_cache,
+                  lp_cache.snapshot(self.appdata.project.cobra_py_model, self.appdata.project.scen_values))
+        job.resultReady.connect(self.set_fba_solution)
+        job.failed.connect(self.show_job_error)
+        self.job_runner.submit(job)
 
     def fba_optimize_reaction(self, reaction: str, mmin: bool):
-        with self.appdata.project.cobra_py_model as model:
-            self.appdata.project.load_scenario_into_model(model)
-            for r in self.appdata.project.cobra_py_model.reactions:
-                if r.id == reaction:
-                    if mmin:
-                        r.objective_coefficient = -1
-                    else:
-                        r.objective_coefficient = 1
-                else:
-                    r.objective_coefficient = 0
-            solution = model.optimize()
-            if solution.status == 'optimal':
-                soldict = solution.fluxes.to_dict()
-                for i in soldict:
-                    self.appdata.project.comp_values[i] = (
-                        soldict[i], soldict[i])
-            elif solution.status == 'infeasible':
-                QMessageBox.information(
-                    self, 'No solution!', 'No solution the scenario is infeasible!')
-                self.appdata.project.comp_values.clear()
-            else:
-                QMessageBox.information(
-                    self, 'No solution!', solution.status)
-                self.appdata.project.comp_values.clear()
-        self.centralWidget().update()
+        if mmin:
+            objective = {reaction: -1}
+        else:
+            objective = {reaction: 1}
+        lp_cache = self.appdata.project.lp_cache
+        job = Job("FBA", cnapy.core.fba, lp_cache,
+                  lp_cache.snapshot(self.appdata.project.cobra_py_model, self.appdata.project.scen_values),
+                  objective)
+        job.resultReady.connect(self.set_fba_solution)
+        job.failed.connect(self.show_job_error)
+        self.job_runner.submit(job)
+
+    def set_fba_solution(self, solution: cobra.Solution):
+        if solution.status == 'optimal':
+            soldict = solution.fluxes.to_dict()
+            for i in soldict:
+                self.appdata.project.comp_values[i] = (
+                    soldict[i], soldict[i])
+        elif solution.status == 'infeasible':
+            QMessageBox.information(
+                self, 'No solution!', 'No solution the scenario is infeasible!')
+            self.appdata.project.comp_values.clear()
+        else:
+            QMessageBox.information(
+                self, 'No solution!', solution.status)
+            self.appdata.project.comp_values.clear()
+        self.centralWidget().update(COMP_VALUES)
 
     def pfba(self):
-        with self.appdata.project.cobra_py_model as model:
-            self.appdata.project.load_scenario_into_model(model)
-            try:
-                solution = cobra.flux_analysis.pfba(model)
-            except cobra.exceptions.Infeasible:
-                QMessageBox.information(
-                    self, 'No solution', 'The scenario is infeasible')
-            except Exception:
-                output = io.StringIO()
-                traceback.print_exc(file=output)
-                exstr = output.getvalue()
-                print(exstr)
-                QMessageBox.warning(self, 'Unknown exception occured!',
-                                    exstr+'\nPlease report the problem to:\n\
-                                    \nhttps://github.com/cnapy-org/CNApy/issues')
-            else:
-                if solution.status == 'optimal':
-                    soldict = solution.fluxes.to_dict()
-                    for i in soldict:
-                        self.appdata.project.comp_values[i] = (
-                            soldict[i], soldict[i])
-                else:
-                    QMessageBox.information(
-                        self, 'No solution!', solution.status)
-                    self.appdata.project.comp_values.clear()
-            finally:
-                self.centralWidget().update()
+        lp_cache = self.appdata.project.lp_cache
+        job = Job("pFBA", cnapy.core.pfba, lp_cache,
+                  lp_cache.snapshot(self.appdata.project.cobra_py_model, self.appdata.project.scen_values))
+        job.resultReady.connect(self.set_pfba_solution)
+        job.failed.connect(self.show_job_error)
+        self.job_runner.submit(job)
+
+    def set_pfba_solution(self, solution: cobra.Solution):
+        if solution.status == 'optimal':
+            soldict = solution.fluxes.to_dict()
+            for i in soldict:
+                self.appdata.project.comp_values[i] = (
+                    soldict[i], soldict[i])
+        else:
+            QMessageBox.information(
+                self, 'No solution!', solution.status)
+            self.appdata.project.comp_values.clear()
+        self.centralWidget().update(COMP_VALUES)
+
+    def show_job_error(self, exception: Exception, exstr: str):
+        if isinstance(exception, cobra.exceptions.Infeasible):
+            QMessageBox.information(
+                self, 'No solution', 'The scenario is infeasible')
+        else:
+            QMessageBox.warning(self, 'Unknown exception occured!',
+                                exstr+'\nPlease report the problem to:\n\
+                                \nhttps://github.com/cnapy-org/CNApy/issues')
+        self.centralWidget().update(COMP_VALUES)
 
     def execute_print_model_stats(self):
         if len(self.appdata.project.cobra_py_model.reactions) > 0:
@@ -1161,41 +1198,38 @@ class MainWindow(QMainWindow):
         for reaction in self.appdata.project.cobra_py_model.reactions:
             self.appdata.project.comp_values[reaction.id] = (
                 reaction.lower_bound, reaction.upper_bound)
-        self.centralWidget().update()
+        self.centralWidget().update(COMP_VALUES)
 
     def fva(self, fraction_of_optimum=0.0):  # cobrapy default is 1.0
+        self.run_fva(fraction_of_optimum)
 
-        self.setCursor(Qt.BusyCursor)
-        from cobra.flux_analysis import flux_variability_analysis
-        with self.appdata.project.cobra_py_model as model:
-            self.appdata.project.load_scenario_into_model(model)
-            for r in self.appdata.project.cobra_py_model.reactions:
-                r.objective_coefficient = 0
-            try:
-                solution = flux_variability_analysis(
-                    model, fraction_of_optimum=fraction_of_optimum)
-            except cobra.exceptions.Infeasible:
-                QMessageBox.information(
-                    self, 'No solution', 'The scenario is infeasible')
-            except Exception:
-                output = io.StringIO()
-                traceback.print_exc(file=output)
-                exstr = output.getvalue()
-                print(exstr)
-                QMessageBox.warning(self, 'Unknown exception occured!',
-                                    exstr+'\nPlease report the problem to:\n\
-                                    \nhttps://github.com/cnapy-org/CNApy/issues')
-            else:
-                minimum = solution.minimum.to_dict()
-                maximum = solution.maximum.to_dict()
-                for i in minimum:
-                    self.appdata.project.comp_values[i] = (
-                        minimum[i], maximum[i])
-
-                self.appdata.project.compute_color_type = 3
-
-        self.centralWidget().update()
-        self.setCursor(Qt.ArrowCursor)
+    def fva_current_map(self):
+        idx = self.centralWidget().map_tabs.currentIndex()
+        if idx < 0:
+            return
+        name = self.centralWidget().map_tabs.tabText(idx)
+        reactions = [r_id for r_id in self.appdata.project.maps[name]["boxes"]
+                     if r_id in self.appdata.project.cobra_py_model.reactions]
+        self.run_fva(0.0, reactions)
+
+    def run_fva(self, fraction_of_optimum, reactions=None):
+        lp_cache = self.appdata.project.lp_cache
+        job = Job("FVA", cnapy.core.fva, lp_cache,
+                  lp_cache.snapshot(self.appdata.project.cobra_py_model, self.appdata.project.scen_values),
+                  fraction_of_optimum, reactions)
+        job.partialResult.connect(self.add_fva_values)
+        job.resultReady.connect(self.set_fva_solution)
+        job.aborted.connect(self.set_fva_solution)
+        job.failed.connect(self.show_job_error)
+        self.job_runner.submit(job)
+
+    def add_fva_values(self, values: Dict[str, Tuple[float, float]]):
+        self.appdata.project.comp_values.update(values)
+        self.centralWidget().update_reaction_values(values.keys())
+
+    def set_fva_solution(self, _values=None):
+        self.appdata.project.compute_color_type = 3
+        self.centralWidget().update(COMP_VALUES)
 
     def efm(self):
         self.efm_dialog = EFMDialog(
@@ -1218,117 +1252,48 @@ class MainWindow(QMainWindow):
         self.mcs_dialog.open()
 
     def set_onoff(self):
-        idx = self.centralWidget().tabs.currentIndex()
-        if idx == 0:
-            view = self.centralWidget().reaction_list
-            root = view.reaction_list.invisibleRootItem()
-            child_count = root.childCount()
-            for i in range(child_count):
-                item = root.child(i)
-                key = item.text(0)
-                if key in self.appdata.project.scen_values:
-                    value = self.appdata.project.scen_values[key]
-                    color = self.compute_color_onoff(value)
-                    item.setBackground(2, color)
-                elif key in self.appdata.project.comp_values:
-                    value = self.appdata.project.comp_values[key]
-                    color = self.compute_color_onoff(value)
-                    item.setBackground(2, color)
-
-        idx = self.centralWidget().map_tabs.currentIndex()
-        if idx < 0:
-            return
-        name = self.centralWidget().map_tabs.tabText(idx)
-        view = self.centralWidget().map_tabs.widget(idx)
-        for key in self.appdata.project.maps[name]["boxes"]:
-            if key in self.appdata.project.scen_values:
-                value = self.appdata.project.scen_values[key]
-                color = self.compute_color_onoff(value)
-                view.reaction_boxes[key].set_color(color)
-            elif key in self.appdata.project.comp_values:
-                value = self.appdata.project.comp_values[key]
-                color = self.compute_color_onoff(value)
-                view.reaction_boxes[key].set_color(color)
-
-    def compute_color_onoff(self, value: Tuple[float, float]):
-        (vl, vh) = value
-        vl = round(vl, self.appdata.rounding)
-        vh = round(vh, self.appdata.rounding)
-        if vl < 0.0:
-            return QColor.fromRgb(0, 255, 0)
-        elif vh > 0.0:
-            return QColor.fromRgb(0, 255, 0)
-        else:
-            return QColor.fromRgb(255, 0, 0)
+        self.apply_colors(onoff_colors)
 
     def set_heaton(self):
-        (low, high) = self.high_and_low()
+        (low, high) = value_range(self.appdata.project.scen_values,
+                                  self.appdata.project.comp_values)
+        self.apply_colors(lambda vl, vu: heat_colors(
+            vl, vu, low, high, self.appdata.heat_colormap, self.appdata.heat_scale))
+
+    def apply_colors(self, colors):
+        '''
+        Color the values in the reaction list and on the current map,
+        colors maps the arrays of lower and upper bounds to packed RGB values
+        '''
+        self.centralWidget().refresh_now()
         idx = self.centralWidget().tabs.currentIndex()
         if idx == 0:
             view = self.centralWidget().reaction_list
-            root = view.reaction_list.invisibleRootItem()
-            child_count = root.childCount()
-            for i in range(child_count):
-                item = root.child(i)
-                key = item.text(0)
-                if key in self.appdata.project.scen_values:
-                    value = self.appdata.project.scen_values[key]
-                    color = self.compute_color_heat(value, low, high)
-                    item.setBackground(2, color)
-                elif key in self.appdata.project.comp_values:
-                    value = self.appdata.project.comp_values[key]
-                    color = self.compute_color_heat(value, low, high)
-                    item.setBackground(2, color)
+            view.set_flux_backgrounds(self.compute_colors(view.model.ids, colors))
 
         idx = self.centralWidget().map_tabs.currentIndex()
         if idx < 0:
             return
         name = self.centralWidget().map_tabs.tabText(idx)
         view = self.centralWidget().map_tabs.widget(idx)
-        for key in self.appdata.project.maps[name]["boxes"]:
-            if key in self.appdata.project.scen_values:
-                value = self.appdata.project.scen_values[key]
-                color = self.compute_color_heat(value, low, high)
-                view.reaction_boxes[key].set_color(color)
-            elif key in self.appdata.project.comp_values:
-                value = self.appdata.project.comp_values[key]
-                color = self.compute_color_heat(value, low, high)
-                view.reaction_boxes[key].set_color(color)
-
-    def compute_color_heat(self, value: Tuple[float, float], low, high):
-        (vl, vh) = value
-        vl = round(vl, self.appdata.rounding)
-        vh = round(vh, self.appdata.rounding)
-        mean = my_mean((vl, vh))
-        if mean > 0.0:
-            if high == 0.0:
-                h = 255
-            else:
-                h = mean * 255 / high
-            return QColor.fromRgb(255-h, 255, 255 - h)
-        else:
-            if low == 0.0:
-                h = 255
-            else:
-                h = mean * 255 / low
-            return QColor.fromRgb(255, 255 - h, 255 - h)
-
-    def high_and_low(self):
-        low = 0
-        high = 0
-        for key in self.appdata.project.scen_values.keys():
-            mean = my_mean(self.appdata.project.scen_values[key])
-            if mean < low:
-                low = mean
-            if mean > high:
-                high = mean
-        for key in self.appdata.project.comp_values.keys():
-            mean = my_mean(self.appdata.project.comp_values[key])
-            if mean < low:
-                low = mean
-            if mean > high:
-                high = mean
-        return (low, high)
+        view.apply_pending_values(visible_only=False)
+        view.set_colors(self.compute_colors(
+            list(self.appdata.project.maps[name]["boxes"]), colors))
+
+    def compute_colors(self, ids: List[str], colors) -> Dict[str, QColor]:
+        '''colors of the reactions in ids that have a value'''
+        (vl, vu) = value_arrays(ids, self.appdata.project.scen_values,
+                                self.appdata.project.comp_values, self.appdata.rounding)
+        has_value = ~np.isnan(vl)
+        rgb = colors(vl[has_value], vu[has_value])
+        qcolors: Dict[int, QColor] = {}
+        result = {}
+        for (key, value) in zip(np.array(ids, dtype=object)[has_value], rgb.tolist()):
+            color = qcolors.get(value)
+            if color is None:
+                color = qcolors[value] = QColor(value)
+            result[key] = color
+        return result
 
     def in_out_fluxes(self, metabolite_id, soldict):
         import matplotlib.pyplot as plt
@@ -1375,11 +1340,3 @@ class MainWindow(QMainWindow):
     def show_model_view(self):
         (_, r) = self.centralWidget().splitter.getRange(1)
         self.centralWidget().splitter.moveSplitter(r*0.5, 1)
-
-
-def my_mean(value):
-    if isinstance(value, float):
-        return value
-    else:
-        (vl, vh) = value
-        return (vl+vh)/2
@@ -0,0 +1,278 @@
+"""Tiled and cached rendering of SVG map backgrounds"""
+import hashlib
+import itertools
+import math
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from qtpy.QtCore import (QObject, QPointF, QRectF, QRunnable, QSizeF, Qt, QThread,
+                         QThreadPool, Signal)
+from qtpy.QtGui import QImage, QPainter, QPixmap
+from qtpy.QtSvg import QSvgRenderer
+from qtpy.QtWidgets import QGraphicsItem
+
+TILE_SIZE = 256  # in pixels
+MIN_LEVEL = -6
+MAX_LEVEL = 5
+MAX_TILE_DIR_BYTES = 2**28
+
+
+class TileCache:
+    '''A bounded LRU of rendered background tiles shared by all map views'''
+
+    def __init__(self, max_bytes=128*2**20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.tiles = OrderedDict()
+
+    def get(self, key):
+        tile = self.tiles.get(key, None)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile: QPixmap):
+        self.tiles[key] = tile
+        self.bytes += tile.width() * tile.height() * 4
+        while self.bytes > self.max_bytes and len(self.tiles) > 1:
+            (_, old) = self.tiles.popitem(last=False)
+            self.bytes -= old.width() * old.height() * 4
+
+    def clear(self):
+        self.tiles.clear()
+        self.bytes = 0
+
+
+class TileRenderer(QRunnable):
+    '''
+    Renders a tile on a worker thread, or loads it when it has been stored as
+    PNG file in tile_dir before, and hands it to the GUI thread
+    '''
+
+    def __init__(self, fname: str, key, rect: QRectF, tile_dir: str = None):
+        QRunnable.__init__(self)
+        self.fname = fname
+        self.key = key
+        self.rect = rect
+        self.tile_fname = None
+        if tile_dir is not None:
+            self.tile_fname = os.path.join(tile_dir, "{}_{}_{}_{}.png".format(*key))
+
+    def run(self):
+        image = QImage()
+        if self.tile_fname is not None and os.path.exists(self.tile_fname):
+            image.load(self.tile_fname)
+        if image.isNull():
+            (_, level, tx, ty) = self.key
+            (renderer_key, renderer) = take_renderer(self.fname)
+            image = render_tile(renderer, self.rect, level, tx, ty)
+            give_back_renderer(renderer_key, renderer)
+            if self.tile_fname is not None:
+                save_tile(image, self.tile_fname)
+        _dispatcher.rendered.emit(self.key, image)
+
+
+class TileDispatcher(QObject):
+    '''Puts the tiles from the worker threads into the cache and repaints the backgrounds'''
+    rendered = Signal(object, QImage)
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.rendered.connect(self.add_tile)
+
+    def add_tile(self, key, image: QImage):
+        _pending.discard(key)
+        if image.isNull():
+            return
+        tile_cache.put(key, QPixmap.fromImage(image))
+        for background in list(_backgrounds):
+            if background.key == key[0]:
+                background.update()
+
+
+tile_cache = TileCache()
+_dispatcher = None
+_tile_pool = None
+_pending = set()  # keys of the tiles that are being rendered
+_backgrounds = weakref.WeakSet()
+# the renderers are dropped together with the last background that uses them
+_renderers = weakref.WeakValueDictionary()
+# renderers of the worker threads which are not shared between threads, a thread-local
+# renderer would be destroyed without the GIL when the pool thread leaves Python
+_idle_renderers = OrderedDict()
+_idle_lock = threading.Lock()
+_saved_tiles = itertools.count(1)
+
+
+def request_tile(fname: str, key, rect: QRectF, tile_dir: str = None):
+    '''Renders the tile in the background unless this is already under way'''
+    global _dispatcher, _tile_pool
+    if key in _pending:
+        return
+    if _dispatcher is None:
+        _dispatcher = TileDispatcher()
+        _tile_pool = QThreadPool()
+        _tile_pool.setMaxThreadCount(max(1, QThread.idealThreadCount() - 1))
+    _pending.add(key)
+    _tile_pool.start(TileRenderer(fname, key, rect, tile_dir))
+
+
+def save_tile(image: QImage, fname: str, max_dir_bytes=MAX_TILE_DIR_BYTES):
+    '''Stores a tile as PNG file, the oldest tiles are deleted when the directory grows beyond max_dir_bytes'''
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+    # written under another name first so that a tile is never read half written
+    partial = fname + "." + str(threading.get_ident()) + ".part"
+    if image.save(partial, "PNG"):
+        os.replace(partial, fname)
+    if next(_saved_tiles) % 64 == 0:
+        prune_tiles(os.path.dirname(fname), max_dir_bytes)
+
+
+def prune_tiles(tile_dir: str, max_bytes: int):
+    '''deletes the least recently written tiles until the others take at most max_bytes'''
+    try:
+        paths = [os.path.join(tile_dir, f) for f in os.listdir(tile_dir) if f.endswith(".png")]
+    except OSError:
+        return
+    files = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(f[1] for f in files)
+    for (_, size, path) in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def svg_renderer(fname: str) -> QSvgRenderer:
+    '''One renderer per background file, the SVG is only parsed once while it is shown'''
+    key = (fname, os.path.getmtime(fname) if os.path.exists(fname) else 0)
+    renderer = _renderers.get(key, None)
+    if renderer is None:
+        renderer = QSvgRenderer(fname)
+        _renderers[key] = renderer
+    return renderer
+
+
+def take_renderer(fname: str):
+    '''
+    A renderer for fname that no other worker thread uses at the moment, it is
+    handed back with give_back_renderer
+    '''
+    key = (fname, os.path.getmtime(fname) if os.path.exists(fname) else 0)
+    renderer = None
+    with _idle_lock:
+        idle = _idle_renderers.pop(key, [])
+        if idle:
+            renderer = idle.pop()
+        _idle_renderers[key] = idle
+        while len(_idle_renderers) > 2:
+            _idle_renderers.popitem(last=False)
+    if renderer is None:
+        renderer = QSvgRenderer(fname)
+    return (key, renderer)
+
+
+def give_back_renderer(key, renderer: QSvgRenderer):
+    with _idle_lock:
+        if key in _idle_renderers:
+            _idle_renderers[key].append(renderer)
+
+
+def render_tile(renderer: QSvgRenderer, rect: QRectF, level: int, tx: int, ty: int) -> QImage:
+    '''
+    The tile (tx, ty) at the zoom level, rect is the extent of the whole SVG. Only the part of
+    the view box that the tile covers is rendered.
+    '''
+    extent = TILE_SIZE / 2.0**level  # in item coordinates
+    view_box = renderer.viewBoxF()
+    sx = view_box.width() / rect.width()
+    sy = view_box.height() / rect.height()
+    image = QImage(TILE_SIZE, TILE_SIZE, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    renderer.setViewBox(QRectF(view_box.x() + tx * extent * sx, view_box.y() + ty * extent * sy,
+                               extent * sx, extent * sy))
+    renderer.render(painter, QRectF(0, 0, TILE_SIZE, TILE_SIZE))
+    renderer.setViewBox(view_box)
+    painter.end()
+    return image
+
+
+class MapBackground(QGraphicsItem):
+    '''
+    Draws an SVG background from tiles that are rasterized once per zoom level.
+    The zoom levels are powers of two so that a tile is never magnified by more than a factor of two.
+    The tiles are rendered on worker threads, until a tile is ready the part of a coarser tile that
+    covers it is drawn. If tile_dir is given the tiles are also stored there as PNG files and reused
+    from there, the directory is kept below MAX_TILE_DIR_BYTES.
+    '''
+
+    def __init__(self, fname: str, tile_dir: str = None):
+        QGraphicsItem.__init__(self)
+        self.fname = fname
+        self.renderer = svg_renderer(fname)
+        self.tile_dir = tile_dir
+        if self.renderer.isValid():
+            # the same extent as a QGraphicsSvgItem of the file
+            self.rect = QRectF(QPointF(0, 0), QSizeF(self.renderer.defaultSize()))
+        else:
+            self.rect = QRectF()
+        stamp = fname + str(os.path.getmtime(fname)) if os.path.exists(fname) else fname
+        self.key = hashlib.sha1(stamp.encode()).hexdigest()[:16]
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        _backgrounds.add(self)
+
+    def boundingRect(self):
+        return self.rect
+
+    def paint(self, painter: QPainter, option, _widget):
+        if self.rect.isEmpty():
+            return
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        level = min(max(math.ceil(math.log2(max(lod, 2**MIN_LEVEL))), MIN_LEVEL), MAX_LEVEL)
+        scale = 2.0**level
+        tile_extent = TILE_SIZE / scale  # in item coordinates
+
+        exposed = option.exposedRect.intersected(self.rect)
+        x0 = math.floor(exposed.left() / tile_extent)
+        x1 = math.ceil(exposed.right() / tile_extent)
+        y0 = math.floor(exposed.top() / tile_extent)
+        y1 = math.ceil(exposed.bottom() / tile_extent)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        for tx in range(x0, x1):
+            for ty in range(y0, y1):
+                target = QRectF(tx * tile_extent, ty * tile_extent,
+                                tile_extent, tile_extent)
+                (tile, source) = self.tile(level, tx, ty)
+                if tile is not None:
+                    painter.drawPixmap(target, tile, source)
+
+    def tile(self, level: int, tx: int, ty: int):
+        '''
+        The pixmap and the part of it to draw for the tile, a part of a coarser tile or
+        (None, None) while the tile is rendered
+        '''
+        key = (self.key, level, tx, ty)
+        tile = tile_cache.get(key)
+        if tile is not None:
+            return (tile, QRectF(0, 0, TILE_SIZE, TILE_SIZE))
+        request_tile(self.fname, key, self.rect, self.tile_dir)
+        for d in range(1, min(3, level - MIN_LEVEL) + 1):
+            tile = tile_cache.get((self.key, level - d, tx >> d, ty >> d))
+            if tile is not None:
+                size = TILE_SIZE / 2**d
+                return (tile, QRectF((tx - ((tx >> d) << d)) * size, (ty - ((ty >> d) << d)) * size,
+                                     size, size))
+        return (None, None)
@@ -1,21 +1,28 @@
 """The PyNetAnalyzer map view"""
 import math
+import os
 from ast import literal_eval as make_tuple
 from math import isclose
-from typing import Dict, Tuple
+from typing import Dict, Set, Tuple
 
 from qtpy.QtCore import QMimeData, QRectF, Qt, Signal
-from qtpy.QtGui import QColor, QDrag, QMouseEvent, QPainter, QPalette
-from qtpy.QtSvg import QGraphicsSvgItem
-from qtpy.QtWidgets import (QApplication, QAction, QGraphicsItem, QGraphicsScene,
+from qtpy.QtGui import QColor, QDrag, QMouseEvent, QPainter, QPainterPath, QPalette
+from qtpy.QtWidgets import (QApplication, QAction, QGraphicsItem, QGraphicsRectItem,
+                            QGraphicsScene,
                             QGraphicsSceneDragDropEvent,
                             QGraphicsSceneMouseEvent, QGraphicsView,
                             QLineEdit, QMenu, QWidget)
 
 from cnapy.cnadata import CnaData
+from cnapy.gui_elements.map_background import MapBackground
 
 INCREASE_FACTOR = 1.1
 DECREASE_FACTOR = 1/INCREASE_FACTOR
+BOX_WIDTH = 80
+BOX_HEIGHT = 22
+# below these scales of the view the values and then also the frames of the boxes are left out
+TEXT_ZOOM = 0.5
+MARKER_ZOOM = 0.25
 
 
 class MapView(QGraphicsView):
@@ -24,6 +31,7 @@ class MapView(QGraphicsView):
     def __init__(self, appdata: CnaData, name: str):
         self.scene = QGraphicsScene()
         QGraphicsView.__init__(self, self.scene)
+        self.scene.setParent(self)
         palette = self.palette()
         palette.setColor(QPalette.Base, Qt.white)
         self.setPalette(palette)
@@ -33,6 +41,24 @@ class MapView(QGraphicsView):
         self.setAcceptDrops(True)
         self.drag = False
         self.reaction_boxes: Dict[str, ReactionBox] = {}
+        self.box_grid = BoxGrid()
+        # boxes outside of the viewport whose values have not been set yet,
+        # with the coloring mode (appdata.modes_coloring) of the update
+        self.pending_values: Dict[str, bool] = {}
+        self.low_detail = False
+        # all boxes are children of this item so that they can be moved together
+        self.box_layer = QGraphicsRectItem()
+        self.box_layer.setFlag(QGraphicsItem.ItemHasNoContents)
+        self.scene.addItem(self.box_layer)
+        self.background = None
+        self.background_file = None
+        # editor and context menu shared by the painted boxes, created on first use
+        self.box_editor = None
+        self.box_editor_proxy = None
+        self.edited_box = None
+        self.box_editor_text = ""
+        self.box_menu = None
+        self.menu_box = None
         self._zoom = 0
         self.drag = False
         self.drag_start = None
@@ -45,6 +71,7 @@ class MapView(QGraphicsView):
         if self._zoom < 0:
             for _ in range(self._zoom, -1):
                 self.scale(DECREASE_FACTOR, DECREASE_FACTOR)
+        self.update_level_of_detail()
 
         # connect events to methods
         self.horizontalScrollBar().valueChanged.connect(self.on_hbar_change)
@@ -53,10 +80,20 @@ class MapView(QGraphicsView):
     def on_hbar_change(self, x):
         self.appdata.project.maps[self.name]["pos"] = (
             x, self.verticalScrollBar().value())
+        self.apply_pending_values()
 
     def on_vbar_change(self, y):
         self.appdata.project.maps[self.name]["pos"] = (
             self.horizontalScrollBar().value(), y)
+        self.apply_pending_values()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.apply_pending_values()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.apply_pending_values()
 
     def dragEnterEvent(self, event: QGraphicsSceneDragDropEvent):
         event.setAccepted(True)
@@ -111,18 +148,30 @@ class MapView(QGraphicsView):
 
     def fit(self):
         self.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
+        self.update_level_of_detail()
 
     def zoom_in(self):
         self._zoom += 1
 
         self.appdata.project.maps[self.name]["zoom"] = self._zoom
         self.scale(INCREASE_FACTOR, INCREASE_FACTOR)
+        self.update_level_of_detail()
 
     def zoom_out(self):
         self._zoom -= 1
 
         self.appdata.project.maps[self.name]["zoom"] = self._zoom
         self.scale(DECREASE_FACTOR, DECREASE_FACTOR)
+        self.update_level_of_detail()
+
+    def update_level_of_detail(self):
+        '''Below TEXT_ZOOM the line edits of the boxes are hidden and the boxes are painted as markers'''
+        low_detail = self.transform().m11() < TEXT_ZOOM
+        if low_detail != self.low_detail:
+            self.low_detail = low_detail
+            for box in self.reaction_boxes.values():
+                box.update_detail()
+        self.apply_pending_values()
 
     def mousePressEvent(self, event: QMouseEvent):
         self.drag = True
@@ -133,15 +182,11 @@ class MapView(QGraphicsView):
         modifiers = QApplication.queryKeyboardModifiers()
         if modifiers == Qt.ControlModifier:
             if self.drag:
+                # only the box layer is moved, the positions are stored on release
                 point = event.pos()
-                move_x = self.drag_start.x() - point.x()
-                move_y = self.drag_start.y() - point.y()
+                move = self.mapToScene(point) - self.mapToScene(self.drag_start)
                 self.drag_start = point
-                for key, val in self.appdata.project.maps[self.name]["boxes"].items():
-                    self.appdata.project.maps[self.name]["boxes"][key] = (
-                        val[0]-move_x, val[1]-move_y)
-                self.mapChanged.emit("dummy")
-                self.update()
+                self.box_layer.moveBy(move.x(), move.y())
         else:
             if self.drag:
                 self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
@@ -153,17 +198,28 @@ class MapView(QGraphicsView):
             self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
             self.translate(1, 1)
         self.drag = False
+        self.apply_box_layer_offset()
         super(MapView, self).mouseReleaseEvent(event)
 
-    def update_selected(self, string):
-
-        for r_id in self.reaction_boxes:
-            if string.lower() in r_id.lower():
-                self.reaction_boxes[r_id].item.setHidden(False)
-            elif string.lower() in self.reaction_boxes[r_id].name.lower():
-                self.reaction_boxes[r_id].item.setHidden(False)
-            else:
-                self.reaction_boxes[r_id].item.setHidden(True)
+    def apply_box_layer_offset(self):
+        '''Store the positions of the boxes after the box layer has been moved'''
+        offset = self.box_layer.pos()
+        if offset.isNull():
+            return
+        boxes = self.appdata.project.maps[self.name]["boxes"]
+        for key, val in boxes.items():
+            boxes[key] = (val[0] + offset.x(), val[1] + offset.y())
+        self.box_layer.setPos(0, 0)
+        for r_id, box in self.reaction_boxes.items():
+            box.setPos(*boxes[r_id])
+        self.box_grid.rebuild(boxes)
+        self.apply_pending_values()
+        self.mapChanged.emit("dummy")
+
+    def update_selected(self, matches: Set[str]):
+        '''Hide the values of the reactions that are not in matches, None shows all'''
+        for r_id, box in self.reaction_boxes.items():
+            box.set_hidden(matches is not None and r_id not in matches)
 
     def focus_reaction(self, reaction: str):
         x = self.appdata.project.maps[self.name]["boxes"][reaction][0]
@@ -176,50 +232,114 @@ class MapView(QGraphicsView):
         #     self.reaction_boxes[id].item.setHidden(True)
 
         treffer = self.reaction_boxes[string]
-        treffer.item.setHidden(False)
+        treffer.set_hidden(False)
 
         treffer.set_color(Qt.magenta)
 
     def update(self):
-        self.scene.clear()
-        background = QGraphicsSvgItem(
-            self.appdata.project.maps[self.name]["background"])
-        background.setFlags(QGraphicsItem.ItemClipsToShape)
-        background.setScale(self.appdata.project.maps[self.name]["bg-size"])
-        self.scene.addItem(background)
-
-        for r_id in self.appdata.project.maps[self.name]["boxes"]:
-            try:
-                name = self.appdata.project.cobra_py_model.reactions.get_by_id(
-                    r_id).name
-                box = ReactionBox(self, r_id, name)
-                box.setPos(self.appdata.project.maps[self.name]["boxes"][r_id]
-                           [0], self.appdata.project.maps[self.name]["boxes"][r_id][1])
-                self.scene.addItem(box)
+        '''Bring the scene in line with the map, existing items are kept and only changed where necessary'''
+        mmap = self.appdata.project.maps[self.name]
+        if self.background_file != mmap["background"]:
+            if self.background is not None:
+                self.scene.removeItem(self.background)
+            tile_dir = None
+            if self.appdata.tiles_on_disk:
+                tile_dir = os.path.join(self.appdata.temp_dir.name, "tiles")
+            self.background = MapBackground(mmap["background"], tile_dir)
+            self.background.setZValue(-1)
+            self.scene.addItem(self.background)
+            self.background_file = mmap["background"]
+        if self.background.scale() != mmap["bg-size"]:
+            self.background.setScale(mmap["bg-size"])
+
+        reactions = self.appdata.project.cobra_py_model.reactions
+        for r_id in list(self.reaction_boxes.keys()):
+            if r_id not in mmap["boxes"] or r_id not in reactions:
+                self.delete_box_item(r_id)
+
+        box_class = PaintedReactionBox if self.appdata.painted_boxes else ReactionBox
+        for r_id in mmap["boxes"]:
+            (x, y) = mmap["boxes"][r_id]
+            box = self.reaction_boxes.get(r_id, None)
+            if box is not None and type(box) is not box_class:
+                self.delete_box_item(r_id)
+                box = None
+            if box is None:
+                try:
+                    name = reactions.get_by_id(r_id).name
+                except KeyError:
+                    print("failed to add reaction box for", r_id)
+                    continue
+                box = box_class(self, r_id, name)
+                box.setParentItem(self.box_layer)
+                box.setPos(x, y)
                 self.reaction_boxes[r_id] = box
-            except KeyError:
-                print("failed to add reaction box for", r_id)
+            elif box.x() != x or box.y() != y:
+                box.setPos(x, y)
+        self.box_grid.rebuild(mmap["boxes"])
 
         self.set_values()
 
         # set scrollbars
         self.horizontalScrollBar().setValue(
-            self.appdata.project.maps[self.name]["pos"][0])
+            mmap["pos"][0])
         self.verticalScrollBar().setValue(
-            self.appdata.project.maps[self.name]["pos"][1])
+            mmap["pos"][1])
+
+    def update_reactions(self):
+        '''Update the boxes after reactions have been edited'''
+        reactions = self.appdata.project.cobra_py_model.reactions
+        for r_id in self.reaction_boxes:
+            if r_id in reactions:
+                self.reaction_boxes[r_id].update_reaction(reactions.get_by_id(r_id))
+        self.update()
 
-    def set_values(self):
-        for r_id in self.appdata.project.maps[self.name]["boxes"]:
+    def delete_box_item(self, r_id: str):
+        box = self.reaction_boxes.pop(r_id)
+        self.pending_values.pop(r_id, None)
+        box.delete_items()
+        self.scene.removeItem(box)
+
+    def set_colors(self, colors: Dict[str, QColor]):
+        '''Color the boxes of the reactions in colors until their values change'''
+        for (r_id, color) in colors.items():
+            box = self.reaction_boxes.get(r_id, None)
+            if box is not None:
+                box.set_color(color)
+
+    def set_values(self, reactions=None):
+        '''Boxes in the viewport are updated now, the others when they are scrolled into view'''
+        if reactions is None:
+            reactions = self.reaction_boxes.keys()
+        modes_coloring = self.appdata.modes_coloring
+        self.pending_values.update(
+            (r_id, modes_coloring) for r_id in reactions if r_id in self.reaction_boxes)
+        self.apply_pending_values()
+
+    def apply_pending_values(self, visible_only=True):
+        if len(self.pending_values) == 0:
+            return
+        if visible_only:
+            if not self.isVisible():
+                return
+            rect = self.mapToScene(self.viewport().rect()).boundingRect()
+            rect.translate(-self.box_layer.pos())
+            reactions = self.pending_values.keys() & self.box_grid.query(rect)
+        else:
+            reactions = set(self.pending_values)
+        for r_id in reactions:
+            modes_coloring = self.pending_values.pop(r_id)
             if r_id in self.appdata.project.scen_values.keys():
                 self.reaction_boxes[r_id].set_val_and_color(
-                    self.appdata.project.scen_values[r_id])
+                    self.appdata.project.scen_values[r_id], modes_coloring)
             elif r_id in self.appdata.project.comp_values.keys():
                 self.reaction_boxes[r_id].set_val_and_color(
-                    self.appdata.project.comp_values[r_id])
+                    self.appdata.project.comp_values[r_id], modes_coloring)
+            else:
+                self.reaction_boxes[r_id].clear_value()
 
     def remove_box(self, reaction: str):
         del self.appdata.project.maps[self.name]["boxes"][reaction]
-        del self.reaction_boxes[reaction]
         self.update()
         self.reactionRemoved.emit(reaction)
 
@@ -231,6 +351,65 @@ class MapView(QGraphicsView):
         self.reactionValueChanged.emit(reaction, value)
         self.reaction_boxes[reaction].recolor()
 
+    def edit_box(self, box):
+        '''Show the shared editor over a painted box'''
+        if self.box_editor is None:
+            self.box_editor = QLineEdit()
+            self.box_editor.setFixedWidth(BOX_WIDTH)
+            self.box_editor.textEdited.connect(self.box_editor_edited)
+            self.box_editor.editingFinished.connect(self.close_box_editor)
+            self.box_editor_proxy = self.scene.addWidget(self.box_editor)
+            self.box_editor_proxy.setParentItem(self.box_layer)
+            self.box_editor_proxy.setZValue(1)
+        self.edited_box = box
+        self.box_editor_text = box.text
+        self.box_editor.setText(box.text)
+        palette = self.box_editor.palette()
+        palette.setColor(QPalette.Base, box.color)
+        self.box_editor.setPalette(palette)
+        self.box_editor_proxy.setPos(box.pos())
+        self.box_editor_proxy.show()
+        self.box_editor.setFocus()
+        self.box_editor.selectAll()
+
+    def box_editor_edited(self, text: str):
+        if self.edited_box is not None:
+            self.edited_box.value_changed(text)
+            palette = self.box_editor.palette()
+            palette.setColor(QPalette.Base, self.edited_box.color)
+            self.box_editor.setPalette(palette)
+
+    def close_box_editor(self):
+        if self.edited_box is not None:
+            if self.box_editor.text() != self.box_editor_text and validate_value(self.box_editor.text()):
+                self.value_changed(self.edited_box.id, self.box_editor.text())
+            self.edited_box = None
+        if self.box_editor_proxy is not None:
+            self.box_editor_proxy.hide()
+
+    def show_box_menu(self, box, screen_pos):
+        '''Show the context menu shared by the painted boxes'''
+        if self.box_menu is None:
+            self.box_menu = QMenu(self)
+            maximize_action = QAction('maximize flux for this reaction', self)
+            self.box_menu.addAction(maximize_action)
+            maximize_action.triggered.connect(
+                lambda: self.menu_box.emit_maximize_action())
+            minimize_action = QAction('minimize flux for this reaction', self)
+            self.box_menu.addAction(minimize_action)
+            minimize_action.triggered.connect(
+                lambda: self.menu_box.emit_minimize_action())
+            switch_action = QAction('switch to reaction mask', self)
+            self.box_menu.addAction(switch_action)
+            switch_action.triggered.connect(
+                lambda: self.menu_box.switch_to_reaction_mask())
+            remove_action = QAction('remove from map', self)
+            self.box_menu.addAction(remove_action)
+            remove_action.triggered.connect(lambda: self.menu_box.remove())
+            self.box_menu.addSeparator()
+        self.menu_box = box
+        self.box_menu.exec_(screen_pos)
+
     switchToReactionMask = Signal(str)
     maximizeReaction = Signal(str)
     minimizeReaction = Signal(str)
@@ -251,17 +430,14 @@ class ReactionBox(QGraphicsItem):
         self.name = name
 
         self.item = QLineEdit()
-        self.item.setMaximumWidth(80)
-        r = self.map.appdata.project.cobra_py_model.reactions.get_by_id(r_id)
-        text = "Id: " + r.id + "\nName: " + r.name \
-            + "\nEquation: " + r.build_reaction_string()\
-            + "\nLowerbound: " + str(r.lower_bound) \
-            + "\nUpper bound: " + str(r.upper_bound) \
-            + "\nObjective coefficient: " + str(r.objective_coefficient)
-
-        self.item.setToolTip(text)
+        self.item.setMaximumWidth(BOX_WIDTH)
+        self.update_reaction(
+            self.map.appdata.project.cobra_py_model.reactions.get_by_id(r_id))
         self.proxy = self.map.scene.addWidget(self.item)
+        self.proxy.setParentItem(self.map.box_layer)
         self.proxy.show()
+        self.hidden = False
+        self.update_detail()
 
         palette = self.item.palette()
         palette.setColor(QPalette.Base, self.map.appdata.default_color)
@@ -294,6 +470,29 @@ class ReactionBox(QGraphicsItem):
 
         self.pop_menu.addSeparator()
 
+    def update_reaction(self, r):
+        self.name = r.name
+        text = "Id: " + r.id + "\nName: " + r.name \
+            + "\nEquation: " + r.build_reaction_string()\
+            + "\nLowerbound: " + str(r.lower_bound) \
+            + "\nUpper bound: " + str(r.upper_bound) \
+            + "\nObjective coefficient: " + str(r.objective_coefficient)
+
+        self.item.setToolTip(text)
+
+    def set_hidden(self, hidden: bool):
+        self.hidden = hidden
+        self.update_detail()
+
+    def update_detail(self):
+        self.item.setHidden(self.hidden or self.map.low_detail)
+        self.update()
+
+    def delete_items(self):
+        self.map.scene.removeItem(self.proxy)
+        self.proxy.deleteLater()
+        self.pop_menu.deleteLater()
+
     def returnPressed(self):
         if validate_value(self.item.text()):
             self.map.value_changed(self.id, self.item.text())
@@ -302,78 +501,54 @@ class ReactionBox(QGraphicsItem):
         # self.map.update()
 
     def value_changed(self):
-        test = self.item.text().replace(" ", "")
-        if test == "":
-            self.map.value_changed(self.id, test)
-            self.set_color(self.map.appdata.default_color)
-        elif validate_value(self.item.text()):
-            self.map.value_changed(self.id, self.item.text())
-            if self.id in self.map.appdata.project.scen_values.keys():
-                self.set_color(self.map.appdata.scen_color)
-            else:
-                self.set_color(self.map.appdata.comp_color)
-        else:
-            self.set_color(Qt.magenta)
+        edited_value(self, self.item.text())
 
         # TODO: actually I want to repaint
         # self.map.update()
 
-    def set_val_and_color(self, value: Tuple[float, float]):
+    def set_val_and_color(self, value: Tuple[float, float], modes_coloring: bool = None):
         self.set_value(value)
-        self.recolor()
+        self.recolor(modes_coloring)
 
     def set_value(self, value: Tuple[float, float]):
-        (vl, vu) = value
-        if isclose(vl, vu, abs_tol=self.map.appdata.abs_tol):
-            self.item.setText(str(round(vl, self.map.appdata.rounding)))
-        else:
-            self.item.setText(
-                str((round(vl, self.map.appdata.rounding), round(vu, self.map.appdata.rounding))))
-        self.item.setCursorPosition(0)
-
-    def recolor(self):
-        value = self.item.text()
-        test = value.replace(" ", "")
-        if test == "":
-            self.set_color(self.map.appdata.default_color)
-        elif validate_value(value):
-            if self.id in self.map.appdata.project.scen_values.keys():
-                value = self.map.appdata.project.scen_values[self.id]
-                self.set_color(self.map.appdata.scen_color)
-            else:
-                value = self.map.appdata.project.comp_values[self.id]
-                (vl, vu) = value
-                if math.isclose(vl, vu, abs_tol=self.map.appdata.abs_tol):
-                    if self.map.appdata.modes_coloring:
-                        if vl == 0:
-                            self.set_color(Qt.red)
-                        else:
-                            self.set_color(Qt.green)
-                    else:
-                        self.set_color(self.map.appdata.comp_color)
-                else:
-                    if math.isclose(vl, 0.0, abs_tol=self.map.appdata.abs_tol):
-                        self.set_color(self.map.appdata.special_color_1)
-                    elif math.isclose(vu, 0.0, abs_tol=self.map.appdata.abs_tol):
-                        self.set_color(self.map.appdata.special_color_1)
-                    elif vl <= 0 and vu >= 0:
-                        self.set_color(self.map.appdata.special_color_1)
-                    else:
-                        self.set_color(self.map.appdata.special_color_2)
-        else:
-            self.set_color(Qt.magenta)
+        text = format_value(self.map.appdata, value)
+        if self.item.text() != text:
+            self.item.setText(text)
+            self.item.setCursorPosition(0)
+
+    def clear_value(self):
+        if self.item.text() != "":
+            self.item.setText("")
+        self.set_color(self.map.appdata.default_color)
+
+    def recolor(self, modes_coloring: bool = None):
+        self.set_color(value_color(self.map.appdata, self.id, self.item.text(), modes_coloring))
 
     def set_color(self, color: QColor):
         palette = self.item.palette()
+        if palette.color(QPalette.Base) == QColor(color):
+            return
         palette.setColor(QPalette.Base, color)
         role = self.item.foregroundRole()
         palette.setColor(role, Qt.black)
         self.item.setPalette(palette)
 
     def boundingRect(self):
-        return QRectF(-15, -15, 20, 20)
-
-    def paint(self, painter: QPainter, _option, _widget: QWidget):
+        return QRectF(-15, -15, BOX_WIDTH + 16, BOX_HEIGHT + 16)
+
+    def shape(self):
+        path = QPainterPath()
+        if self.map.low_detail:
+            path.addRect(self.boundingRect())
+        else:  # the line edit gets the events
+            path.addRect(QRectF(-15, -15, 20, 20))
+        return path
+
+    def paint(self, painter: QPainter, option, _widget: QWidget):
+        if self.map.low_detail:
+            if not self.hidden:
+                paint_marker(painter, option, self.item.palette().color(QPalette.Base))
+            return
         # set color depending on wether the value belongs to the scenario
         if self.id in self.map.appdata.project.scen_values.keys():
             painter.setPen(Qt.magenta)
@@ -426,6 +601,230 @@ class ReactionBox(QGraphicsItem):
         self.map.drag = False
 
 
+class PaintedReactionBox(QGraphicsItem):
+    """A reaction box that paints its value, edited with the editor shared by the map"""
+
+    def __init__(self, parent: MapView, r_id: str, name):
+        QGraphicsItem.__init__(self)
+
+        self.map = parent
+        self.id = r_id
+        self.name = name
+        self.text = ""
+        self.color = QColor(self.map.appdata.default_color)
+        self.press_pos = None
+        self.update_reaction(
+            self.map.appdata.project.cobra_py_model.reactions.get_by_id(r_id))
+        self.setCursor(Qt.OpenHandCursor)
+        self.setAcceptedMouseButtons(Qt.LeftButton)
+
+    def update_reaction(self, r):
+        self.name = r.name
+        text = "Id: " + r.id + "\nName: " + r.name \
+            + "\nEquation: " + r.build_reaction_string()\
+            + "\nLowerbound: " + str(r.lower_bound) \
+            + "\nUpper bound: " + str(r.upper_bound) \
+            + "\nObjective coefficient: " + str(r.objective_coefficient)
+
+        self.setToolTip(text)
+
+    def set_hidden(self, hidden: bool):
+        self.setVisible(not hidden)
+
+    def delete_items(self):
+        if self.map.edited_box is self:
+            self.map.edited_box = None
+            self.map.box_editor_proxy.hide()
+
+    def value_changed(self, text: str):
+        self.set_text(text)
+        edited_value(self, text)
+
+    def set_val_and_color(self, value: Tuple[float, float], modes_coloring: bool = None):
+        self.set_value(value)
+        self.recolor(modes_coloring)
+
+    def set_value(self, value: Tuple[float, float]):
+        self.set_text(format_value(self.map.appdata, value))
+
+    def set_text(self, text: str):
+        if self.text != text:
+            self.text = text
+            self.update()
+
+    def clear_value(self):
+        self.set_text("")
+        self.set_color(self.map.appdata.default_color)
+
+    def recolor(self, modes_coloring: bool = None):
+        self.set_color(value_color(self.map.appdata, self.id, self.text, modes_coloring))
+
+    def set_color(self, color: QColor):
+        color = QColor(color)
+        if self.color != color:
+            self.color = color
+            self.update()
+
+    def boundingRect(self):
+        return QRectF(-15, -15, BOX_WIDTH + 16, BOX_HEIGHT + 16)
+
+    def update_detail(self):
+        pass
+
+    def paint(self, painter: QPainter, option, _widget: QWidget):
+        if self.map.low_detail:
+            paint_marker(painter, option, self.color)
+            return
+        painter.setPen(Qt.darkGray)
+        painter.setBrush(self.color)
+        painter.drawRect(QRectF(0, 0, BOX_WIDTH, BOX_HEIGHT))
+        painter.setPen(Qt.black)
+        painter.drawText(QRectF(3, 0, BOX_WIDTH - 6, BOX_HEIGHT),
+                         Qt.AlignLeft | Qt.AlignVCenter, self.text)
+
+        if self.id in self.map.appdata.project.scen_values.keys():
+            painter.setPen(Qt.magenta)
+            painter.setBrush(Qt.magenta)
+        else:
+            painter.setPen(Qt.darkGray)
+            painter.setBrush(Qt.NoBrush)
+        painter.drawRect(-15, -15, 20, 20)
+        painter.setPen(Qt.darkGray)
+        painter.drawLine(-5, 0, -5, -10)
+        painter.drawLine(0, -5, -10,  -5)
+
+    def mousePressEvent(self, event: QGraphicsSceneMouseEvent):
+        self.press_pos = event.screenPos()
+
+    def mouseMoveEvent(self, event: QGraphicsSceneMouseEvent):
+        if self.press_pos is None or (event.screenPos() - self.press_pos).manhattanLength() \
+                < QApplication.startDragDistance():
+            return
+        self.press_pos = None
+        drag = QDrag(event.widget())
+        mime = QMimeData()
+        mime.setText(str(self.id))
+        drag.setMimeData(mime)
+        drag.exec_()
+
+    def mouseReleaseEvent(self, event: QGraphicsSceneMouseEvent):
+        # a click into the value field opens the editor
+        if self.press_pos is not None and event.pos().x() >= 0 and event.pos().y() >= 0 \
+                and (event.screenPos() - self.press_pos).manhattanLength() < QApplication.startDragDistance():
+            self.map.edit_box(self)
+        self.press_pos = None
+
+    def contextMenuEvent(self, event):
+        self.map.show_box_menu(self, event.screenPos())
+
+    def remove(self):
+        self.map.remove_box(self.id)
+        self.map.drag = False
+
+    def switch_to_reaction_mask(self):
+        self.map.switchToReactionMask.emit(self.id)
+        self.map.drag = False
+
+    def emit_maximize_action(self):
+        self.map.maximizeReaction.emit(self.id)
+        self.map.drag = False
+
+    def emit_minimize_action(self):
+        self.map.minimizeReaction.emit(self.id)
+        self.map.drag = False
+
+
+class BoxGrid:
+    '''A uniform grid over the box positions of a map to find the boxes in the viewport'''
+
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Set[str]] = {}
+
+    def rebuild(self, boxes: Dict[str, Tuple[float, float]]):
+        self.cells = {}
+        for r_id, (x, y) in boxes.items():
+            self.cells.setdefault(self.cell(x, y), set()).add(r_id)
+
+    def cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def query(self, rect: QRectF) -> Set[str]:
+        '''ids of the boxes that may overlap rect'''
+        (x0, y0) = self.cell(rect.left() - BOX_WIDTH, rect.top() - BOX_HEIGHT)
+        (x1, y1) = self.cell(rect.right() + 15, rect.bottom() + 15)
+        result = set()
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            for (cx, cy), ids in self.cells.items():
+                if x0 <= cx <= x1 and y0 <= cy <= y1:
+                    result.update(ids)
+        else:
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    result.update(self.cells.get((cx, cy), ()))
+        return result
+
+
+def paint_marker(painter: QPainter, option, color: QColor):
+    '''A box far out of zoom, the frame is only drawn while it is visible'''
+    painter.setBrush(color)
+    if option.levelOfDetailFromTransform(painter.worldTransform()) < MARKER_ZOOM:
+        painter.setPen(Qt.NoPen)
+    else:
+        painter.setPen(Qt.darkGray)
+    painter.drawRect(QRectF(0, 0, BOX_WIDTH, BOX_HEIGHT))
+
+
+def format_value(appdata: CnaData, value: Tuple[float, float]) -> str:
+    (vl, vu) = value
+    if isclose(vl, vu, abs_tol=appdata.abs_tol):
+        return str(round(vl, appdata.rounding))
+    return str((round(vl, appdata.rounding), round(vu, appdata.rounding)))
+
+
+def edited_value(box, text: str):
+    '''Pass an edited value of a box on to the map and color the box'''
+    test = text.replace(" ", "")
+    if test == "":
+        box.map.value_changed(box.id, test)
+        box.set_color(box.map.appdata.default_color)
+    elif validate_value(text):
+        box.map.value_changed(box.id, text)
+        if box.id in box.map.appdata.project.scen_values.keys():
+            box.set_color(box.map.appdata.scen_color)
+        else:
+            box.set_color(box.map.appdata.comp_color)
+    else:
+        box.set_color(Qt.magenta)
+
+
+def value_color(appdata: CnaData, r_id: str, value: str, modes_coloring: bool = None):
+    '''The color of a box that shows value, by default in the current coloring mode of appdata'''
+    if modes_coloring is None:
+        modes_coloring = appdata.modes_coloring
+    test = value.replace(" ", "")
+    if test == "":
+        return appdata.default_color
+    if not validate_value(value):
+        return Qt.magenta
+    if r_id in appdata.project.scen_values.keys():
+        return appdata.scen_color
+    (vl, vu) = appdata.project.comp_values[r_id]
+    if math.isclose(vl, vu, abs_tol=appdata.abs_tol):
+        if modes_coloring:
+            if vl == 0:
+                return Qt.red
+            return Qt.green
+        return appdata.comp_color
+    if math.isclose(vl, 0.0, abs_tol=appdata.abs_tol):
+        return appdata.special_color_1
+    if math.isclose(vu, 0.0, abs_tol=appdata.abs_tol):
+        return appdata.special_color_1
+    if vl <= 0 and vu >= 0:
+        return appdata.special_color_1
+    return appdata.special_color_2
+
+
 def validate_value(value):
     try:
         _x = float(value)
@@ -1,9 +1,12 @@
 """The dialog for calculating minimal cut sets"""
 
+import functools
 import io
 import os
 import traceback
 
+import appdirs
+import numpy
 from qtpy.QtCore import Qt, Slot
 from qtpy.QtWidgets import (QButtonGroup, QCheckBox, QComboBox, QCompleter,
                             QDialog, QGroupBox, QHBoxLayout, QHeaderView,
@@ -13,6 +16,10 @@ import optlang_enumerator.cMCS_enumerator as cMCS_enumerator
 import cobra
 from cobra.util.solver import interface_to_str
 from cnapy.cnadata import CnaData
+from cnapy.cut_set_container import CutSetContainer
+from cnapy.job_runner import Job
+from cnapy.mcs_enumeration import (InfeasibleRegion, enumerate_mcs,
+                                   enumerate_mcs_parallel)
 
 
 class MCSDialog(QDialog):
@@ -109,6 +116,22 @@ class MCSDialog(QDialog):
         self.gen_kos = QCheckBox("Gene KOs")
         self.exclude_boundary = QCheckBox(
             "Exclude boundary\nreactions as cuts")
+        self.compress = QCheckBox("Compress network")
+        self.compress.setToolTip("Removes blocked reactions, lumps coupled reactions and merges\n"
+                                 "parallel reactions before the computation. The cut sets are\n"
+                                 "expanded to the reactions of the model afterwards.")
+        self.compress.setChecked(True)
+        self.resume = QCheckBox("Save progress and\nresume interrupted runs")
+        self.resume.setToolTip("The cut sets found so far are saved regularly. When the same\n"
+                               "computation is started again it continues from there.")
+        self.resume.setChecked(True)
+        processes = cobra.Configuration().processes
+        self.parallel = QCheckBox(
+            "Split the search over\n" + str(processes) + " processes")
+        self.parallel.setToolTip("Each process searches the cut sets that contain or do not contain\n"
+                                 "certain reactions. Cut sets are shown when a part of the search is done.\n"
+                                 "The number of processes is set in the COBRApy configuration.")
+        self.parallel.toggled.connect(self.configure_solver_options)
         sg1 = QHBoxLayout()
         s31 = QVBoxLayout()
         l = QLabel("Max. Solutions")
@@ -134,6 +157,9 @@ class MCSDialog(QDialog):
         sg1.addItem(s32)
         sgx.addWidget(self.gen_kos)
         sgx.addWidget(self.exclude_boundary)
+        sgx.addWidget(self.compress)
+        sgx.addWidget(self.resume)
+        sgx.addWidget(self.parallel)
         sgx.addItem(sg1)
         s3.addItem(sgx)
 
@@ -253,6 +279,10 @@ class MCSDialog(QDialog):
             self.gen_kos.setChecked(False)
             self.gen_kos.setEnabled(False)
             self.exclude_boundary.setEnabled(True)
+            self.compress.setEnabled(True)
+            self.parallel.setEnabled(cobra.Configuration().processes > 1)
+            # a split search has no checkpoints
+            self.resume.setEnabled(not self.parallel.isChecked())
             if optlang_solver_name != 'cplex':
                 if self.mcs_by_cardinality.isChecked():
                     self.mcs_by_cardinality.setChecked(False)
@@ -264,6 +294,10 @@ class MCSDialog(QDialog):
             self.gen_kos.setEnabled(True)
             self.exclude_boundary.setChecked(False)
             self.exclude_boundary.setEnabled(False)
+            self.compress.setEnabled(False)
+            self.resume.setEnabled(False)
+            self.parallel.setChecked(False)
+            self.parallel.setEnabled(False)
             self.mcs_by_cardinality.setEnabled(True)
 
     def add_target_region(self):
@@ -463,22 +497,11 @@ class MCSDialog(QDialog):
             QMessageBox.information(self, 'No cut sets',
                                           'Cut sets have not been calculated or do not exist.')
         else:
-            last_mcs = 1
-            omcs = []
-            current_mcs = {}
-            for i in range(0, len(reactions)):
-                reacid = int(reactions[i][0])
-                reaction = reac_id[reacid-1]
-                c_mcs = int(mcs[i][0])
-                c_value = int(values[i][0])
-                if c_value == -1:  # -1 stands for removed which is 0 in the ui
-                    c_value = 0
-                if c_mcs > last_mcs:
-                    omcs.append(current_mcs)
-                    last_mcs = c_mcs
-                    current_mcs = {}
-                current_mcs[reaction] = c_value
-            omcs.append(current_mcs)
+            values = numpy.asarray(values, dtype=numpy.int8)
+            values[values == -1] = 0  # -1 stands for removed which is 0 in the ui
+            omcs = CutSetContainer.from_triples(
+                numpy.asarray(reactions, dtype=int) - 1, numpy.asarray(mcs, dtype=int) - 1,
+                values, list(reac_id))
             self.appdata.project.modes = omcs
             self.centralwidget.mode_navigator.current = 0
             QMessageBox.information(self, 'Cut sets found',
@@ -490,12 +513,10 @@ class MCSDialog(QDialog):
         self.setCursor(Qt.ArrowCursor)
 
     def compute_optlang(self):
-
-        self.setCursor(Qt.BusyCursor)
         max_mcs_num = float(self.max_solu.text())
         max_mcs_size = int(self.max_size.text())
         timeout = float(self.time_limit.text())
-        if timeout is float('inf'):
+        if timeout == float('inf'):
             timeout = None
 
         # if self.gen_kos.isChecked():
@@ -514,80 +535,100 @@ class MCSDialog(QDialog):
         elif self.any_mcs.isChecked():
             enum_method = 3
 
-        with self.appdata.project.cobra_py_model as model:
-            if self.consider_scenario.isChecked():  # integrate scenario into model bounds
-                for r in self.appdata.project.scen_values.keys():
-                    model.reactions.get_by_id(
-                        r).bounds = self.appdata.project.scen_values[r]
-            reac_id = model.reactions.list_attr("id")
-            reac_id_symbols = cMCS_enumerator.get_reac_id_symbols(reac_id)
-            rows = self.target_list.rowCount()
-            targets = dict()
-            for i in range(0, rows):
-                p1 = self.target_list.cellWidget(i, 0).text()
-                p2 = self.target_list.cellWidget(i, 1).text()
-                if len(p1) > 0 and len(p2) > 0:
-                    if self.target_list.cellWidget(i, 2).currentText() == '≤':
-                        p3 = "<="
-                    else:
-                        p3 = ">="
-                    p4 = float(self.target_list.cellWidget(i, 3).text())
-                    targets.setdefault(p1, []).append((p2, p3, p4))
-            targets = list(targets.values())
-            targets = [cMCS_enumerator.relations2leq_matrix(cMCS_enumerator.parse_relations(
-                t, reac_id_symbols=reac_id_symbols), reac_id) for t in targets]
-
-            rows = self.desired_list.rowCount()
-            desired = dict()
-            for i in range(0, rows):
-                p1 = self.desired_list.cellWidget(i, 0).text()
-                p2 = self.desired_list.cellWidget(i, 1).text()
-                if len(p1) > 0 and len(p2) > 0:
-                    if self.desired_list.cellWidget(i, 2).currentText() == '≤':
-                        p3 = "<="
-                    else:
-                        p3 = ">="
-                    p4 = float(self.desired_list.cellWidget(i, 3).text())
-                    desired.setdefault(p1, []).append((p2, p3, p4))
-
-            desired = list(desired.values())
-            desired = [cMCS_enumerator.relations2leq_matrix(cMCS_enumerator.parse_relations(
-                d, reac_id_symbols=reac_id_symbols), reac_id) for d in desired]
-
-            try:
-                mcs = cMCS_enumerator.compute_mcs(model,
-                                                  targets=targets,
-                                                  desired=desired,
-                                                  enum_method=enum_method,
-                                                  max_mcs_size=max_mcs_size,
-                                                  max_mcs_num=max_mcs_num,
-                                                  timeout=timeout,
-                                                  exclude_boundary_reactions_as_cuts=self.exclude_boundary.isChecked())
-            except cMCS_enumerator.InfeasibleRegion as e:
-                QMessageBox.warning(self, 'Cannot calculate MCS', str(e))
-                return targets, desired
-            except Exception:
-                output = io.StringIO()
-                traceback.print_exc(file=output)
-                exstr = output.getvalue()
-                print(exstr)
-                QMessageBox.warning(self, 'An exception has occured!',
-                                    exstr+'\nPlease report the problem to:\n\
-                                    \nhttps://github.com/cnapy-org/CNApy/issues')
-                return targets, desired
-            finally:
-                self.setCursor(Qt.ArrowCursor)
+        # the job works on its own copy of the model
+        model = self.appdata.project.cobra_py_model.copy()
+        if self.consider_scenario.isChecked():  # integrate scenario into model bounds
+            for r in self.appdata.project.scen_values.keys():
+                model.reactions.get_by_id(
+                    r).bounds = self.appdata.project.scen_values[r]
+        reac_id = model.reactions.list_attr("id")
+        reac_id_symbols = cMCS_enumerator.get_reac_id_symbols(reac_id)
+        rows = self.target_list.rowCount()
+        targets = dict()
+        for i in range(0, rows):
+            p1 = self.target_list.cellWidget(i, 0).text()
+            p2 = self.target_list.cellWidget(i, 1).text()
+            if len(p1) > 0 and len(p2) > 0:
+                if self.target_list.cellWidget(i, 2).currentText() == '≤':
+                    p3 = "<="
+                else:
+                    p3 = ">="
+                p4 = float(self.target_list.cellWidget(i, 3).text())
+                targets.setdefault(p1, []).append((p2, p3, p4))
+        targets = list(targets.values())
+        targets = [cMCS_enumerator.relations2leq_matrix(cMCS_enumerator.parse_relations(
+            t, reac_id_symbols=reac_id_symbols), reac_id) for t in targets]
 
+        rows = self.desired_list.rowCount()
+        desired = dict()
+        for i in range(0, rows):
+            p1 = self.desired_list.cellWidget(i, 0).text()
+            p2 = self.desired_list.cellWidget(i, 1).text()
+            if len(p1) > 0 and len(p2) > 0:
+                if self.desired_list.cellWidget(i, 2).currentText() == '≤':
+                    p3 = "<="
+                else:
+                    p3 = ">="
+                p4 = float(self.desired_list.cellWidget(i, 3).text())
+                desired.setdefault(p1, []).append((p2, p3, p4))
+
+        desired = list(desired.values())
+        desired = [cMCS_enumerator.relations2leq_matrix(cMCS_enumerator.parse_relations(
+            d, reac_id_symbols=reac_id_symbols), reac_id) for d in desired]
+
+        mcs = CutSetContainer.from_reactions([], reac_id)
+        if self.parallel.isChecked():
+            job = Job("MCS", enumerate_mcs_parallel, model, targets, desired,
+                      enum_method, max_mcs_size, max_mcs_num, timeout,
+                      self.exclude_boundary.isChecked(),
+                      compress=self.compress.isChecked())
+        else:
+            checkpoint_dir = None
+            if self.resume.isChecked():
+                checkpoint_dir = os.path.join(appdirs.user_cache_dir(
+                    "cnapy", appauthor=False), "mcs")
+            job = Job("MCS", enumerate_mcs, model, targets, desired, enum_method,
+                      max_mcs_size, max_mcs_num, timeout,
+                      self.exclude_boundary.isChecked(), checkpoint_dir,
+                      compress=self.compress.isChecked())
+        # the slots are bound to this job and its container, only one job runs at a time
+        job.partialResult.connect(functools.partial(self.add_mcs, mcs))
+        job.resultReady.connect(functools.partial(self.mcs_finished, job, mcs))
+        job.aborted.connect(functools.partial(self.mcs_finished, job, mcs))
+        job.failed.connect(self.mcs_failed)
+        self.compute_mcs.setEnabled(False)
+        self.appdata.window.job_runner.submit(job)
+
+    def add_mcs(self, container: CutSetContainer, mcs):
+        '''Show the cut sets in the mode navigator as soon as they are found'''
+        first = len(container) == 0
+        container.extend(mcs)
+        if first:
+            self.appdata.project.modes = container
+            self.centralwidget.mode_navigator.current = 0
+            self.centralwidget.mode_navigator.title.setText("MCS Navigation")
+            self.centralwidget.update_mode()
+        else:
+            self.centralwidget.mode_navigator.update()
+
+    def mcs_finished(self, job: Job, mcs: CutSetContainer, _result=None):
+        self.compute_mcs.setEnabled(True)
+        # cut sets that were found while the job was being cancelled
+        result = job.result
+        if result is not None and len(result) > len(mcs):
+            self.add_mcs(mcs, result[len(mcs):])
         if len(mcs) == 0:
             QMessageBox.information(self, 'No cut sets',
                                           'Cut sets have not been calculated or do not exist.')
-            return targets, desired
-
-        omcs = [{reac_id[i]: 0 for i in m} for m in mcs]
-        self.appdata.project.modes = omcs
-        self.centralwidget.mode_navigator.current = 0
-        QMessageBox.information(self, 'Cut sets found',
-                                      str(len(omcs))+' Cut sets have been calculated.')
+        else:
+            QMessageBox.information(self, 'Cut sets found',
+                                          str(len(mcs))+' Cut sets have been calculated.')
 
-        self.centralwidget.update_mode()
-        self.centralwidget.mode_navigator.title.setText("MCS Navigation")
+    def mcs_failed(self, exception: Exception, exstr: str):
+        self.compute_mcs.setEnabled(True)
+        if isinstance(exception, InfeasibleRegion):
+            QMessageBox.warning(self, 'Cannot calculate MCS', str(exception))
+        else:
+            QMessageBox.warning(self, 'An exception has occured!',
+                                exstr+'\nPlease report the problem to:\n\
+                                \nhttps://github.com/cnapy-org/CNApy/issues')
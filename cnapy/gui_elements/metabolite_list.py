@@ -1,16 +1,82 @@
 """The metabolite list"""
+from typing import Dict, List, Set
 
 import cobra
-from qtpy.QtCore import Qt, Signal
+from qtpy.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
 from qtpy.QtWidgets import (QAction, QHBoxLayout, QHeaderView, QLabel,
                             QLineEdit, QMenu, QMessageBox, QPushButton,
                             QSplitter, QTableWidget, QTableWidgetItem,
-                            QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget)
+                            QTreeView, QTreeWidget, QTreeWidgetItem,
+                            QVBoxLayout, QWidget)
 
 from cnapy.cnadata import CnaData
+from cnapy.gui_elements.reactions_list import SORT_ROLE, SearchFilter
 from cnapy.utils import SignalThrottler, turn_red, turn_white
 
 
+class MetaboliteTableModel(QAbstractTableModel):
+    '''The metabolites of the cobra model, updates report only the rows that changed'''
+
+    def __init__(self, appdata: CnaData):
+        QAbstractTableModel.__init__(self)
+        self.appdata = appdata
+        self.metabolites: List[cobra.Metabolite] = []
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.metabolites)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return 2
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return ["Id", "Name"][section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, SORT_ROLE):
+            if index.column() == 0:
+                return self.ids[index.row()]
+            return self.names[index.row()]
+        return None
+
+    def metabolite(self, row: int) -> cobra.Metabolite:
+        return self.metabolites[row]
+
+    def row(self, metabolite_id: str) -> int:
+        return self.rows.get(metabolite_id, -1)
+
+    def update(self):
+        '''Reset the model if metabolites were added or removed, otherwise report the changed rows'''
+        metabolites = self.appdata.project.cobra_py_model.metabolites
+        if len(metabolites) != len(self.metabolites) or \
+                any(a is not b for a, b in zip(metabolites, self.metabolites)):
+            self.beginResetModel()
+            self.metabolites = list(metabolites)
+            self.ids = [m.id for m in self.metabolites]
+            self.names = [m.name for m in self.metabolites]
+            self.rows = {m: i for i, m in enumerate(self.ids)}
+            self.endResetModel()
+            return
+
+        changed = []
+        for i, m in enumerate(self.metabolites):
+            if m.id != self.ids[i] or m.name != self.names[i]:
+                self.ids[i] = m.id
+                self.names[i] = m.name
+                changed.append(i)
+        if len(changed) > 0:
+            self.rows = {m: i for i, m in enumerate(self.ids)}
+            self.dataChanged.emit(self.index(changed[0], 0), self.index(changed[-1], 1))
+
+
 class MetaboliteList(QWidget):
     """A list of metabolites"""
 
@@ -19,12 +85,17 @@ class MetaboliteList(QWidget):
         self.appdata = appdata
         self.last_selected = None
 
-        self.metabolite_list = QTreeWidget()
-        self.metabolite_list.setHeaderLabels(["Id", "Name"])
+        self.model = MetaboliteTableModel(self.appdata)
+        self.proxy = SearchFilter()
+        self.proxy.setSourceModel(self.model)
+        self.metabolite_list = QTreeView()
+        self.metabolite_list.setRootIsDecorated(False)
+        self.metabolite_list.setUniformRowHeights(True)
+        self.metabolite_list.setModel(self.proxy)
         self.metabolite_list.setSortingEnabled(True)
+        self.metabolite_list.sortByColumn(-1, Qt.AscendingOrder)
 
-        for m in self.appdata.project.cobra_py_model.metabolites:
-            self.add_metabolite(m)
+        self.model.update()
         self.metabolite_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.metabolite_list.customContextMenuRequested.connect(
             self.on_context_menu)
@@ -49,22 +120,22 @@ class MetaboliteList(QWidget):
         self.layout.addWidget(self.splitter)
         self.setLayout(self.layout)
 
-        self.metabolite_list.currentItemChanged.connect(
-            self.metabolite_selected)
+        self.metabolite_list.selectionModel().currentChanged.connect(
+            self.current_changed)
         self.metabolite_mask.metaboliteChanged.connect(
             self.handle_changed_metabolite)
         self.metabolite_mask.jumpToReaction.connect(
             self.emit_jump_to_reaction)
 
     def clear(self):
-        self.metabolite_list.clear()
+        self.model.update()
         self.metabolite_mask.hide()
 
-    def add_metabolite(self, metabolite):
-        item = QTreeWidgetItem(self.metabolite_list)
-        item.setText(0, metabolite.id)
-        item.setText(1, metabolite.name)
-        item.setData(2, 0, metabolite)
+    def current_metabolite(self) -> cobra.Metabolite:
+        index = self.metabolite_list.currentIndex()
+        if not index.isValid():
+            return None
+        return self.model.metabolite(self.proxy.mapToSource(index).row())
 
     def on_context_menu(self, point):
         if len(self.appdata.project.cobra_py_model.metabolites) > 0:
@@ -90,38 +161,25 @@ class MetaboliteList(QWidget):
             self.metabolite_mask.throttler.throttle)
 
     def handle_changed_metabolite(self, metabolite: cobra.Metabolite):
-        # Update metabolite item in list
-        root = self.metabolite_list.invisibleRootItem()
-        child_count = root.childCount()
-        for i in range(child_count):
-            item = root.child(i)
-            if item.data(2, 0) == metabolite:
-                old_id = item.text(0)
-                item.setText(0, metabolite.id)
-                item.setText(1, metabolite.name)
-                break
+        # Update metabolite row in list
+        row = next((i for i, m in enumerate(self.model.metabolites) if m is metabolite), -1)
+        old_id = self.model.ids[row] if row >= 0 else metabolite.id
+        self.model.update()
 
         self.last_selected = self.metabolite_mask.id.text()
         self.metaboliteChanged.emit(old_id, metabolite)
 
-    def update_selected(self, string):
-        root = self.metabolite_list.invisibleRootItem()
-        child_count = root.childCount()
-        for i in range(child_count):
-            item = root.child(i)
-            item.setHidden(True)
+    def update_selected(self, matches: Set[str]):
+        self.proxy.set_matches(matches)
 
-        for item in self.metabolite_list.findItems(string, Qt.MatchContains, 0):
-            item.setHidden(False)
-        for item in self.metabolite_list.findItems(string, Qt.MatchContains, 1):
-            item.setHidden(False)
+    def current_changed(self, _current, _previous):
+        self.metabolite_selected(self.current_metabolite())
 
-    def metabolite_selected(self, item, _column):
-        if item is None:
+    def metabolite_selected(self, metabolite: cobra.Metabolite):
+        if metabolite is None:
             self.metabolite_mask.hide()
         else:
             self.metabolite_mask.show()
-            metabolite: cobra.Metabolite = item.data(2, 0)
 
             self.metabolite_mask.metabolite = metabolite
 
@@ -145,19 +203,14 @@ class MetaboliteList(QWidget):
             self.metabolite_mask.update_state()
 
     def update(self):
-        self.metabolite_list.clear()
-        for m in self.appdata.project.cobra_py_model.metabolites:
-            self.add_metabolite(m)
-
-        if self.last_selected is None:
-            pass
-        else:
-            items = self.metabolite_list.findItems(
-                self.last_selected, Qt.MatchExactly)
+        self.model.update()
 
-            for i in items:
-                self.metabolite_list.setCurrentItem(i)
-                break
+        if self.last_selected is not None:
+            row = self.model.row(self.last_selected)
+            if row >= 0:
+                index = self.proxy.mapFromSource(self.model.index(row, 0))
+                if index.isValid() and index != self.metabolite_list.currentIndex():
+                    self.metabolite_list.setCurrentIndex(index)
 
     def set_current_item(self, key):
         self.last_selected = key
@@ -167,7 +220,7 @@ class MetaboliteList(QWidget):
         self.jumpToReaction.emit(reaction)
 
     def emit_in_out_fluxes_action(self):
-        self.computeInOutFlux.emit(self.metabolite_list.currentItem().text(0))
+        self.computeInOutFlux.emit(self.current_metabolite().id)
 
     itemActivated = Signal(str)
     metaboliteChanged = Signal(str, cobra.Metabolite)
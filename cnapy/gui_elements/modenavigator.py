@@ -1,9 +1,11 @@
+import numpy
 from qtpy.QtCore import Qt, Signal
 from qtpy.QtGui import QIcon
-from qtpy.QtWidgets import (QHBoxLayout, QLabel, QPushButton, QVBoxLayout,
-                            QWidget)
+from qtpy.QtWidgets import (QHBoxLayout, QLabel, QLineEdit, QMessageBox,
+                            QPushButton, QVBoxLayout, QWidget)
 
 from cnapy.flux_vector_container import FluxVectorContainer
+from cnapy.mode_query import ModeQuery
 
 class ModeNavigator(QWidget):
     """A navigator widget"""
@@ -13,7 +15,10 @@ class ModeNavigator(QWidget):
         self.appdata = appdata
         self.current = 0
         self.scenario = {}
-        self.setFixedHeight(70)
+        self.mode_query = None
+        self.query = None  # the applied filter
+        self.selection = None  # indices of the modes that match the filter
+        self.setFixedHeight(100)
         self.layout = QVBoxLayout()
         self.layout.setContentsMargins(0, 0, 0, 0)
 
@@ -38,16 +43,34 @@ class ModeNavigator(QWidget):
         l2.addWidget(self.label)
         l2.addWidget(self.next_button)
 
+        self.filter = QLineEdit()
+        self.filter.setPlaceholderText(
+            "Filter e.g.: PGI !EDD R1>0 size<=20 yield(P/S)>=0.8")
+        self.filter.setToolTip("Show only the modes that use (R) or do not use (!R) a reaction,\n"
+                               "have a flux in a range (R>0, R<=2.5), a number of reactions (size<=20)\n"
+                               "or a yield of P on S (yield(P/S)>=0.8). Press enter to apply.")
+
         self.layout.addLayout(l1)
         self.layout.addLayout(l2)
+        self.layout.addWidget(self.filter)
         self.setLayout(self.layout)
 
         self.prev_button.clicked.connect(self.prev)
         self.next_button.clicked.connect(self.next)
         self.clear_button.clicked.connect(self.clear)
+        self.filter.returnPressed.connect(self.apply_filter)
 
     def update(self):
+        if self.mode_query is not None and self.mode_query.modes is not self.appdata.project.modes:
+            self.reset_filter()
+        elif self.selection is not None and self.mode_query.refresh():
+            # modes that are added while they are computed are filtered too
+            self.selection = self.mode_query.select(self.query)
         txt = str(self.current + 1) + "/" + str(len(self.appdata.project.modes))
+        if self.selection is not None:
+            pos = numpy.searchsorted(self.selection, self.current)
+            txt = str(pos + 1) + "/" + str(len(self.selection)) + \
+                " filtered (" + txt + ")"
         if isinstance(self.appdata.project.modes, FluxVectorContainer):
             if self.appdata.project.modes.irreversible.shape != ():
                 if self.appdata.project.modes.irreversible[self.current]:
@@ -61,33 +84,69 @@ class ModeNavigator(QWidget):
                     txt = txt + " bounded"
         self.label.setText(txt)
 
+    def apply_filter(self):
+        query = self.filter.text().strip()
+        if query == "":
+            self.query = None
+            self.selection = None
+        else:
+            if self.mode_query is None or self.mode_query.modes is not self.appdata.project.modes:
+                self.mode_query = ModeQuery(self.appdata.project.modes)
+            self.setCursor(Qt.BusyCursor)
+            try:
+                selection = self.mode_query.select(query)
+            except ValueError as e:
+                QMessageBox.warning(self, 'Invalid filter', str(e))
+                return
+            finally:
+                self.setCursor(Qt.ArrowCursor)
+            if len(selection) == 0:
+                QMessageBox.information(self, 'No modes',
+                                        'No mode matches the filter.')
+                return
+            self.query = query
+            self.selection = selection
+            self.current = int(selection[0])
+
+        self.update()
+        self.changedCurrentMode.emit(self.current)
+
+    def reset_filter(self):
+        self.mode_query = None
+        self.query = None
+        self.selection = None
+        self.filter.clear()
+
     def clear(self):
+        self.reset_filter()
         self.appdata.project.modes.clear()
         self.appdata.recreate_scenario_from_history()
         self.hide()
         self.modeNavigatorClosed.emit()
 
     def prev(self):
-        if self.current == 0:
+        if self.selection is not None:
+            pos = numpy.searchsorted(self.selection, self.current)
+            self.current = int(self.selection[pos - 1])  # wraps around at 0
+        elif self.current == 0:
             self.current = len(self.appdata.project.modes)-1
         else:
             self.current -= 1
 
-        self.appdata.modes_coloring = True
         self.update()
         self.changedCurrentMode.emit(self.current)
-        self.appdata.modes_coloring = False
 
     def next(self):
-        if self.current == len(self.appdata.project.modes)-1:
+        if self.selection is not None:
+            pos = numpy.searchsorted(self.selection, self.current, side='right')
+            self.current = int(self.selection[pos % len(self.selection)])
+        elif self.current == len(self.appdata.project.modes)-1:
             self.current = 0
         else:
             self.current += 1
 
-        self.appdata.modes_coloring = True
         self.update()
         self.changedCurrentMode.emit(self.current)
-        self.appdata.modes_coloring = False
 
     changedCurrentMode = Signal(int)
     modeNavigatorClosed = Signal()
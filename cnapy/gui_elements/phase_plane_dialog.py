@@ -4,7 +4,9 @@ import matplotlib.pyplot as plt
 from qtpy.QtCore import Qt, Signal
 from qtpy.QtWidgets import (QCompleter, QDialog, QHBoxLayout, QLabel,
                             QLineEdit, QPushButton, QVBoxLayout)
-import numpy
+
+from cnapy.job_runner import Job
+from cnapy.phase_plane import production_envelope
 
 
 class CompleterLineEdit(QLineEdit):
@@ -68,8 +70,16 @@ class PhasePlaneDialog(QDialog):
         self.y_axis.setPlaceholderText("Enter reaction Id")
         self.y_axis.setCompleter(completer)
         l2.addWidget(self.y_axis)
+        l4 = QHBoxLayout()
+        t4 = QLabel("Reaction (z-axis):")
+        l4.addWidget(t4)
+        self.z_axis = QLineEdit("")
+        self.z_axis.setPlaceholderText("Optional reaction Id for a 3D plot")
+        self.z_axis.setCompleter(completer)
+        l4.addWidget(self.z_axis)
         self.layout.addItem(l1)
         self.layout.addItem(l2)
+        self.layout.addItem(l4)
         l3 = QHBoxLayout()
         self.button = QPushButton("Plot")
         self.cancel = QPushButton("Close")
@@ -83,43 +93,32 @@ class PhasePlaneDialog(QDialog):
         self.button.clicked.connect(self.compute)
 
     def compute(self):
-        self.setCursor(Qt.BusyCursor)
-        with self.appdata.project.cobra_py_model as model:
-            self.appdata.project.load_scenario_into_model(model)
-            x_axis = self.x_axis.text()
-            y_axis = self.y_axis.text()
-            try:
-                x_reac_idx = model.reactions.index(x_axis)
-                y_reac_idx = model.reactions.index(y_axis)
-            except KeyError:
-                return
-            points = 100
-            with model as ppmodel:
-                ppmodel.objective = ppmodel.reactions[x_reac_idx]
-                ppmodel.objective.direction = 'min'
-                x_lb = ppmodel.slim_optimize()
-                ppmodel.objective.direction = 'max'
-                x_ub = ppmodel.slim_optimize()
-            result2 = numpy.zeros((points, 3))
-            result2[:, 0] = numpy.linspace(x_lb, x_ub, num=points)
-            var = numpy.linspace(x_lb, x_ub, num=points)
-            lb = numpy.full(points, numpy.nan)
-            ub = numpy.full(points, numpy.nan)
-            with model as ppmodel:
-                ppmodel.objective = ppmodel.reactions[y_reac_idx]
-                for i in range(points):
-                    # without second context the original reaction bounds are not restored (?)
-                    with ppmodel as ppmodel2:
-                        ppmodel2.reactions[x_reac_idx].lower_bound = result2[i, 0]
-                        ppmodel2.reactions[x_reac_idx].upper_bound = result2[i, 0]
-                        ppmodel2.objective.direction = 'min'
-                        lb[i] = result2[i, 1] = ppmodel2.slim_optimize()
-                        ppmodel2.objective.direction = 'max'
-                        ub[i] = result2[i, 2] = ppmodel2.slim_optimize()
-
+        x_axis = self.x_axis.text()
+        y_axis = self.y_axis.text()
+        z_axis = self.z_axis.text().strip()
+        reactions = self.appdata.project.cobra_py_model.reactions
+        if x_axis not in reactions or y_axis not in reactions:
+            return
+        if z_axis == "":
+            z_axis = None
+        elif z_axis not in reactions:
+            return
+
+        lp_cache = self.appdata.project.lp_cache
+        job = Job("Phase plane", production_envelope, lp_cache,
+                  lp_cache.snapshot(self.appdata.project.cobra_py_model, self.appdata.project.scen_values),
+                  x_axis, y_axis, z_axis)
+        job.resultReady.connect(
+            lambda result: self.plot(result, x_axis, y_axis, z_axis))
+        job.failed.connect(self.appdata.window.show_job_error)
+        self.appdata.window.job_runner.submit(job)
+
+    def plot(self, result, x_axis: str, y_axis: str, z_axis: str):
+        if z_axis is None:
+            (var, lb, ub) = result
             _fig, axes = plt.subplots()
-            axes.set_xlabel(model.reactions[x_reac_idx].id)
-            axes.set_ylabel(model.reactions[y_reac_idx].id)
+            axes.set_xlabel(x_axis)
+            axes.set_ylabel(y_axis)
             x = [v for v in var] + [v for v in reversed(var)]
             y = [v for v in lb] + [v for v in reversed(ub)]
             if lb[0] != ub[0]:
@@ -127,8 +126,15 @@ class PhasePlaneDialog(QDialog):
                 y.extend([lb[0], ub[0]])
 
             plt.plot(x, y)
-            plt.show()
+        else:
+            (X, Y, Z_min, Z_max) = result
+            fig = plt.figure()
+            axes = fig.add_subplot(projection='3d')
+            axes.set_xlabel(x_axis)
+            axes.set_ylabel(y_axis)
+            axes.set_zlabel(z_axis)
+            axes.plot_surface(X, Y, Z_min, alpha=0.5)
+            axes.plot_surface(X, Y, Z_max, alpha=0.5)
+        plt.show()
 
         self.appdata.window.centralWidget().show_bottom_of_console()
-
-        self.setCursor(Qt.ArrowCursor)
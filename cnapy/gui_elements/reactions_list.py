@@ -1,25 +1,229 @@
 """The reactions list"""
-from math import isclose
+from math import inf, isclose
+from typing import Dict, List, Set, Tuple
 
 import cobra
-from qtpy.QtCore import QMimeData, Qt, Signal, Slot
-from qtpy.QtGui import QDrag, QIcon
+from qtpy.QtCore import (QAbstractTableModel, QMimeData, QModelIndex,
+                         QSortFilterProxyModel, Qt, Signal, Slot)
+from qtpy.QtGui import QColor, QDrag, QIcon
 from qtpy.QtWidgets import (QHBoxLayout, QHeaderView, QLabel, QLineEdit,
                             QMessageBox, QPushButton, QSizePolicy, QSplitter,
-                            QTableWidget, QTableWidgetItem, QTreeWidget,
-                            QTreeWidgetItem, QVBoxLayout, QWidget)
+                            QTableWidget, QTableWidgetItem, QTreeView,
+                            QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget)
 
 from cnapy.cnadata import CnaData
 from cnapy.utils import SignalThrottler, turn_red, turn_white
 
+SORT_ROLE = Qt.UserRole
 
-class DragableTreeWidget(QTreeWidget):
+
+class ReactionTableModel(QAbstractTableModel):
+    '''
+    The reactions of the cobra model with their values from the scenario and
+    the computed values. Nothing is copied except for the shown values so
+    that updates can report only the rows that changed.
+    '''
+
+    def __init__(self, appdata: CnaData):
+        QAbstractTableModel.__init__(self)
+        self.appdata = appdata
+        self.reactions: List[cobra.Reaction] = []
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.values: List[Tuple[str, QColor, float]] = []
+        self.backgrounds: Dict[int, QColor] = {}
+        self.rows: Dict[str, int] = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.reactions)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return 3
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return ["Id", "Name", "Flux"][section]
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = index.row()
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return self.ids[row]
+            if column == 1:
+                return self.names[row]
+            return self.values[row][0]
+        if role == SORT_ROLE:
+            if column == 0:
+                return self.ids[row]
+            if column == 1:
+                return self.names[row]
+            return self.values[row][2]
+        if column == 2:
+            if role == Qt.BackgroundRole:
+                return self.backgrounds.get(row, self.values[row][1])
+            if role == Qt.ForegroundRole and self.values[row][1] is not None:
+                return QColor(Qt.black)
+        if role == Qt.ToolTipRole and column == 1:
+            reaction = self.reactions[row]
+            return "Id: " + reaction.id + "\nName: " + reaction.name \
+                + "\nEquation: " + reaction.build_reaction_string()\
+                + "\nLowerbound: " + str(reaction.lower_bound) \
+                + "\nUpper bound: " + str(reaction.upper_bound) \
+                + "\nObjective coefficient: " + str(reaction.objective_coefficient)
+        return None
+
+    def reaction(self, row: int) -> cobra.Reaction:
+        return self.reactions[row]
+
+    def row(self, reaction_id: str) -> int:
+        return self.rows.get(reaction_id, -1)
+
+    def update(self):
+        '''Reset the model if reactions were added or removed, otherwise report the changed rows'''
+        reactions = self.appdata.project.cobra_py_model.reactions
+        if len(reactions) != len(self.reactions) or \
+                any(a is not b for a, b in zip(reactions, self.reactions)):
+            self.beginResetModel()
+            self.reactions = list(reactions)
+            self.ids = [r.id for r in self.reactions]
+            self.names = [r.name for r in self.reactions]
+            self.values = [self.flux_value(r) for r in self.ids]
+            self.rows = {r: i for i, r in enumerate(self.ids)}
+            self.backgrounds = {}
+            self.endResetModel()
+            return
+
+        changed = list(self.backgrounds.keys())
+        self.backgrounds = {}
+        renamed = False
+        for i, r in enumerate(self.reactions):
+            value = self.flux_value(r.id)
+            if r.id != self.ids[i] or r.name != self.names[i] or value != self.values[i]:
+                renamed = renamed or r.id != self.ids[i]
+                self.ids[i] = r.id
+                self.names[i] = r.name
+                self.values[i] = value
+                changed.append(i)
+        if renamed:
+            self.rows = {r: i for i, r in enumerate(self.ids)}
+        self.emit_changed(changed)
+
+    def emit_changed(self, rows: List[int]):
+        '''one dataChanged per contiguous block of rows'''
+        rows = sorted(set(rows))
+        start = 0
+        for i in range(1, len(rows) + 1):
+            if i == len(rows) or rows[i] != rows[i - 1] + 1:
+                self.dataChanged.emit(self.index(rows[start], 0),
+                                      self.index(rows[i - 1], 2))
+                start = i
+
+    def set_backgrounds(self, colors: Dict[str, QColor]):
+        '''Color the values of several reactions until the next update'''
+        rows = []
+        for (reaction_id, color) in colors.items():
+            row = self.row(reaction_id)
+            if row >= 0:
+                self.backgrounds[row] = color
+                rows.append(row)
+        self.emit_changed(rows)
+
+    def flux_value(self, key: str) -> Tuple[str, QColor, float]:
+        '''text, background color and sort key of the value of a reaction'''
+        appdata = self.appdata
+        if key in appdata.project.scen_values.keys():
+            (vl, vu) = appdata.project.scen_values[key]
+            color = appdata.scen_color
+        elif key in appdata.project.comp_values.keys():
+            (vl, vu) = appdata.project.comp_values[key]
+
+            # We differentiate special cases like (vl==vu)
+            if isclose(vl, vu, abs_tol=appdata.abs_tol):
+                if appdata.modes_coloring:
+                    if vl == 0:
+                        color = QColor(Qt.red)
+                    else:
+                        color = QColor(Qt.green)
+                else:
+                    color = appdata.comp_color
+            else:
+                if isclose(vl, 0.0, abs_tol=appdata.abs_tol):
+                    color = appdata.special_color_1
+                elif isclose(vu, 0.0, abs_tol=appdata.abs_tol):
+                    color = appdata.special_color_1
+                elif vl <= 0 and vu >= 0:
+                    color = appdata.special_color_1
+                else:
+                    color = appdata.special_color_2
+        else:
+            return ("", None, -inf)
+
+        if isclose(vl, vu, abs_tol=appdata.abs_tol):
+            text = str(round(vl, appdata.rounding))
+        else:
+            text = str((round(vl, appdata.rounding), round(vu, appdata.rounding)))
+        return (text, QColor(color), vl)
+
+    def add_reaction(self, reaction: cobra.Reaction) -> int:
+        row = len(self.reactions)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.reactions.append(reaction)
+        self.ids.append(reaction.id)
+        self.names.append(reaction.name)
+        self.values.append(self.flux_value(reaction.id))
+        self.rows[reaction.id] = row
+        self.endInsertRows()
+        return row
+
+    def remove_reaction(self, reaction: cobra.Reaction):
+        row = next((i for i, r in enumerate(self.reactions) if r is reaction), -1)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        for values in (self.reactions, self.ids, self.names, self.values):
+            del values[row]
+        self.rows = {r: i for i, r in enumerate(self.ids)}
+        self.backgrounds = {}
+        self.endRemoveRows()
+
+
+class SearchFilter(QSortFilterProxyModel):
+    '''Shows the rows whose id is in the set of search matches, the source model has a list of ids'''
+
+    def __init__(self):
+        QSortFilterProxyModel.__init__(self)
+        self.matches = None
+        self.setSortRole(SORT_ROLE)
+
+    def set_matches(self, matches: Set[str]):
+        '''None shows all rows'''
+        self.matches = matches
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, _source_parent):
+        if self.matches is None:
+            return True
+        return self.sourceModel().ids[source_row] in self.matches
+
+
+class DragableTreeView(QTreeView):
     '''A list of dragable reaction items'''
 
     def mouseMoveEvent(self, _event):
-        item = self.currentItem()
-        if item is not None:
-            reaction: cobra.Reaction = item.data(3, 0)
+        index = self.currentIndex()
+        if index.isValid():
+            proxy = self.model()
+            reaction: cobra.Reaction = proxy.sourceModel().reaction(
+                proxy.mapToSource(index).row())
             mime_data = QMimeData()
             mime_data.setText(reaction.id)
             drag = QDrag(self)
@@ -42,13 +246,18 @@ class ReactionList(QWidget):
         policy.ShrinkFlag = True
         self.add_button.setSizePolicy(policy)
 
-        self.reaction_list = DragableTreeWidget()
+        self.model = ReactionTableModel(self.appdata)
+        self.proxy = SearchFilter()
+        self.proxy.setSourceModel(self.model)
+        self.reaction_list = DragableTreeView()
+        self.reaction_list.setRootIsDecorated(False)
+        self.reaction_list.setUniformRowHeights(True)
+        self.reaction_list.setModel(self.proxy)
         self.reaction_list.setDragEnabled(True)
-        self.reaction_list.setHeaderLabels(["Id", "Name", "Flux"])
         self.reaction_list.setSortingEnabled(True)
+        self.reaction_list.sortByColumn(-1, Qt.AscendingOrder)
 
-        for r in self.appdata.project.cobra_py_model.reactions:
-            self.add_reaction(r)
+        self.model.update()
 
         self.reaction_mask = ReactionMask(self)
         self.reaction_mask.hide()
@@ -66,7 +275,8 @@ class ReactionList(QWidget):
         self.layout.addWidget(self.splitter)
         self.setLayout(self.layout)
 
-        self.reaction_list.currentItemChanged.connect(self.reaction_selected)
+        self.reaction_list.selectionModel().currentChanged.connect(
+            self.current_changed)
         self.reaction_mask.reactionChanged.connect(
             self.handle_changed_reaction)
         self.reaction_mask.reactionDeleted.connect(
@@ -78,65 +288,28 @@ class ReactionList(QWidget):
         self.add_button.clicked.connect(self.add_new_reaction)
 
     def clear(self):
-        self.reaction_list.clear()
+        self.model.update()
         self.reaction_mask.hide()
 
-    def add_reaction(self, reaction: cobra.Reaction) -> QTreeWidgetItem:
-        ''' create a new item in the reaction list'''
-        self.reaction_list.clearSelection()
-        item = QTreeWidgetItem(self.reaction_list)
-        item.setText(0, reaction.id)
-        item.setText(1, reaction.name)
-        self.set_flux_value(item, reaction.id)
-
-        text = "Id: " + reaction.id + "\nName: " + reaction.name \
-            + "\nEquation: " + reaction.build_reaction_string()\
-            + "\nLowerbound: " + str(reaction.lower_bound) \
-            + "\nUpper bound: " + str(reaction.upper_bound) \
-            + "\nObjective coefficient: " + str(reaction.objective_coefficient)
-
-        item.setToolTip(1, text)
-        item.setData(3, 0, reaction)
-
-        return item
-
-    def set_flux_value(self, item, key):
-        if key in self.appdata.project.scen_values.keys():
-            (vl, vu) = self.appdata.project.scen_values[key]
-            if isclose(vl, vu, abs_tol=self.appdata.abs_tol):
-                item.setData(2, 0, round(vl, self.appdata.rounding))
-            else:
-                item.setData(
-                    2, 0, str((round(vl, self.appdata.rounding), round(vu, self.appdata.rounding))))
-            item.setBackground(2, self.appdata.scen_color)
-            item.setForeground(2, Qt.black)
-        elif key in self.appdata.project.comp_values.keys():
-            (vl, vu) = self.appdata.project.comp_values[key]
+    def reaction_at(self, index: QModelIndex) -> cobra.Reaction:
+        return self.model.reaction(self.proxy.mapToSource(index).row())
 
-            # We differentiate special cases like (vl==vu)
-            if isclose(vl, vu, abs_tol=self.appdata.abs_tol):
-                if self.appdata.modes_coloring:
-                    if vl == 0:
-                        item.setBackground(2, Qt.red)
-                    else:
-                        item.setBackground(2, Qt.green)
-                else:
-                    item.setBackground(2, self.appdata.comp_color)
+    def select_reaction(self, reaction_id: str):
+        '''make the row of the reaction the current one'''
+        row = self.model.row(reaction_id)
+        if row < 0:
+            return
+        index = self.proxy.mapFromSource(self.model.index(row, 0))
+        if index.isValid() and index != self.reaction_list.currentIndex():
+            self.reaction_list.setCurrentIndex(index)
 
-                item.setData(2, 0, round(vl, self.appdata.rounding))
-            else:
-                if isclose(vl, 0.0, abs_tol=self.appdata.abs_tol):
-                    item.setBackground(2, self.appdata.special_color_1)
-                elif isclose(vu, 0.0, abs_tol=self.appdata.abs_tol):
-                    item.setBackground(2, self.appdata.special_color_1)
-                elif vl <= 0 and vu >= 0:
-                    item.setBackground(2, self.appdata.special_color_1)
-                else:
-                    item.setBackground(2, self.appdata.special_color_2)
-                item.setData(
-                    2, 0, str((round(vl, self.appdata.rounding), round(vu, self.appdata.rounding))))
+    def add_reaction(self, reaction: cobra.Reaction):
+        ''' create a new row in the reaction list'''
+        self.reaction_list.clearSelection()
+        self.model.add_reaction(reaction)
 
-            item.setForeground(2, Qt.black)
+    def set_flux_backgrounds(self, colors: Dict[str, QColor]):
+        self.model.set_backgrounds(colors)
 
     def add_new_reaction(self):
         self.reaction_mask.show()
@@ -147,8 +320,9 @@ class ReactionList(QWidget):
                 break
         reaction = cobra.Reaction(name)
         self.appdata.project.cobra_py_model.add_reactions([reaction])
-        item = self.add_reaction(reaction)
-        self.reaction_selected(item, 1)
+        self.add_reaction(reaction)
+        self.select_reaction(reaction.id)
+        self.reaction_selected(reaction)
         self.appdata.window.unsaved_changes()
 
     def update_annotations(self, annotation):
@@ -170,13 +344,17 @@ class ReactionList(QWidget):
         self.reaction_mask.annotation.itemChanged.connect(
             self.reaction_mask.throttler.throttle)
 
-    def reaction_selected(self, item: QTreeWidgetItem, _column):
-        if item is None:
+    def current_changed(self, current: QModelIndex, _previous):
+        if current.isValid():
+            self.reaction_selected(self.reaction_at(current))
+        else:
+            self.reaction_selected(None)
+
+    def reaction_selected(self, reaction: cobra.Reaction):
+        if reaction is None:
             self.reaction_mask.hide()
         else:
-            item.setSelected(True)
             self.reaction_mask.show()
-            reaction: cobra.Reaction = item.data(3, 0)
 
             self.last_selected = reaction.id
             self.reaction_mask.reaction = reaction
@@ -205,65 +383,33 @@ class ReactionList(QWidget):
             turn_white(self.reaction_mask.gene_reaction_rule)
             self.reaction_mask.is_valid = True
         (_, r) = self.splitter.getRange(1)
-        self.splitter.moveSplitter(r/2, 1)
+        self.splitter.moveSplitter(r // 2, 1)
         self.reaction_mask.update_state()
 
     def handle_changed_reaction(self, reaction: cobra.Reaction):
-        # Update reaction item in list
-        root = self.reaction_list.invisibleRootItem()
-        child_count = root.childCount()
-        for i in range(child_count):
-            item = root.child(i)
-            if item.data(3, 0) == reaction:
-                old_id = item.text(0)
-                item.setText(0, reaction.id)
-                item.setText(1, reaction.name)
-                break
+        # Update reaction row in list
+        row = next((i for i, r in enumerate(self.model.reactions) if r is reaction), -1)
+        old_id = self.model.ids[row] if row >= 0 else reaction.id
+        self.model.update()
 
         self.last_selected = self.reaction_mask.id.text()
         self.reactionChanged.emit(old_id, reaction)
 
     def handle_deleted_reaction(self, reaction: cobra.Reaction):
-        '''Remove reaction item from reaction list'''
-        root = self.reaction_list.invisibleRootItem()
-        child_count = root.childCount()
-        for i in range(child_count):
-            item = root.child(i)
-            if item.data(3, 0) == reaction:
-                # remove item
-                self.reaction_list.takeTopLevelItem(
-                    self.reaction_list.indexOfTopLevelItem(item))
-                break
+        '''Remove reaction row from reaction list'''
+        self.model.remove_reaction(reaction)
 
         self.last_selected = self.reaction_mask.id.text()
         self.reactionDeleted.emit(reaction)
 
-    def update_selected(self, string):
-        root = self.reaction_list.invisibleRootItem()
-        child_count = root.childCount()
-        for i in range(child_count):
-            item = root.child(i)
-            item.setHidden(True)
-
-        for item in self.reaction_list.findItems(string, Qt.MatchContains, 0):
-            item.setHidden(False)
-        for item in self.reaction_list.findItems(string, Qt.MatchContains, 1):
-            item.setHidden(False)
+    def update_selected(self, matches: Set[str]):
+        self.proxy.set_matches(matches)
 
     def update(self):
-        self.reaction_list.clear()
-        for r in self.appdata.project.cobra_py_model.reactions:
-            self.add_reaction(r)
+        self.model.update()
 
-        if self.last_selected is None:
-            pass
-        else:
-            items = self.reaction_list.findItems(
-                self.last_selected, Qt.MatchExactly)
-
-            for i in items:
-                self.reaction_list.setCurrentItem(i)
-                break
+        if self.last_selected is not None:
+            self.select_reaction(self.last_selected)
 
         self.reaction_mask.update_state()
 
@@ -10,6 +10,7 @@ from qtpy.QtWidgets import (QCompleter, QDialog, QHBoxLayout, QLabel,
 
 from cnapy.cnadata import CnaData
 from cnapy.gui_elements.centralwidget import CentralWidget
+from cnapy.utils import COMP_VALUES
 
 
 class CompleterLineEdit(QLineEdit):
@@ -273,7 +274,7 @@ class YieldOptimizationDialog(QDialog):
                                 float(val), float(val))
                             idx = idx+1
 
-                        self.centralwidget.update()
+                        self.centralwidget.update(COMP_VALUES)
 
             elif self.appdata.is_octave_ready():
                 a = self.eng.eval(
@@ -298,6 +299,6 @@ class YieldOptimizationDialog(QDialog):
                         self.appdata.project.comp_values[r] = (
                             float(val), float(val))
                         idx = idx+1
-                    self.centralwidget.update()
+                    self.centralwidget.update(COMP_VALUES)
 
         self.setCursor(Qt.ArrowCursor)
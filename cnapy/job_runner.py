@@ -0,0 +1,124 @@
+"""Background execution of analyses"""
+import io
+import traceback
+from collections import deque
+
+from qtpy.QtCore import QObject, QThread, Signal
+
+
+class Job(QThread):
+    '''An analysis that runs on a worker thread
+
+    The function is called as function(job, *args, **kwargs) and can use the
+    job to report progress and partial results and to check for cancellation.
+    '''
+
+    def __init__(self, name: str, function, *args, **kwargs):
+        QThread.__init__(self)
+        self.name = name
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.result = None
+        self.exception = None
+        self.traceback = ""
+        self.cancel_requested = False
+
+    def run(self):
+        try:
+            self.result = self.function(self, *self.args, **self.kwargs)
+        except Exception as e:
+            output = io.StringIO()
+            traceback.print_exc(file=output)
+            self.exception = e
+            self.traceback = output.getvalue()
+            print(self.traceback)
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_requested
+
+    def report_progress(self, done: int, total: int):
+        self.progress.emit(done, total)
+
+    def report_partial_result(self, result):
+        if not self.cancel_requested:
+            self.partialResult.emit(result)
+
+    # emitted from the worker thread
+    progress = Signal(int, int)
+    partialResult = Signal(object)
+    # emitted by the JobRunner in the GUI thread
+    resultReady = Signal(object)
+    failed = Signal(object, str)
+    aborted = Signal()
+
+
+class JobRunner(QObject):
+    '''Runs the submitted jobs one after another
+
+    Only one job runs at a time because the analyses share the project model.
+    '''
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.queue = deque()
+        self.current = None
+
+    def submit(self, job: Job) -> Job:
+        self.queue.append(job)
+        self.queueChanged.emit()
+        self.start_next()
+        return job
+
+    def is_busy(self) -> bool:
+        return self.current is not None
+
+    def cancel(self, job: Job = None):
+        '''Cancel a queued job or by default the running one'''
+        if job is None or job is self.current:
+            if self.current is not None:
+                self.current.cancel()
+        elif job in self.queue:
+            self.queue.remove(job)
+            job.cancel()
+            job.aborted.emit()
+            self.queueChanged.emit()
+
+    def cancel_all(self):
+        while len(self.queue) > 0:
+            self.cancel(self.queue[-1])
+        self.cancel()
+
+    def shutdown(self):
+        '''Cancel everything and wait for the running job to stop'''
+        self.cancel_all()
+        if self.current is not None:
+            self.current.wait()
+
+    def start_next(self):
+        if self.current is None and len(self.queue) > 0:
+            self.current = self.queue.popleft()
+            self.current.finished.connect(self.job_finished)
+            self.jobStarted.emit(self.current)
+            self.queueChanged.emit()
+            self.current.start()
+
+    def job_finished(self):
+        job = self.current
+        self.current = None
+        if job.exception is not None:
+            job.failed.emit(job.exception, job.traceback)
+        elif job.is_cancelled():
+            job.aborted.emit()
+        else:
+            job.resultReady.emit(job.result)
+        self.jobFinished.emit(job)
+        self.queueChanged.emit()
+        self.start_next()
+
+    jobStarted = Signal(object)
+    jobFinished = Signal(object)
+    queueChanged = Signal()
@@ -0,0 +1,113 @@
+"""A persistent LP for the FBA-type analyses"""
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import cobra
+from cobra.util.solver import linear_reaction_coefficients
+
+
+class LPSnapshot:
+    '''The state of the project model that a job needs, taken on the GUI thread'''
+
+    def __init__(self, model: cobra.Model, bounds: Dict[str, Tuple[float, float]],
+                 objective: Dict[str, float], direction: str):
+        self.model = model  # the solver copy, not the project model
+        self.bounds = bounds
+        self.objective = objective
+        self.direction = direction
+
+
+class LPCache:
+    '''Keeps a solver copy of the project model alive between analyses
+
+    Instead of re-applying every scenario bound inside a model context before
+    each solve only the bounds and objective coefficients that differ from the
+    previous solve are changed in the copy. The LP therefore persists and the
+    solver can warm start from its previous basis. Results are cached by
+    scenario, objective and analysis so that repeating an analysis on an
+    unchanged scenario is a dictionary lookup.
+
+    The project model is only read on the GUI thread: snapshot copies it when
+    the cache has been invalidated and records the bounds and objective, the
+    job then calls update with the snapshot on the worker thread. Call
+    invalidate after every change to the network structure.
+    '''
+
+    def __init__(self, max_results=32):
+        self.max_results = max_results
+        # used on the GUI thread
+        self.source = None
+        self.copy = None
+        self.valid = False
+        # used by the jobs
+        self.model = None
+        self.bounds: Dict[str, Tuple[float, float]] = {}
+        self.objective: Dict[str, float] = {}
+        self.results = OrderedDict()
+
+    def invalidate(self):
+        '''Call after changes to the network structure or the solver'''
+        self.valid = False
+
+    def snapshot(self, model: cobra.Model, scen_values: Dict[str, Tuple[float, float]]) -> LPSnapshot:
+        '''The bounds of model with the scenario applied and its objective, call on the GUI thread'''
+        if not self.valid or self.source is not model:
+            self.source = model
+            self.copy = model.copy()
+            self.valid = True
+        bounds = {r.id: tuple(scen_values[r.id]) if r.id in scen_values else r.bounds
+                  for r in model.reactions}
+        return LPSnapshot(self.copy, bounds, objective_coefficients(model), model.objective_direction)
+
+    def update(self, snapshot: LPSnapshot, objective: Dict[str, float] = None) -> cobra.Model:
+        '''Bring the solver copy in line with the snapshot
+
+        When objective is given its coefficients replace the model objective.
+        Returns the solver copy which must only be changed inside a context.
+        '''
+        if self.model is not snapshot.model:
+            self.model = snapshot.model
+            self.bounds = {r.id: r.bounds for r in self.model.reactions}
+            self.objective = objective_coefficients(self.model)
+            self.results.clear()
+
+        for (r_id, bounds) in snapshot.bounds.items():
+            if self.bounds[r_id] != bounds:
+                self.model.reactions.get_by_id(r_id).bounds = bounds
+                self.bounds[r_id] = bounds
+
+            if objective is None:
+                coefficient = snapshot.objective[r_id]
+            else:
+                coefficient = objective.get(r_id, 0)
+            if self.objective[r_id] != coefficient:
+                self.model.reactions.get_by_id(r_id).objective_coefficient = coefficient
+                self.objective[r_id] = coefficient
+
+        if self.model.objective_direction != snapshot.direction:
+            self.model.objective_direction = snapshot.direction
+
+        return self.model
+
+    def key(self, analysis, *args):
+        '''A key for the current state of the solver copy'''
+        return (analysis, args, tuple(self.bounds.values()),
+                tuple(self.objective.values()), self.model.objective_direction)
+
+    def get(self, key):
+        result = self.results.get(key, None)
+        if result is not None:
+            self.results.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self.results[key] = result
+        if len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+
+
+def objective_coefficients(model: cobra.Model) -> Dict[str, float]:
+    '''The objective coefficient of every reaction of model'''
+    coefficients = {r.id: 0 for r in model.reactions}
+    coefficients.update((r.id, c) for (r, c) in linear_reaction_coefficients(model).items())
+    return coefficients
@@ -0,0 +1,596 @@
+"""Minimal cut set enumeration that reports each cut set as soon as it is found"""
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from multiprocessing import Pool
+from typing import List, Tuple
+
+import cobra
+import numpy
+import optlang_enumerator.cMCS_enumerator as cMCS_enumerator
+import scipy.sparse
+from cobra.util.array import create_stoichiometric_matrix
+
+from cnapy.network_compression import NetworkCompression
+
+
+class InfeasibleRegion(Exception):
+    pass
+
+
+class MCSEnumerator:
+    '''Enumerates the minimal cut sets of a model one at a time
+
+    targets and desired are lists of (A, b) pairs that describe the regions
+    A v <= b. The model bounds are integrated into the regions, reactions
+    that are blocked or essential for a desired region are not cut.
+    Each solve is limited to solve_interval seconds so that the caller can
+    regularly check for cancellation. candidates can pass the result of
+    cut_candidates when several enumerators work on the same problem, it is
+    computed with an FVA otherwise. Each call modifies the MILP, so no
+    solver can continue an interrupted search. The interval is therefore
+    doubled after each interruption so that long solves still finish.
+    '''
+
+    def __init__(self, model: cobra.Model, targets, desired=None, enum_method: int = 1,
+                 max_mcs_size: int = None, exclude_boundary_reactions_as_cuts=False,
+                 fva_tolerance=1e-9, no_cuts=(), solve_interval: float = 10,
+                 mip_opt_tol=1e-6, mip_feas_tol=1e-6, mip_int_tol=1e-6, candidates=None):
+        if desired is None:
+            desired = []
+        self.enum_method = enum_method
+        self.max_mcs_size = max_mcs_size
+        self.reac_id = model.reactions.list_attr("id")
+        self.exhausted = False
+        self.interrupted = False
+        self.solve_interval = solve_interval
+
+        for (i, (mat, rhs)) in enumerate(targets):
+            if not region_is_feasible(model, mat, rhs):
+                raise InfeasibleRegion('Target region '+str(i)+' is not feasible.')
+        self.targets = integrate_bounds(model, targets)
+        if candidates is None:
+            candidates = cut_candidates(model, integrate_bounds(model, desired),
+                                        exclude_boundary_reactions_as_cuts, fva_tolerance)
+        (cuts, self.desired) = candidates
+        cuts = cuts.copy()
+        cuts[[model.reactions.index(r) for r in no_cuts]] = False
+        self.cuts = cuts
+
+        optlang_interface = model.problem
+        if optlang_interface.Constraint._INDICATOR_CONSTRAINT_SUPPORT:
+            bigM = 0.0
+        else:
+            bigM = 1000.0
+        self.enumerator = cMCS_enumerator.ConstrainedMinimalCutSetsEnumerator(
+            optlang_interface, create_stoichiometric_matrix(model, array_type='lil'),
+            [r.lower_bound < 0 for r in model.reactions], self.targets,
+            desired=self.desired, bigM=bigM, threshold=0.1, cuts=cuts,
+            split_reversible_v=True, irrev_geq=True)
+        if enum_method == 3:  # stop at the first feasible solution
+            if optlang_interface.__name__ == 'optlang.cplex_interface':
+                self.enumerator.model.problem.parameters.mip.tolerances.mipgap.set(0.98)
+            elif optlang_interface.__name__ == 'optlang.gurobi_interface':
+                self.enumerator.model.problem.Params.MipGap = 0.98
+            elif optlang_interface.__name__ == 'optlang.glpk_interface':
+                self.enumerator.model.configuration._iocp.mip_gap = 0.98
+            elif optlang_interface.__name__ == 'optlang.coinor_cbc_interface':
+                self.enumerator.model.problem.max_solutions = 1
+        # the same tolerances as in optlang_enumerator.mcs_computation.compute_mcs
+        configuration = self.enumerator.model.configuration
+        if optlang_interface.__name__ == 'optlang.glpk_interface':
+            configuration._smcp.tol_dj = mip_opt_tol
+        else:
+            configuration.tolerances.optimality = mip_opt_tol
+        configuration.tolerances.feasibility = mip_feas_tol
+        configuration.tolerances.integrality = mip_int_tol
+        self.enumerator.evs_sz_lb = 1  # all targets are feasible
+        self.model = model
+
+    def next(self, max_mcs_num=1, timeout: float = None) -> List[Tuple[int]]:
+        '''
+        At most max_mcs_num further cut sets, each a tuple of reaction indices.
+        An empty list means that there are no further cut sets or, when
+        interrupted is set, that the solve interval or timeout has passed.
+        Enumeration by cardinality (enum_method 2) returns all cut sets that
+        are found within the interval at once.
+        '''
+        self.interrupted = False
+        if self.exhausted:
+            return []
+        if self.enum_method == 2:
+            max_mcs_num = float('inf')
+        if timeout is None or timeout > self.solve_interval:
+            timeout = self.solve_interval
+        timeout = max(timeout, 1)  # the solver timeout is rounded to whole seconds
+        result = self.enumerator.enumerate_mcs(
+            max_mcs_size=self.max_mcs_size, max_mcs_num=max_mcs_num,
+            enum_method=self.enum_method, timeout=timeout, model=self.model,
+            targets=self.targets, desired=self.desired)
+        if isinstance(result, tuple):  # newer versions also return an error value
+            result = result[0]
+        mcs = [tuple(sorted(m)) for m in result]
+        if len(mcs) < max_mcs_num:
+            self.interrupted = self.enumerator.model.status == 'time_limit'
+            self.exhausted = self.enumerator.model.status == 'infeasible' or \
+                (self.max_mcs_size is not None and self.level > self.max_mcs_size)
+            if self.interrupted and len(mcs) == 0:
+                self.solve_interval *= 2
+        return mcs
+
+    @property
+    def level(self) -> int:
+        '''the size from which on further cut sets are searched'''
+        return self.enumerator.evs_sz_lb
+
+    def restore(self, mcs: List[Tuple[int]], level: int, exhausted: bool):
+        '''Continue an enumeration that already found the cut sets mcs'''
+        self.exclude(mcs)
+        self.enumerator.evs_sz_lb = level
+        self.exhausted = exhausted
+
+    def exclude(self, cut_sets: List[Tuple[int]]):
+        '''no further cut sets that contain one of cut_sets'''
+        for m in cut_sets:
+            self.enumerator.add_exclusion_constraint(m)
+        self.enumerator.model.update()
+
+    def skip_smaller(self, size: int):
+        '''only search for cut sets with at least size reactions'''
+        self.enumerator.evs_sz_lb = size
+        self.enumerator.evs_sz.lb = size
+        self.enumerator.model.update()
+
+    def force(self, reaction: int):
+        '''only search for cut sets that contain the reaction'''
+        self.enumerator.z_vars[reaction].lb = 1
+        self.enumerator.model.update()
+
+
+def enumerate_mcs(job, model: cobra.Model, targets, desired=None, enum_method: int = 1,
+                  max_mcs_size: int = None, max_mcs_num=float('inf'), timeout: float = None,
+                  exclude_boundary_reactions_as_cuts=False, checkpoint_dir: str = None,
+                  checkpoint_interval: float = 30, compress=False,
+                  max_checkpoint_bytes=2**28) -> List[Tuple[str]]:
+    '''MCS job that reports each cut set as a tuple of reaction ids as soon as it is found
+
+    When the job is cancelled the cut sets found so far are returned.
+    With a checkpoint_dir the progress is saved there at most every
+    checkpoint_interval seconds and when the job ends. A later job for the
+    same problem starts with the saved cut sets and only searches for more.
+    The oldest checkpoints are deleted when those in checkpoint_dir exceed
+    max_checkpoint_bytes. With compress the cut sets are computed in the compressed network and
+    expanded to the reactions of model.
+    '''
+    start_time = time.monotonic()
+    (model, targets, desired, no_cuts, expand) = prepare_problem(
+        model, targets, desired, max_mcs_size, exclude_boundary_reactions_as_cuts, compress)
+    if compress:
+        exclude_boundary_reactions_as_cuts = False  # already in no_cuts
+    reac_id = model.reactions.list_attr("id")
+    checkpoint = None
+    state = None
+    if checkpoint_dir is not None:
+        key = problem_key(model, targets, desired, enum_method, max_mcs_size,
+                          exclude_boundary_reactions_as_cuts, no_cuts)
+        checkpoint = MCSCheckpoint(os.path.join(checkpoint_dir, key + ".json"))
+        prune_checkpoints(checkpoint_dir, max_checkpoint_bytes, keep=checkpoint.path)
+        state = checkpoint.load()
+    found = []  # reaction indices
+    reported = []  # reaction ids
+
+    def report(mcs):
+        mcs = expand([tuple(reac_id[i] for i in m) for m in mcs])
+        if len(reported) + len(mcs) > max_mcs_num:
+            mcs = mcs[:int(max_mcs_num) - len(reported)]
+        if len(mcs) > 0:
+            reported.extend(mcs)
+            job.report_partial_result(mcs)
+
+    if state is not None:
+        found = state["mcs"]
+        print("Resuming with", len(found), "cut sets from", checkpoint.path)
+        report(found)
+        if state["exhausted"]:
+            return reported
+
+    enumerator = MCSEnumerator(model, targets, desired, enum_method, max_mcs_size,
+                               exclude_boundary_reactions_as_cuts, no_cuts=no_cuts)
+    if state is not None:
+        enumerator.restore(found, state["level"], state["exhausted"])
+    last_save = time.monotonic()
+    try:
+        while len(reported) < max_mcs_num and not job.is_cancelled():
+            remaining_time = None
+            if timeout is not None:
+                remaining_time = timeout - (time.monotonic() - start_time)
+                if remaining_time <= 0:
+                    break
+            mcs = enumerator.next(timeout=remaining_time)
+            if len(mcs) == 0 and not enumerator.interrupted:
+                break
+            found.extend(mcs)
+            report(mcs)
+            if checkpoint is not None and time.monotonic() - last_save >= checkpoint_interval:
+                checkpoint.save(found, enumerator.level, enumerator.exhausted)
+                last_save = time.monotonic()
+    finally:
+        if checkpoint is not None:
+            checkpoint.save(found, enumerator.level, enumerator.exhausted)
+    return reported
+
+
+def enumerate_mcs_parallel(job, model: cobra.Model, targets, desired=None, enum_method: int = 1,
+                           max_mcs_size: int = None, max_mcs_num=float('inf'), timeout: float = None,
+                           exclude_boundary_reactions_as_cuts=False, processes: int = None,
+                           partitions: int = None, compress=False, prerun_time: float = 5) -> List[Tuple[str]]:
+    '''MCS job that splits the search space over worker processes
+
+    A sequential run of at most prerun_time seconds, or until 20 cut sets per
+    partition are found, first finds the smallest cut sets. The reactions that occur most often in them become the
+    branching reactions b_0, ..., b_k-1: partition i holds the cut sets that
+    contain b_i but none of b_0, ..., b_i-1, the last partition those without
+    any branching reaction. With enum_method 2 and a max_mcs_size the
+    partitions are the cut set sizes instead. The workers share the cut sets
+    they find so that each excludes the supersets of all cut sets found so
+    far. The cut sets are reported as soon as they are found, when the job is
+    cancelled those found so far are returned.
+    '''
+    start_time = time.monotonic()
+    if processes is None:
+        processes = cobra.Configuration().processes
+    if partitions is None:
+        partitions = 2 * processes
+    (model, targets, desired, no_cuts, expand) = prepare_problem(
+        model, targets, desired, max_mcs_size, exclude_boundary_reactions_as_cuts, compress)
+    if compress:
+        exclude_boundary_reactions_as_cuts = False  # already in no_cuts
+    reac_id = model.reactions.list_attr("id")
+    reported = []
+    found = set()  # reaction indices
+
+    def report(mcs):
+        mcs = [m for m in mcs if m not in found]
+        found.update(mcs)
+        mcs = expand([tuple(reac_id[i] for i in m) for m in mcs])
+        if len(reported) + len(mcs) > max_mcs_num:
+            mcs = mcs[:int(max_mcs_num) - len(reported)]
+        if len(mcs) > 0:
+            reported.extend(mcs)
+            job.report_partial_result(mcs)
+
+    def remaining_time():
+        if timeout is None:
+            return None
+        return timeout - (time.monotonic() - start_time)
+
+    by_size = enum_method == 2 and max_mcs_size is not None
+    # the FVAs for the cuttable reactions are only done once for all partitions
+    candidates = cut_candidates(model, integrate_bounds(model, desired),
+                                exclude_boundary_reactions_as_cuts)
+    # also checks the regions, which is all it is used for when splitting by size
+    enumerator = MCSEnumerator(model, targets, desired, 1 if by_size else enum_method, max_mcs_size,
+                               exclude_boundary_reactions_as_cuts, no_cuts=no_cuts,
+                               solve_interval=prerun_time, candidates=candidates)
+    prerun = []
+    if not by_size:
+        while len(prerun) < 20 * partitions and len(reported) < max_mcs_num and \
+                not job.is_cancelled():
+            left = prerun_time - (time.monotonic() - start_time)
+            if remaining_time() is not None:
+                left = min(left, remaining_time())
+            if left <= 0:
+                break
+            mcs = enumerator.next(timeout=left)
+            if len(mcs) == 0 and not enumerator.interrupted:
+                break
+            prerun.extend(mcs)
+            report(mcs)
+        if enumerator.exhausted or len(reported) >= max_mcs_num or job.is_cancelled() or \
+                (remaining_time() is not None and remaining_time() <= 0):
+            return reported
+    level = enumerator.level
+
+    if by_size:
+        tasks = [(no_cuts, None, size, size, True) for size in range(level, max_mcs_size + 1)]
+    else:
+        branches = choose_branching_reactions(model, enumerator.cuts, partitions - 1, prerun)
+        # the partition without branching reactions only has minimal cut sets, it comes first
+        # so that these can be excluded in the other partitions early on
+        tasks = [(no_cuts + branches, None, level, max_mcs_size, False)] + \
+                [(no_cuts + branches[:i], branch, level, max_mcs_size, False)
+                 for (i, branch) in enumerate(branches)]
+    deadline = None
+    if timeout is not None:
+        deadline = time.time() + remaining_time()
+    tasks = [(targets, desired, enum_method, exclude_boundary_reactions_as_cuts) + task + (deadline,)
+             for task in tasks]
+
+    with multiprocessing.Manager() as manager:
+        shared = manager.list(prerun)
+        consumed = len(prerun)
+        with Pool(processes, initializer=_init_worker, initargs=(model, shared, candidates)) as pool:
+            results = pool.imap_unordered(_worker_partition, tasks)
+            done = 0
+            while done < len(tasks) and len(reported) < max_mcs_num and not job.is_cancelled():
+                try:
+                    results.next(timeout=0.1)
+                    done += 1
+                except multiprocessing.TimeoutError:
+                    pass
+                mcs = shared[consumed:]
+                consumed += len(mcs)
+                report(mcs)
+            pool.terminate()
+        report(shared[consumed:])
+    return reported
+
+
+def prepare_problem(model: cobra.Model, targets, desired, max_mcs_size: int,
+                    exclude_boundary_reactions_as_cuts: bool, compress: bool):
+    '''
+    The model, regions and reactions that are not cut for the enumeration and
+    a function that turns its cut sets into cut sets of model
+    '''
+    if desired is None:
+        desired = []
+    if not compress:
+        return (model, targets, desired, [], lambda mcs: mcs)
+    no_cuts = []
+    if exclude_boundary_reactions_as_cuts:
+        no_cuts = [r.id for r in model.reactions if r.boundary]
+    compression = NetworkCompression(model, targets + desired, no_cuts)
+    print("Compressed the network from", len(model.reactions), "to",
+          len(compression.model.reactions), "reactions")
+    return (compression.model, compression.compress_regions(targets),
+            compression.compress_regions(desired), compression.no_cuts,
+            lambda mcs: compression.expand(mcs, max_mcs_size))
+
+
+def choose_branching_reactions(model: cobra.Model, cuts: numpy.ndarray, num: int,
+                               mcs: List[Tuple[int]] = ()) -> List[str]:
+    '''
+    The num cuttable reactions that occur most often in the cut sets mcs, without
+    cut sets those with the most metabolites
+    '''
+    if len(mcs) > 0:
+        frequency = numpy.bincount(numpy.concatenate([numpy.array(m, dtype=int) for m in mcs]),
+                                   minlength=len(model.reactions))
+        frequency[~cuts] = 0
+        candidates = numpy.flatnonzero(frequency)
+        order = numpy.argsort(-frequency[candidates], kind='stable')
+    else:
+        candidates = numpy.flatnonzero(cuts)
+        degree = numpy.array([len(model.reactions[i].metabolites) for i in candidates], dtype=int)
+        order = numpy.argsort(-degree, kind='stable')
+    return [model.reactions[int(i)].id for i in candidates[order[:max(0, num)]]]
+
+
+_model = None
+_shared = None
+_candidates = None
+
+
+def _init_worker(model: cobra.Model, shared, candidates):
+    global _model, _shared, _candidates
+    _model = model
+    _shared = shared
+    _candidates = candidates
+
+
+def _worker_partition(args) -> int:
+    '''
+    Enumerates the cut sets of a partition and appends them to the shared list,
+    returns their number. A cut set that stays one without the branch (or,
+    with check_all, without any of its reactions) is not minimal, instead the
+    supersets of the smaller cut set are excluded.
+    '''
+    (targets, desired, enum_method, exclude_boundary_reactions_as_cuts, no_cuts, branch,
+     min_size, max_size, check_all, deadline) = args
+    try:
+        enumerator = MCSEnumerator(_model, targets, desired, enum_method, max_size,
+                                   exclude_boundary_reactions_as_cuts, no_cuts=no_cuts,
+                                   candidates=_candidates)
+    except InfeasibleRegion:
+        return 0
+    if check_all:
+        enumerator.skip_smaller(min_size)
+    else:
+        enumerator.restore([], min_size, False)
+    if branch is not None:
+        forced = _model.reactions.index(branch)
+        enumerator.force(forced)
+    uncut = set(numpy.flatnonzero(~enumerator.cuts).tolist())
+    seen = 0
+    count = 0
+    while True:
+        # exclude the cut sets of the other partitions that can occur in this one
+        shared = _shared[seen:]
+        seen += len(shared)
+        enumerator.exclude([m for m in shared if uncut.isdisjoint(m)])
+        remaining_time = None
+        if deadline is not None:
+            remaining_time = deadline - time.time()
+            if remaining_time <= 0:
+                break
+        mcs = enumerator.next(timeout=remaining_time)
+        if len(mcs) == 0 and not enumerator.interrupted:
+            break
+        for m in mcs:
+            if check_all:
+                smaller = [tuple(i for i in m if i != r) for r in m]
+            elif branch is not None and forced in m:  # enum_method 3 may drop the branch
+                smaller = [tuple(i for i in m if i != forced)]
+            else:
+                smaller = []
+            smaller = [c for c in smaller if len(c) > 0 and
+                       is_cut_set(_model, targets, [_model.reactions[i].id for i in c])]
+            if len(smaller) > 0:
+                enumerator.exclude(smaller)
+            else:
+                _shared.append(m)
+                count += 1
+    return count
+
+
+class MCSCheckpoint:
+    '''The progress of an enumeration in a JSON file'''
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self):
+        '''dictionary with the found cut sets, the level and whether there are no more cut sets'''
+        try:
+            with open(self.path, 'r') as fp:
+                state = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        state["mcs"] = [tuple(m) for m in state["mcs"]]
+        return state
+
+    def save(self, mcs: List[Tuple[int]], level: int, exhausted: bool):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as fp:
+            json.dump({"mcs": [[int(i) for i in m] for m in mcs], "level": int(level),
+                       "exhausted": bool(exhausted)}, fp)
+        os.replace(temp_path, self.path)  # a checkpoint is never half written
+
+
+def prune_checkpoints(checkpoint_dir: str, max_bytes: int, keep: str = None):
+    '''deletes the least recently saved checkpoints until the others take at most max_bytes'''
+    try:
+        paths = [os.path.join(checkpoint_dir, f) for f in os.listdir(checkpoint_dir)
+                 if f.endswith(".json") or f.endswith(".json.tmp")]
+    except OSError:
+        return
+    files = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((path != keep, stat.st_mtime, stat.st_size, path))
+    total = sum(f[2] for f in files)
+    for (removable, _, size, path) in sorted(files, key=lambda f: (-f[0], f[1])):
+        if total <= max_bytes or not removable:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def problem_key(model: cobra.Model, targets, desired, enum_method: int, max_mcs_size: int,
+                exclude_boundary_reactions_as_cuts: bool, no_cuts=()) -> str:
+    '''hash of everything that determines the cut sets of an enumeration'''
+    key = hashlib.sha256()
+    key.update(repr((model.reactions.list_attr("id"), model.metabolites.list_attr("id"),
+                     [r.bounds for r in model.reactions], enum_method, max_mcs_size,
+                     exclude_boundary_reactions_as_cuts, sorted(no_cuts))).encode())
+    matrices = [create_stoichiometric_matrix(model, array_type='lil')]
+    for regions in (targets, desired or []):
+        key.update(repr(len(regions)).encode())
+        for (mat, rhs) in regions:
+            matrices.append(mat)
+            key.update(numpy.asarray(rhs, dtype=float).tobytes())
+    for mat in matrices:
+        mat = scipy.sparse.coo_matrix(mat)
+        key.update(repr(mat.shape).encode())
+        for array in (mat.row, mat.col):
+            key.update(numpy.asarray(array, dtype=numpy.int64).tobytes())
+        key.update(numpy.asarray(mat.data, dtype=float).tobytes())
+    return key.hexdigest()
+
+
+def region_is_feasible(model: cobra.Model, mat, rhs) -> bool:
+    with model as feas:
+        feas.objective = feas.problem.Objective(0.0)
+        feas.add_cons_vars(leq_constraints(feas, mat, rhs))
+        feas.slim_optimize()
+        return feas.solver.status == 'optimal'
+
+
+def integrate_bounds(model: cobra.Model, regions):
+    '''the regions (A, b) extended by the reaction bounds of model'''
+    (bounds_mat, bounds_rhs) = bounds_to_leq_matrix(model)
+    return [(scipy.sparse.vstack((mat, bounds_mat), format='lil'),
+             numpy.hstack((rhs, bounds_rhs))) for (mat, rhs) in regions]
+
+
+def cut_candidates(model: cobra.Model, desired, exclude_boundary_reactions_as_cuts=False,
+                   fva_tolerance=1e-9):
+    '''
+    Boolean array of the reactions that can be cut and the desired regions
+    extended by their flux ranges as (A, b, lb, ub). Blocked reactions and
+    reactions that are essential for a desired region are not cut.
+    '''
+    for (i, (mat, rhs)) in enumerate(desired):
+        if not region_is_feasible(model, mat, rhs):
+            raise InfeasibleRegion('Desired region '+str(i)+' is not feasible.')
+    cuts = numpy.full(len(model.reactions), True, dtype=bool)
+    if exclude_boundary_reactions_as_cuts:
+        cuts[[r.boundary for r in model.reactions]] = False
+    with model as fva:
+        fva.tolerance = fva_tolerance
+        fva_res = cobra.flux_analysis.flux_variability_analysis(
+            fva, fraction_of_optimum=0.0, processes=1)
+    blocked = (fva_res.values[:, 0] >= -fva_tolerance) & (fva_res.values[:, 1] <= fva_tolerance)
+    cuts[blocked] = False
+
+    # the enumerator needs the flux ranges of the desired regions
+    desired_ranges = []
+    for (mat, rhs) in desired:
+        with model as fva:
+            fva.tolerance = fva_tolerance
+            fva.add_cons_vars(leq_constraints(fva, mat, rhs))
+            fva_res = cobra.flux_analysis.flux_variability_analysis(
+                fva, fraction_of_optimum=0.0, processes=1)
+        (lb, ub) = (fva_res.values[:, 0], fva_res.values[:, 1])
+        lb[numpy.abs(lb) < fva_tolerance] = 0
+        ub[numpy.abs(ub) < fva_tolerance] = 0
+        cuts[(lb > 0) | (ub < 0)] = False  # essential reactions
+        desired_ranges.append((mat, rhs, lb, ub))
+    return (cuts, desired_ranges)
+
+
+def is_cut_set(model: cobra.Model, targets, cut: List[str]) -> bool:
+    '''whether all target regions become infeasible when the reactions in cut are knocked out'''
+    with model as ko:
+        for r in cut:
+            ko.reactions.get_by_id(r).knock_out()
+        return not any(region_is_feasible(ko, mat, rhs) for (mat, rhs) in targets)
+
+
+def leq_constraints(model: cobra.Model, mat, rhs):
+    '''constraints mat v <= rhs on the fluxes v of model'''
+    mat = scipy.sparse.csr_matrix(mat)
+    flux_expr = [r.flux_expression for r in model.reactions]
+    constraints = []
+    for i in range(mat.shape[0]):
+        row = mat.getrow(i)
+        expr = sum(c * flux_expr[j] for (j, c) in zip(row.indices, row.data))
+        constraints.append(model.problem.Constraint(expr, ub=rhs[i]))
+    return constraints
+
+
+def bounds_to_leq_matrix(model: cobra.Model):
+    '''the reaction bounds that differ from 0 and the defaults as (A, b) with A v <= b'''
+    config = cobra.Configuration()
+    rows = []
+    rhs = []
+    for (i, r) in enumerate(model.reactions):
+        if r.lower_bound not in (0, config.lower_bound, -float('inf')):
+            rows.append((i, -1.0))
+            rhs.append(-r.lower_bound)
+        if r.upper_bound not in (0, config.upper_bound, float('inf')):
+            rows.append((i, 1.0))
+            rhs.append(r.upper_bound)
+    mat = scipy.sparse.lil_matrix((len(rows), len(model.reactions)))
+    for (k, (i, c)) in enumerate(rows):
+        mat[k, i] = c
+    return (mat, numpy.array(rhs))
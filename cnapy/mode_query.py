@@ -0,0 +1,182 @@
+"""Filtering of computed modes"""
+import re
+from typing import Dict, List
+
+import numpy
+
+from cnapy.cut_set_container import CutSetContainer
+from cnapy.flux_vector_container import FluxVectorContainer, rows_per_chunk
+
+_term = re.compile(
+    r'^(?P<neg>!)?(?:yield\((?P<p>[^/]+)/(?P<s>[^)]+)\)|(?P<r>[^<>=!]+))(?:(?P<op><=|>=|==|!=|=|<|>)(?P<val>.+))?$')
+_ops = {'<=': numpy.less_equal, '>=': numpy.greater_equal, '<': numpy.less, '>': numpy.greater,
+        '=': numpy.equal, '==': numpy.equal, '!=': numpy.not_equal}
+
+
+def modes_as_container(modes) -> FluxVectorContainer:
+    '''Mode lists (e.g. cut sets) become a container with entry 1 for each reaction of a mode'''
+    if isinstance(modes, FluxVectorContainer):
+        return modes
+    reac_id = sorted(set(r for m in modes for r in m))
+    idx = {r: i for i, r in enumerate(reac_id)}
+    fv_mat = numpy.zeros((len(modes), len(reac_id)))
+    for i, m in enumerate(modes):
+        fv_mat[i, [idx[r] for r in m]] = 1
+    return FluxVectorContainer(fv_mat, reac_id)
+
+
+class ModeQuery:
+    '''
+    Selects modes with queries that consist of terms separated by spaces, all of which must hold:
+    R           reaction R is used
+    !R          reaction R is not used
+    R>0, R<=2.5 comparison of the flux of R (also <, >=, =, !=)
+    size<=10    comparison of the number of reactions in the mode
+    yield(P/S)>=0.8
+                comparison of the flux of P divided by the absolute flux of S, modes without S are excluded
+    The support of each reaction is computed on first use in one chunked pass over the modes and
+    kept as bitset so that participation terms only combine bitsets. When modes are added to the
+    container (e.g. cut sets while they are computed) the bitsets are computed anew.
+    Cut sets have no fluxes, only participation and size terms can be used for them.
+    '''
+
+    def __init__(self, modes, chunk_rows=None):
+        self.modes = modes
+        self.container = modes_as_container(modes)
+        if chunk_rows is None:
+            chunk_rows = rows_per_chunk(len(self.container.reac_id))
+        self.chunk_rows = max(8, chunk_rows - chunk_rows % 8)  # keeps the packed chunks aligned
+        self.reac_idx: Dict[str, int] = {
+            r: i for i, r in enumerate(self.container.reac_id)}
+        self.supports: Dict[int, numpy.array] = {}
+        self._support_size = None
+        self._num_modes = len(modes)
+
+    def __len__(self):
+        return len(self.container)
+
+    def refresh(self) -> bool:
+        '''drops what was computed for the modes when the number of modes has changed, returns whether it has'''
+        if len(self.modes) == self._num_modes:
+            return False
+        self.container = modes_as_container(self.modes)
+        self.reac_idx = {r: i for i, r in enumerate(self.container.reac_id)}
+        self.supports = {}
+        self._support_size = None
+        self._num_modes = len(self.modes)
+        return True
+
+    def index_supports(self, reactions: List[int]):
+        '''bitsets of the modes using the given reaction indices'''
+        missing = [r for r in reactions if r not in self.supports]
+        if len(missing) > 0:
+            parts = {r: [] for r in missing}
+            for _, chunk in self.container.chunks(self.chunk_rows):
+                nz = chunk[:, missing] != 0
+                for j, r in enumerate(missing):
+                    parts[r].append(numpy.packbits(nz[:, j]))
+            for r in missing:
+                if len(parts[r]) > 0:
+                    self.supports[r] = numpy.concatenate(parts[r])
+                else:
+                    self.supports[r] = numpy.zeros(0, dtype=numpy.uint8)
+        return [self.supports[r] for r in reactions]
+
+    def support_size(self) -> numpy.array:
+        '''number of reactions in each mode'''
+        if self._support_size is None:
+            fv_mat = self.container.fv_mat
+            if hasattr(fv_mat, 'row_ptr'):
+                self._support_size = numpy.diff(fv_mat.row_ptr)
+            elif hasattr(fv_mat, 'indptr'):
+                self._support_size = numpy.diff(fv_mat.indptr)
+            else:
+                self._support_size = numpy.zeros(len(self), dtype=numpy.int64)
+                for start, chunk in self.container.chunks(self.chunk_rows):
+                    self._support_size[start:start+len(chunk)] = numpy.count_nonzero(chunk, axis=1)
+        return self._support_size
+
+    def values(self, reactions: List[int], selected: numpy.array) -> numpy.array:
+        '''fluxes of the given reactions in the selected modes'''
+        result = numpy.zeros((len(selected), len(reactions)))
+        for start in range(0, len(selected), self.chunk_rows):
+            idx = selected[start:start+self.chunk_rows]
+            result[start:start+len(idx)] = self.container.rows(idx)[:, reactions]
+        return result
+
+    def reaction_index(self, reaction: str) -> int:
+        try:
+            return self.reac_idx[reaction]
+        except KeyError:
+            raise ValueError('Unknown reaction ' + reaction + ' in query')
+
+    def select(self, query: str) -> numpy.array:
+        '''indices of the modes that match the query'''
+        self.refresh()
+        n = len(self)
+        mask = numpy.full((n + 7) // 8, 255, dtype=numpy.uint8)
+        value_terms = []
+        for term in query.split():
+            m = _term.match(term)
+            if m is None:
+                raise ValueError('Cannot parse the query term ' + term)
+            if m.group('op') is not None:
+                try:
+                    val = float(m.group('val'))
+                except ValueError:
+                    raise ValueError('Cannot parse the query term ' + term)
+                if m.group('neg'):
+                    raise ValueError('Negate the comparison instead of the term ' + term)
+                if m.group('r') != 'size' and isinstance(self.container, CutSetContainer):
+                    raise ValueError('Cut sets have no fluxes to compare in ' + term)
+            if m.group('p') is not None:
+                if m.group('op') is None:
+                    raise ValueError('A yield needs a comparison in ' + term)
+                p = self.reaction_index(m.group('p'))
+                s = self.reaction_index(m.group('s'))
+                mask &= self.index_supports([s])[0]
+                value_terms.append(('yield', [p, s], _ops[m.group('op')], val))
+            elif m.group('r') == 'size':
+                if m.group('op') is None:
+                    raise ValueError('The size needs a comparison in ' + term)
+                size = numpy.packbits(_ops[m.group('op')](self.support_size(), val))
+                mask &= size
+            else:
+                r = self.reaction_index(m.group('r'))
+                if m.group('op') is None:
+                    if m.group('neg'):
+                        mask &= ~self.index_supports([r])[0]
+                    else:
+                        mask &= self.index_supports([r])[0]
+                else:
+                    if not _ops[m.group('op')](0, val):  # modes without r cannot match
+                        mask &= self.index_supports([r])[0]
+                    value_terms.append(('flux', [r], _ops[m.group('op')], val))
+
+        selected = numpy.flatnonzero(numpy.unpackbits(mask, count=n))
+        if len(value_terms) > 0 and len(selected) > 0:
+            columns = sorted(set(r for t in value_terms for r in t[1]))
+            col = {r: i for i, r in enumerate(columns)}
+            values = self.values(columns, selected)
+            keep = numpy.ones(len(selected), dtype=bool)
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                for (kind, reactions, op, val) in value_terms:
+                    if kind == 'yield':
+                        v = values[:, col[reactions[0]]] / numpy.abs(values[:, col[reactions[1]]])
+                    else:
+                        v = values[:, col[reactions[0]]]
+                    keep &= op(v, val)
+            selected = selected[keep]
+        return selected
+
+    def filter(self, query: str) -> FluxVectorContainer:
+        '''the modes that match the query in a new container'''
+        selected = self.select(query)
+        irreversible = self.container.irreversible
+        if irreversible.shape != ():
+            irreversible = irreversible[selected]
+        unbounded = self.container.unbounded
+        if unbounded.shape != ():
+            unbounded = unbounded[selected]
+        return FluxVectorContainer(self.container.rows(selected), self.container.reac_id,
+                                   irreversible, unbounded, storage='auto')
@@ -0,0 +1,222 @@
+"""External memory sorting, deduplication and merging of efmtool binary-doubles mode files
+
+The files consist of a 13 byte header (number of modes as int64, number of
+reactions as int32 and a flag byte) followed by the modes as rows of
+big-endian doubles. Only max_memory bytes of modes are held in memory at a time.
+"""
+import heapq
+import os
+import tempfile
+from typing import List, Union
+
+import numpy
+
+from cnapy.flux_vector_container import FluxVectorMemmap
+
+
+def sort_modes(fnames: Union[str, List[str]], out_fname: str, reac_id, key='support_size',
+               product: str = None, substrate: str = None, descending=False, unique=False,
+               decimals=9, max_memory=2**28) -> FluxVectorMemmap:
+    '''
+    Sort the modes of one or more files into out_fname.
+    key is 'support_size', 'yield' (flux of product divided by the absolute flux of substrate,
+    modes without substrate come last) or None to keep the order of the input.
+    With unique only the first of several modes that are equal after rounding to decimals is kept,
+    the keys are then computed from the rounded fluxes. With unique and no key the kept modes
+    are marked (one byte per mode) and written in a second pass over the input.
+    '''
+    if isinstance(fnames, str):
+        fnames = [fnames]
+    num_reac, flag = _read_header(fnames[0])[1:]
+    for fname in fnames[1:]:
+        if _read_header(fname)[1] != num_reac:
+            raise ValueError(fname + ' has a different number of reactions')
+    if key == 'yield':
+        reac_idx = {r: i for i, r in enumerate(reac_id)}
+        columns = (reac_idx[product], reac_idx[substrate])
+    elif key not in ('support_size', None):
+        raise ValueError('unknown sort key ' + str(key))
+    else:
+        columns = None
+    chunk_rows = max(1, max_memory // (8 * max(num_reac, 1)))
+    # without a key the kept modes are written in a second pass over the input
+    in_input_order = unique and key is None
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(out_fname))) as work_dir:
+        runs = []
+        offset = 0
+        for fname in fnames:
+            modes = _open(fname)
+            for start in range(0, modes.shape[0], chunk_rows):
+                chunk = numpy.array(modes[start:start+chunk_rows], dtype=numpy.float64)
+                index = numpy.arange(offset + start, offset + start + len(chunk), dtype=numpy.int64)
+                if unique:
+                    # modes that are equal after rounding need equal keys to become adjacent
+                    keys = _sort_keys(_rounded(chunk, decimals), key, columns, descending)
+                    hashes = _row_hashes(chunk, decimals)
+                else:
+                    keys = _sort_keys(chunk, key, columns, descending)
+                    hashes = numpy.zeros(len(chunk), dtype=numpy.uint64)
+                # stable, so that equal modes stay in the order of the input
+                order = numpy.lexsort((hashes, keys))
+                run_fname = os.path.join(work_dir, 'run' + str(len(runs)) + '.bin')
+                _write_modes(run_fname, chunk[order], flag)
+                numpy.save(run_fname + '.keys.npy', keys[order])
+                numpy.save(run_fname + '.hashes.npy', hashes[order])
+                numpy.save(run_fname + '.index.npy', index[order])
+                runs.append(run_fname)
+            offset += modes.shape[0]
+            del modes
+
+        block_rows = max(1, chunk_rows // (len(runs) + 1))
+        readers = [_run_reader(run, block_rows) for run in runs]
+        keep = numpy.zeros(offset if in_input_order else 0, dtype=bool)
+        with ModeWriter(out_fname, num_reac, flag, block_rows) as writer:
+            # equal modes are adjacent in the merged order, only those with the same
+            # key and hash as the current mode need to be compared with it
+            last = None
+            same_hash = []
+            for (k, h, i, row) in heapq.merge(*readers):
+                if unique:
+                    rounded = _rounded(row, decimals)
+                    if last != (k, h):
+                        last = (k, h)
+                        same_hash = []
+                    elif any(numpy.array_equal(rounded, r) for r in same_hash):
+                        continue
+                    same_hash.append(rounded)
+                if in_input_order:
+                    keep[i] = True
+                else:
+                    writer.append(row)
+
+            if in_input_order:
+                offset = 0
+                for fname in fnames:
+                    modes = _open(fname)
+                    for start in range(0, modes.shape[0], chunk_rows):
+                        chunk = numpy.array(modes[start:start+chunk_rows], dtype=numpy.float64)
+                        for row in chunk[keep[offset+start:offset+start+len(chunk)]]:
+                            writer.append(row)
+                    offset += modes.shape[0]
+                    del modes
+
+    return FluxVectorMemmap(out_fname, reac_id)
+
+
+def deduplicate(fname: str, out_fname: str, reac_id, decimals=9, max_memory=2**28) -> FluxVectorMemmap:
+    '''Remove modes that are equal after rounding to decimals, the result is sorted by support size'''
+    return sort_modes(fname, out_fname, reac_id, unique=True, decimals=decimals, max_memory=max_memory)
+
+
+def merge(fnames: List[str], out_fname: str, reac_id, key='support_size', unique=False,
+          max_memory=2**28, **kwargs) -> FluxVectorMemmap:
+    '''Combine the modes of several files (with the same reactions) into one file'''
+    return sort_modes(fnames, out_fname, reac_id, key=key, unique=unique, max_memory=max_memory, **kwargs)
+
+
+class ModeWriter:
+    '''Writes modes in blocks to a binary-doubles file, the header is completed on close'''
+
+    def __init__(self, fname: str, num_reac: int, flag=b'\x00', block_rows=10000):
+        self.fh = open(fname, 'wb')
+        self.num_reac = num_reac
+        self.num_modes = 0
+        self.block = numpy.zeros((max(1, block_rows), num_reac))
+        self.rows = 0
+        _write_header(self.fh, 0, num_reac, flag)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def append(self, row: numpy.array):
+        self.block[self.rows] = row
+        self.rows += 1
+        if self.rows == len(self.block):
+            self.flush()
+
+    def flush(self):
+        self.block[:self.rows].astype('>d').tofile(self.fh)
+        self.num_modes += self.rows
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+        self.fh.seek(0)
+        numpy.array([self.num_modes], dtype='>i8').tofile(self.fh)
+        self.fh.close()
+
+
+def _read_header(fname: str):
+    with open(fname, 'rb') as fh:
+        num_modes = int(numpy.fromfile(fh, dtype='>i8', count=1)[0])
+        num_reac = int(numpy.fromfile(fh, dtype='>i4', count=1)[0])
+        flag = fh.read(1)
+    return num_modes, num_reac, flag
+
+
+def _write_header(fh, num_modes: int, num_reac: int, flag: bytes):
+    numpy.array([num_modes], dtype='>i8').tofile(fh)
+    numpy.array([num_reac], dtype='>i4').tofile(fh)
+    fh.write(flag)
+
+
+def _open(fname: str) -> numpy.memmap:
+    num_modes, num_reac, _ = _read_header(fname)
+    return numpy.memmap(fname, mode='r', dtype='>d', offset=13, shape=(num_modes, num_reac))
+
+
+def _write_modes(fname: str, modes: numpy.array, flag: bytes):
+    with open(fname, 'wb') as fh:
+        _write_header(fh, modes.shape[0], modes.shape[1], flag)
+        modes.astype('>d').tofile(fh)
+
+
+def _sort_keys(chunk: numpy.array, key, columns, descending: bool) -> numpy.array:
+    if key == 'support_size':
+        keys = numpy.count_nonzero(chunk, axis=1).astype(numpy.float64)
+    elif key == 'yield':
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            keys = chunk[:, columns[0]] / numpy.abs(chunk[:, columns[1]])
+        keys[chunk[:, columns[1]] == 0] = numpy.nan
+    else:
+        keys = numpy.zeros(len(chunk))
+    if descending:
+        keys = -keys
+    keys[numpy.isnan(keys)] = numpy.inf
+    return keys
+
+
+def _rounded(chunk: numpy.array, decimals: int) -> numpy.array:
+    return numpy.round(chunk, decimals) + 0.0  # also turns -0.0 into 0.0
+
+
+def _row_hashes(chunk: numpy.array, decimals: int, block_rows=4096) -> numpy.array:
+    '''64 bit hashes of the rounded rows, computed in blocks to keep the temporary arrays small'''
+    # odd multipliers so that a change in any single column always changes the hash
+    multipliers = numpy.random.default_rng(0).integers(
+        0, 2**63, chunk.shape[1], dtype=numpy.uint64) * numpy.uint64(2) + numpy.uint64(1)
+    hashes = numpy.empty(len(chunk), dtype=numpy.uint64)
+    for start in range(0, len(chunk), block_rows):
+        bits = _rounded(chunk[start:start+block_rows], decimals).view(numpy.uint64)
+        hashes[start:start+block_rows] = (bits * multipliers).sum(axis=1, dtype=numpy.uint64)
+    return hashes
+
+
+def _run_reader(fname: str, block_rows: int):
+    '''yields (key, hash, index in the input, row) of a sorted run'''
+    modes = _open(fname)
+    keys = numpy.load(fname + '.keys.npy', mmap_mode='r')
+    hashes = numpy.load(fname + '.hashes.npy', mmap_mode='r')
+    index = numpy.load(fname + '.index.npy', mmap_mode='r')
+    for start in range(0, modes.shape[0], block_rows):
+        block = numpy.array(modes[start:start+block_rows], dtype=numpy.float64)
+        block_keys = keys[start:start+block_rows].tolist()
+        block_hashes = hashes[start:start+block_rows].tolist()
+        block_index = index[start:start+block_rows].tolist()
+        for i in range(len(block)):
+            yield (block_keys[i], block_hashes[i], block_index[i], block[i])
+    del modes, keys, hashes, index
@@ -0,0 +1,84 @@
+"""Statistics over sets of modes
+
+All functions make chunked passes over the modes so that memory use stays
+bounded when the modes are memory mapped.
+"""
+from typing import Dict, List, Tuple
+
+import numpy
+
+from cnapy.mode_query import modes_as_container
+
+
+def participation_frequency(modes, chunk_rows=None) -> Dict[str, float]:
+    '''fraction of the modes in which each reaction has a nonzero flux'''
+    modes = modes_as_container(modes)
+    counts = numpy.zeros(len(modes.reac_id), dtype=numpy.int64)
+    for _, chunk in modes.chunks(chunk_rows):
+        counts += numpy.count_nonzero(chunk, axis=0)
+    total = max(len(modes), 1)
+    return {r: float(counts[i] / total) for i, r in enumerate(modes.reac_id)}
+
+
+def support_size_histogram(modes, chunk_rows=None) -> numpy.array:
+    '''entry i is the number of modes with i reactions'''
+    modes = modes_as_container(modes)
+    counts = numpy.zeros(len(modes.reac_id) + 1, dtype=numpy.int64)
+    for _, chunk in modes.chunks(chunk_rows):
+        counts += numpy.bincount(numpy.count_nonzero(chunk, axis=1),
+                                 minlength=len(counts))
+    return counts
+
+
+def flux_histograms(modes, reactions: List[str] = None, bins=20, nonzero_only=True,
+                    chunk_rows=None) -> Dict[str, Tuple[numpy.array, numpy.array]]:
+    '''(counts, bin edges) of the fluxes of each reaction; the first pass
+    determines the flux ranges, the second one fills the histograms'''
+    modes = modes_as_container(modes)
+    if reactions is None:
+        reactions = list(modes.reac_id)
+    reac_idx = {r: i for i, r in enumerate(modes.reac_id)}
+    cols = [reac_idx[r] for r in reactions]
+
+    low = numpy.full(len(cols), numpy.inf)
+    high = numpy.full(len(cols), -numpy.inf)
+    for _, chunk in modes.chunks(chunk_rows):
+        values = _masked(chunk[:, cols], nonzero_only)
+        low = numpy.fmin(low, numpy.nanmin(values, axis=0, initial=numpy.inf))
+        high = numpy.fmax(high, numpy.nanmax(values, axis=0, initial=-numpy.inf))
+    low[numpy.isinf(low)] = 0
+    high[numpy.isinf(high)] = 0
+    edges = [numpy.linspace(low[j], high[j] if high[j] > low[j] else low[j] + 1, bins + 1)
+             for j in range(len(cols))]
+
+    counts = numpy.zeros((len(cols), bins), dtype=numpy.int64)
+    for _, chunk in modes.chunks(chunk_rows):
+        values = _masked(chunk[:, cols], nonzero_only)
+        for j in range(len(cols)):
+            v = values[:, j]
+            counts[j] += numpy.histogram(v[~numpy.isnan(v)], bins=edges[j])[0]
+    return {r: (counts[j], edges[j]) for j, r in enumerate(reactions)}
+
+
+def yield_distribution(modes, product: str, substrate: str, bins=20,
+                       chunk_rows=None) -> Tuple[numpy.array, numpy.array]:
+    '''(counts, bin edges) of the flux of product divided by the absolute flux
+    of substrate over the modes that use substrate'''
+    modes = modes_as_container(modes)
+    reac_idx = {r: i for i, r in enumerate(modes.reac_id)}
+    cols = [reac_idx[product], reac_idx[substrate]]
+    yields = []
+    for _, chunk in modes.chunks(chunk_rows):
+        values = chunk[:, cols]
+        values = values[values[:, 1] != 0]
+        yields.append(values[:, 0] / numpy.abs(values[:, 1]))
+    # only one value per mode is kept which is much smaller than the modes
+    yields = numpy.concatenate(yields) if len(yields) > 0 else numpy.zeros(0)
+    return numpy.histogram(yields, bins=bins)
+
+
+def _masked(values: numpy.array, nonzero_only: bool) -> numpy.array:
+    values = values.astype(numpy.float64)
+    if nonzero_only:
+        values[values == 0] = numpy.nan
+    return values
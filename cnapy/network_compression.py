@@ -0,0 +1,260 @@
+"""Network compression that shrinks a model before minimal cut sets are computed"""
+import itertools
+from typing import List, Tuple
+
+import cobra
+import numpy
+import scipy.linalg
+import scipy.sparse
+from cobra.util.array import create_stoichiometric_matrix
+from cobra.util.solver import interface_to_str
+
+
+class NetworkCompression:
+    '''Removes blocked reactions, lumps fully coupled reactions and merges
+    parallel reactions of a model
+
+    Each reaction of the compressed model stands for a group of original
+    reactions. Cutting a lumped reaction means cutting one of its members,
+    cutting a merged reaction means cutting all of them. Reactions that occur
+    in the regions are not merged, the regions are rewritten for the
+    compressed model with compress_regions. The reactions in no_cuts are
+    never part of an expanded cut set.
+    '''
+
+    def __init__(self, model: cobra.Model, regions=(), no_cuts=(), tolerance=1e-9):
+        self.reac_id = model.reactions.list_attr("id")
+        self.tolerance = tolerance
+        config = cobra.Configuration()
+        # default bounds are treated as unbounded, like in the MCS regions
+        lb = numpy.array([-numpy.inf if r.lower_bound <= config.lower_bound else r.lower_bound
+                          for r in model.reactions])
+        ub = numpy.array([numpy.inf if r.upper_bound >= config.upper_bound else r.upper_bound
+                          for r in model.reactions])
+        protected = numpy.full(len(self.reac_id), False, dtype=bool)
+        for (mat, _) in regions:
+            protected |= scipy.sparse.csr_matrix(mat).getnnz(axis=0) > 0
+        no_cuts = set(no_cuts)
+
+        with model as fva:
+            fva.tolerance = tolerance
+            fva_res = cobra.flux_analysis.flux_variability_analysis(
+                fva, fraction_of_optimum=0.0, processes=1)
+        blocked = (fva_res.values[:, 0] >= -tolerance) & (fva_res.values[:, 1] <= tolerance)
+        keep = numpy.flatnonzero(~blocked)
+
+        # the state of the compressed network, one entry per compressed reaction
+        self.stoich = create_stoichiometric_matrix(model, array_type='dok')
+        self.stoich = scipy.sparse.csc_matrix(self.stoich, dtype=float)[:, keep]
+        self.kernel = None
+        self.lb = lb[keep]
+        self.ub = ub[keep]
+        self.members = [[i] for i in keep]
+        self.cut_options = [[] if self.reac_id[i] in no_cuts else [(i,)] for i in keep]
+        self.protected = list(protected[keep])
+        # flux of an original reaction as factor * flux of its compressed reaction
+        self.column = numpy.full(len(self.reac_id), -1)
+        self.column[keep] = numpy.arange(len(keep))
+        self.factor = numpy.zeros(len(self.reac_id))
+        self.factor[keep] = 1.0
+
+        # linear chains shrink the network cheaply before the kernel is needed,
+        # which is then computed once and updated along with the reactions
+        while self._lump_chains() | self._merge_parallel():
+            pass
+        self.kernel = _kernel(self.stoich)
+        while self._lump_coupled() | self._merge_parallel():
+            pass
+        self._orient_forward()
+
+        used = numpy.flatnonzero(self.stoich.getnnz(axis=1) > 0)
+        self.metabolites = [model.metabolites[i] for i in used]
+        self.stoich = self.stoich[used, :]
+        self.model = self._create_model(model)
+
+    def _lump_chains(self) -> bool:
+        '''lumps the two reactions of each metabolite that only occurs in them'''
+        rows = self.stoich.tocsr()
+        rows.sort_indices()
+        pairs = []
+        used = set()
+        for k in numpy.flatnonzero(numpy.diff(rows.indptr) == 2):
+            (i, j) = rows.indices[rows.indptr[k]:rows.indptr[k]+2]
+            if i in used or j in used:
+                continue
+            (s_i, s_j) = rows.data[rows.indptr[k]:rows.indptr[k]+2]
+            # S_ki * v_i + S_kj * v_j = 0 in every steady state
+            pairs.append((i, j, -s_i / s_j))
+            used.update((i, j))
+        self._lump(pairs)
+        return len(pairs) > 0
+
+    def _lump_coupled(self) -> bool:
+        '''lumps reactions whose fluxes are proportional in every steady state'''
+        kernel = self.kernel
+        groups = _proportional_groups(kernel, self.tolerance)
+        pairs = [(group[0], j, kernel[j] @ kernel[group[0]] / (kernel[group[0]] @ kernel[group[0]]))
+                 for group in groups for j in group[1:]]
+        self._lump(pairs)
+        return len(pairs) > 0
+
+    def _lump(self, pairs: List[Tuple[int, int, float]]):
+        '''
+        lumps reaction j into reaction i for each (i, j, factor) with v_j = factor * v_i,
+        no reaction may be lumped into another one and also receive reactions
+        '''
+        if len(pairs) == 0:
+            return
+        transform = scipy.sparse.identity(len(self.lb), format='lil')
+        for (i, j, factor) in pairs:
+            if abs(factor - round(factor)) < self.tolerance:
+                factor = round(factor)
+            (lb, ub) = (self.lb[j] / factor, self.ub[j] / factor)
+            if factor < 0:
+                (lb, ub) = (ub, lb)
+            self.lb[i] = max(self.lb[i], lb)
+            self.ub[i] = min(self.ub[i], ub)
+            transform[j, i] = factor
+            self._move_members(j, i, factor)
+            self.cut_options[i] = self.cut_options[i] + self.cut_options[j]
+            self.protected[i] = self.protected[i] or self.protected[j]
+        # S_i + factor * S_j is the stoichiometry of the lumped reaction
+        self.stoich = (self.stoich @ transform.tocsc()).tocsc()
+        self.stoich.data[numpy.abs(self.stoich.data) < self.tolerance] = 0
+        self.stoich.eliminate_zeros()
+        # the rows of the kernel for the lumped reactions stay valid
+        self._remove_columns([j for (_, j, _) in pairs])
+
+    def _merge_parallel(self) -> bool:
+        '''merges unprotected reactions with the same stoichiometry and no capacity limits'''
+        candidates = [i for i in range(len(self.lb)) if not self.protected[i] and
+                      numpy.isinf(self.ub[i]) and (self.lb[i] == 0 or numpy.isinf(self.lb[i]))]
+        groups = _proportional_groups(self.stoich[:, candidates].T.tocsr(), self.tolerance)
+        remove = []
+        for group in groups:
+            i = candidates[group[0]]
+            s_i = self.stoich[:, i].toarray().ravel()
+            for j in (candidates[k] for k in group[1:]):
+                # S_j = factor * S_i, v_i + factor * v_j is the flux of the merged reaction
+                factor = self.stoich[:, j].toarray().ravel() @ s_i / (s_i @ s_i)
+                if factor < 0 or self.lb[i] != self.lb[j]:
+                    continue
+                self._move_members(j, i, numpy.nan)
+                self.factor[self.column == i] = numpy.nan  # no longer determined
+                self.cut_options[i] = [tuple(sorted(a + b)) for (a, b) in
+                                       itertools.product(self.cut_options[i], self.cut_options[j])]
+                if self.kernel is not None:
+                    self.kernel[i] += factor * self.kernel[j]
+                remove.append(j)
+        self._remove_columns(remove)
+        return len(remove) > 0
+
+    def _orient_forward(self):
+        '''reverses the reactions that can only run backwards'''
+        backward = numpy.flatnonzero((self.ub <= 0) & (self.lb < 0))
+        sign = numpy.ones(len(self.lb))
+        sign[backward] = -1
+        self.stoich = (self.stoich @ scipy.sparse.diags(sign)).tocsc()
+        (self.lb[backward], self.ub[backward]) = (-self.ub[backward], -self.lb[backward])
+        for i in backward:
+            self.factor[self.column == i] *= -1
+
+    def _move_members(self, j: int, i: int, factor: float):
+        self.members[i] = self.members[i] + self.members[j]
+        moved = self.column == j
+        self.column[moved] = i
+        self.factor[moved] *= factor
+
+    def _remove_columns(self, remove: List[int]):
+        keep = numpy.setdiff1d(numpy.arange(len(self.lb)), remove)
+        self.stoich = self.stoich[:, keep]
+        if self.kernel is not None:
+            self.kernel = self.kernel[keep]
+        self.lb = self.lb[keep]
+        self.ub = self.ub[keep]
+        self.members = [self.members[i] for i in keep]
+        self.cut_options = [self.cut_options[i] for i in keep]
+        self.protected = [self.protected[i] for i in keep]
+        new_column = numpy.full(len(keep) + len(remove), -1)
+        new_column[keep] = numpy.arange(len(keep))
+        assigned = self.column >= 0
+        self.column[assigned] = new_column[self.column[assigned]]
+
+    def _create_model(self, model: cobra.Model) -> cobra.Model:
+        config = cobra.Configuration()
+        compressed = cobra.Model(str(model.id) + "_compressed")
+        compressed.solver = interface_to_str(model.problem)
+        compressed.tolerance = model.tolerance
+        metabolites = [cobra.Metabolite(m.id, compartment=m.compartment) for m in self.metabolites]
+        reactions = []
+        lb = numpy.where(numpy.isinf(self.lb), config.lower_bound, self.lb)
+        ub = numpy.where(numpy.isinf(self.ub), config.upper_bound, self.ub)
+        for i in range(len(self.lb)):
+            reaction = cobra.Reaction(self.reac_id[self.members[i][0]],
+                                      lower_bound=lb[i], upper_bound=ub[i])
+            (start, end) = (self.stoich.indptr[i], self.stoich.indptr[i+1])
+            reaction.add_metabolites({metabolites[k]: v for (k, v) in
+                                      zip(self.stoich.indices[start:end], self.stoich.data[start:end])})
+            reactions.append(reaction)
+        compressed.add_reactions(reactions)
+        return compressed
+
+    @property
+    def no_cuts(self) -> List[str]:
+        '''the compressed reactions that cannot be cut'''
+        return [r.id for (r, options) in zip(self.model.reactions, self.cut_options)
+                if len(options) == 0]
+
+    def compress_regions(self, regions):
+        '''the regions (A, b) of the original model for the compressed model'''
+        determined = (self.column >= 0) & ~numpy.isnan(self.factor)
+        rows = numpy.flatnonzero(determined)
+        transform = scipy.sparse.csr_matrix(
+            (self.factor[rows], (rows, self.column[rows])),
+            shape=(len(self.reac_id), len(self.lb)))
+        return [(scipy.sparse.csr_matrix(mat) @ transform, rhs) for (mat, rhs) in regions]
+
+    def expand(self, mcs: List[Tuple[str]], max_mcs_size: int = None) -> List[Tuple[str]]:
+        '''the cut sets of the original model that the cut sets of the compressed model stand for'''
+        index = {r.id: i for (i, r) in enumerate(self.model.reactions)}
+        expanded = []
+        for m in mcs:
+            for options in itertools.product(*(self.cut_options[index[r]] for r in m)):
+                cut = sorted(set(itertools.chain.from_iterable(options)))
+                if max_mcs_size is None or len(cut) <= max_mcs_size:
+                    expanded.append(tuple(self.reac_id[i] for i in cut))
+        return expanded
+
+
+def _kernel(stoich: scipy.sparse.csc_matrix) -> numpy.ndarray:
+    '''
+    basis of the kernel of stoich from a QR decomposition with column pivoting,
+    which unlike an SVD does not need a square matrix with one row per reaction
+    '''
+    mat = stoich[numpy.flatnonzero(stoich.getnnz(axis=1) > 0), :].toarray()
+    n = mat.shape[1]
+    if mat.shape[0] == 0:
+        return numpy.identity(n)
+    (_, r, perm) = scipy.linalg.qr(mat, mode='economic', pivoting=True)
+    diag = numpy.abs(numpy.diag(r))
+    rank = int(numpy.sum(diag > max(mat.shape) * numpy.finfo(float).eps * diag[0]))
+    # the free fluxes are those of the columns after the first rank pivots
+    kernel = numpy.zeros((n, n - rank))
+    kernel[perm[rank:], :] = numpy.identity(n - rank)
+    kernel[perm[:rank], :] = -scipy.linalg.solve_triangular(r[:rank, :rank], r[:rank, rank:])
+    return kernel
+
+
+def _proportional_groups(rows, tolerance: float) -> List[List[int]]:
+    '''groups of at least two nonzero rows that are multiples of each other, rows can be sparse'''
+    rows = scipy.sparse.csr_matrix(rows)
+    rows.sort_indices()
+    norm = numpy.sqrt(numpy.asarray(rows.multiply(rows).sum(axis=1)).ravel())
+    groups = {}
+    for i in numpy.flatnonzero(norm > tolerance):
+        (start, end) = (rows.indptr[i], rows.indptr[i+1])
+        row = numpy.round(rows.data[start:end] / norm[i], 8)
+        nonzero = numpy.flatnonzero(row)
+        row = row[nonzero] * numpy.sign(row[nonzero[0]]) + 0.0
+        groups.setdefault((tuple(rows.indices[start:end][nonzero]), tuple(row)), []).append(int(i))
+    return [g for g in groups.values() if len(g) > 1]
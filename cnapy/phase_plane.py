@@ -0,0 +1,142 @@
+"""Production envelopes for the phase plane plots"""
+import heapq
+from multiprocessing import Pool
+from typing import List
+
+import cobra
+import numpy
+
+from cnapy.lp_cache import LPCache, LPSnapshot
+
+
+def production_envelope(job, lp_cache: LPCache, snapshot: LPSnapshot, x_id: str, y_id: str,
+                        z_id: str = None, points=100, grid_points=25):
+    '''Phase plane job
+
+    Returns (x, y_min, y_max) where x is sampled adaptively with up to points
+    values, most of them where the envelope bends. With z_id the result is
+    (X, Y, Z_min, Z_max) on a grid_points x grid_points grid of feasible
+    (x, y) pairs instead.
+    '''
+    lp = lp_cache.update(snapshot)
+    with lp as lp:
+        x_range = _optimize(lp, x_id)
+        if numpy.isnan(x_range).any():
+            raise cobra.exceptions.Infeasible("The scenario is infeasible")
+        with EnvelopeEvaluator(lp, cobra.Configuration().processes) as evaluate:
+            if z_id is None:
+                return adaptive_envelope(job, evaluate, x_id, y_id, x_range[0], x_range[1], points)
+
+            x = numpy.linspace(x_range[0], x_range[1], grid_points)
+            y_range = evaluate([x_id], y_id, x[:, numpy.newaxis])
+            X = numpy.repeat(x[:, numpy.newaxis], grid_points, axis=1)
+            Y = numpy.array([numpy.linspace(lb, ub, grid_points)
+                             for (lb, ub) in y_range])
+            z = numpy.full((grid_points * grid_points, 2), numpy.nan)
+            xy = numpy.column_stack((X.ravel(), Y.ravel()))
+            for i in range(0, len(xy), grid_points):
+                if job.is_cancelled():
+                    return None
+                z[i:i+grid_points] = evaluate(
+                    [x_id, y_id], z_id, xy[i:i+grid_points])
+                job.report_progress(i + grid_points, len(xy))
+            return (X, Y, z[:, 0].reshape(X.shape), z[:, 1].reshape(X.shape))
+
+
+def adaptive_envelope(job, evaluate, x_id: str, y_id: str, x_lb: float, x_ub: float,
+                      points=100, initial_points=11, rel_tol=1e-3):
+    '''Sample the y-range over x, refining intervals whose midpoint deviates
+    from the linear interpolation of the interval ends'''
+    x = numpy.linspace(x_lb, x_ub, min(initial_points, points))
+    values = evaluate([x_id], y_id, x[:, numpy.newaxis])
+    samples = {x[i]: values[i] for i in range(len(x))}
+    scale = max(numpy.abs(numpy.nan_to_num(values)).max(), 1.0)
+    # intervals ordered by the deviation found in their parent, initially all equal
+    candidates = [(-numpy.inf, x[i], x[i+1]) for i in range(len(x) - 1)]
+    heapq.heapify(candidates)
+    batch_size = max(4, 2 * cobra.Configuration().processes)
+    while len(candidates) > 0 and len(samples) < points:
+        if job.is_cancelled():
+            return None
+        batch = [heapq.heappop(candidates)
+                 for _ in range(min(batch_size, len(candidates), points - len(samples)))]
+        mid = numpy.array([(a + b) / 2 for (_, a, b) in batch])
+        values = evaluate([x_id], y_id, mid[:, numpy.newaxis])
+        for (_, a, b), m, v in zip(batch, mid, values):
+            samples[m] = v
+            deviation = numpy.nanmax(numpy.abs(v - (samples[a] + samples[b]) / 2))
+            if deviation > rel_tol * scale:
+                heapq.heappush(candidates, (-deviation, a, m))
+                heapq.heappush(candidates, (-deviation, m, b))
+        job.report_progress(len(samples), points)
+
+    x = numpy.array(sorted(samples.keys()))
+    values = numpy.array([samples[v] for v in x])
+    return (x, values[:, 0], values[:, 1])
+
+
+class EnvelopeEvaluator:
+    '''Computes the range of a reaction while other reactions are fixed
+
+    The points are distributed over worker processes that each hold their own
+    copy of the LP, otherwise the given model is changed in place and must be
+    used within a context.
+    '''
+
+    def __init__(self, model: cobra.Model, processes=1):
+        self.model = model
+        self.processes = processes
+        self.pool = None
+
+    def __enter__(self):
+        if self.processes > 1:
+            self.pool = Pool(self.processes, initializer=_init_worker,
+                             initargs=(self.model,))
+        return self
+
+    def __exit__(self, *args):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def __call__(self, fixed: List[str], objective: str, points: numpy.ndarray) -> numpy.ndarray:
+        '''Returns the (min, max) of objective for each row of points
+        which contains the values of the fixed reactions'''
+        if self.pool is None or len(points) < 2:
+            return _envelope_points(self.model, fixed, objective, points)
+        chunks = numpy.array_split(points, min(self.processes, len(points)))
+        results = self.pool.map(_worker_envelope_points,
+                                [(fixed, objective, c) for c in chunks])
+        return numpy.concatenate(results)
+
+
+_model = None
+
+
+def _init_worker(model: cobra.Model):
+    global _model
+    _model = model
+
+
+def _worker_envelope_points(args) -> numpy.ndarray:
+    return _envelope_points(_model, *args)
+
+
+def _envelope_points(model: cobra.Model, fixed: List[str], objective: str,
+                     points: numpy.ndarray) -> numpy.ndarray:
+    reactions = [model.reactions.get_by_id(r) for r in fixed]
+    model.objective = objective
+    result = numpy.full((len(points), 2), numpy.nan)
+    for i, values in enumerate(points):
+        for r, v in zip(reactions, values):
+            r.bounds = (v, v)
+        model.solver.objective.direction = 'min'
+        result[i, 0] = model.slim_optimize()
+        model.solver.objective.direction = 'max'
+        result[i, 1] = model.slim_optimize()
+    return result
+
+
+def _optimize(model: cobra.Model, reaction: str) -> numpy.ndarray:
+    with model as model:
+        return _envelope_points(model, [], reaction, numpy.zeros((1, 0)))[0]
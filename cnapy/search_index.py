@@ -0,0 +1,123 @@
+"""Indexed search over the reactions and metabolites of a model"""
+from typing import Dict, Set, Tuple
+
+import cobra
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i+3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    '''
+    Case insensitive substring search over the texts of keys.
+    Queries with at least three characters only check the keys that contain
+    all trigrams of the query, shorter queries check all texts.
+    '''
+
+    def __init__(self):
+        self.texts: Dict[str, str] = {}
+        self.postings: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __contains__(self, key: str):
+        return key in self.texts
+
+    def set(self, key: str, text: str):
+        self.remove(key)
+        text = text.lower()
+        self.texts[key] = text
+        for gram in trigrams(text):
+            self.postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key: str):
+        text = self.texts.pop(key, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            keys = self.postings[gram]
+            keys.discard(key)
+            if len(keys) == 0:
+                del self.postings[gram]
+
+    def search(self, query: str) -> Set[str]:
+        query = query.lower()
+        if len(query) < 3:
+            return {k for k, t in self.texts.items() if query in t}
+        grams = sorted(trigrams(query), key=lambda g: len(self.postings.get(g, ())))
+        candidates = self.postings.get(grams[0], set())
+        for gram in grams[1:]:
+            # checking the candidates is cheaper than intersecting large sets
+            if len(candidates) < 16 or 2 * len(candidates) > len(self.texts):
+                break
+            candidates = candidates & self.postings.get(gram, set())
+        return {k for k in candidates if query in self.texts[k]}
+
+
+def reaction_text(reaction: cobra.Reaction) -> str:
+    '''id, name, equation, gene rule and annotations, one per line'''
+    return "\n".join([reaction.id, reaction.name, reaction.build_reaction_string(),
+                      reaction.gene_reaction_rule]
+                     + [str(v) for v in reaction.annotation.values()])
+
+
+def metabolite_text(metabolite: cobra.Metabolite) -> str:
+    '''id, name, formula and annotations, one per line'''
+    return "\n".join([metabolite.id, metabolite.name, str(metabolite.formula or "")]
+                     + [str(v) for v in metabolite.annotation.values()])
+
+
+class ModelSearchIndex:
+    '''
+    Search indices for the reactions and metabolites of the project model.
+    Reactions and metabolites that were added, removed or renamed are picked
+    up before each search, other edits have to be reported with
+    update_reaction and update_metabolite.
+    '''
+
+    def __init__(self):
+        self.model = None
+        self.reactions = SearchIndex()
+        self.metabolites = SearchIndex()
+
+    def sync(self, model: cobra.Model):
+        if model is not self.model:
+            self.model = model
+            self.reactions = SearchIndex()
+            self.metabolites = SearchIndex()
+        _sync(self.reactions, model.reactions, reaction_text)
+        _sync(self.metabolites, model.metabolites, metabolite_text)
+
+    def update_reaction(self, reaction: cobra.Reaction, old_id: str = None):
+        if old_id is not None:
+            self.reactions.remove(old_id)
+        self.reactions.set(reaction.id, reaction_text(reaction))
+
+    def remove_reaction(self, reaction_id: str):
+        self.reactions.remove(reaction_id)
+
+    def update_metabolite(self, metabolite: cobra.Metabolite, old_id: str = None):
+        '''also updates the equations of the reactions of the metabolite'''
+        if old_id is not None:
+            self.metabolites.remove(old_id)
+        self.metabolites.set(metabolite.id, metabolite_text(metabolite))
+        for reaction in metabolite.reactions:
+            self.update_reaction(reaction)
+
+    def search(self, model: cobra.Model, query: str) -> Tuple[Set[str], Set[str]]:
+        '''ids of the matching reactions and metabolites'''
+        self.sync(model)
+        return (self.reactions.search(query), self.metabolites.search(query))
+
+
+def _sync(index: SearchIndex, items: cobra.DictList, text):
+    ids = {item.id for item in items}
+    if index.texts.keys() == ids:
+        return
+    for key in [k for k in index.texts if k not in ids]:
+        index.remove(key)
+    for item in items:
+        if item.id not in index:
+            index.set(item.id, text(item))
@@ -1,5 +1,9 @@
 ''' Tests '''
+import os
+
 import cobra
+import numpy
+import pytest
 
 import cnapy.core
 
@@ -8,3 +12,318 @@ def test_efm_computation():
     model = cobra.Model()
     scen_values = {}
     cnapy.core.efm_computation(model, scen_values, True)
+
+
+def test_lp_cache():
+    from cnapy.lp_cache import LPCache
+    model = cobra.Model()
+    a = cobra.Metabolite('A')
+    r1 = cobra.Reaction('R1', lower_bound=0, upper_bound=10)
+    r1.add_metabolites({a: 1})
+    r2 = cobra.Reaction('R2', lower_bound=0, upper_bound=1000)
+    r2.add_metabolites({a: -1})
+    model.add_reactions([r1, r2])
+    model.objective = 'R2'
+    lp_cache = LPCache()
+    assert cnapy.core.fba(None, lp_cache, lp_cache.snapshot(model, {})).objective_value == 10
+    solution = cnapy.core.fba(None, lp_cache, lp_cache.snapshot(model, {'R1': (0, 5)}))
+    assert solution.objective_value == 5
+    assert cnapy.core.fba(None, lp_cache, lp_cache.snapshot(model, {'R1': (0, 5)})) is solution
+    assert cnapy.core.fba(None, lp_cache, lp_cache.snapshot(model, {})).objective_value == 10
+    # an edit that keeps the number of reactions and metabolites
+    r1.add_metabolites({a: 1})
+    lp_cache.invalidate()
+    assert cnapy.core.fba(None, lp_cache, lp_cache.snapshot(model, {})).objective_value == 20
+
+
+def test_fva():
+    from cnapy.job_runner import Job
+    from cnapy.lp_cache import LPCache
+    model = cobra.Model()
+    a = cobra.Metabolite('A')
+    r1 = cobra.Reaction('R1', lower_bound=0, upper_bound=10)
+    r1.add_metabolites({a: 1})
+    r2 = cobra.Reaction('R2', lower_bound=-1000, upper_bound=1000)
+    r2.add_metabolites({a: -1})
+    model.add_reactions([r1, r2])
+    lp_cache = LPCache()
+    job = Job("FVA", cnapy.core.fva, lp_cache, lp_cache.snapshot(model, {'R1': (2, 10)}))
+    job.run()
+    assert job.result == {'R1': (2, 10), 'R2': (2, 10)}
+
+
+def test_production_envelope():
+    from cnapy.job_runner import Job
+    from cnapy.lp_cache import LPCache
+    from cnapy.phase_plane import production_envelope
+    model = cobra.Model()
+    a = cobra.Metabolite('A')
+    r1 = cobra.Reaction('R1', lower_bound=0, upper_bound=10)
+    r1.add_metabolites({a: 1})
+    r2 = cobra.Reaction('R2', lower_bound=0, upper_bound=6)
+    r2.add_metabolites({a: -1})
+    r3 = cobra.Reaction('R3', lower_bound=0, upper_bound=1000)
+    r3.add_metabolites({a: -1})
+    model.add_reactions([r1, r2, r3])
+    lp_cache = LPCache()
+    job = Job("Phase plane", production_envelope, lp_cache, lp_cache.snapshot(model, {}), 'R1', 'R2')
+    job.run()
+    (x, y_min, y_max) = job.result
+    assert x[0] == 0 and x[-1] == 10
+    assert all(y_max == numpy.minimum(x, 6))
+    assert all(y_min == 0)
+
+
+def test_flux_vector_storage():
+    from cnapy.flux_vector_container import FluxVectorContainer
+    fv_mat = numpy.array([[1, 0, 0, -2.5], [0, 0, 0, 0], [0, 3, 0, 1]])
+    reac_id = ['R1', 'R2', 'R3', 'R4']
+    for storage in ['dense', 'float32', 'csr', 'packed', 'auto']:
+        modes = FluxVectorContainer(fv_mat, reac_id, storage=storage)
+        assert len(modes) == 3
+        assert modes[0] == {'R1': 1, 'R4': -2.5}
+        assert modes[1] == {}
+        assert modes[2] == {'R2': 3, 'R4': 1}
+        assert numpy.array_equal(modes.rows([2, 0]), fv_mat[[2, 0]])
+        assert numpy.array_equal(modes.rows_sparse(slice(1, 3)).toarray(), fv_mat[1:3])
+    modes = FluxVectorContainer(fv_mat, reac_id, storage='packed')
+    packed = modes.fv_mat
+    modes.convert('packed')
+    assert modes.fv_mat is packed  # nothing to convert
+    for storage in ['csr', 'packed', 'dense', 'packed', 'csr', 'dense']:
+        modes.convert(storage)
+        assert modes.storage() == storage
+        assert numpy.array_equal(modes.rows(slice(None)), fv_mat)
+    assert [start for (start, _) in modes.chunks(max_memory=64)] == [0, 2]  # 2 rows of 4 doubles
+
+
+def test_mode_query():
+    from cnapy.flux_vector_container import FluxVectorContainer
+    from cnapy.mode_query import ModeQuery
+    fv_mat = numpy.array([[1, 0, 0, -2], [1, 1, 0, 0], [0, 3, 0, 1], [2, 0, 1, -1]])
+    query = ModeQuery(FluxVectorContainer(fv_mat, ['R1', 'R2', 'R3', 'R4']))
+    assert query.select('R1').tolist() == [0, 1, 3]
+    assert query.select('R1 !R2').tolist() == [0, 3]
+    assert query.select('R4<0 size<=2').tolist() == [0]
+    assert query.select('yield(R1/R4)>=1').tolist() == [3]
+
+
+def test_mode_statistics():
+    from cnapy.flux_vector_container import FluxVectorContainer
+    from cnapy.mode_statistics import (participation_frequency,
+                                       support_size_histogram,
+                                       yield_distribution)
+    fv_mat = numpy.array([[1, 0, 0, -2], [1, 1, 0, 0], [0, 3, 0, 1], [2, 0, 1, -1]])
+    modes = FluxVectorContainer(fv_mat, ['R1', 'R2', 'R3', 'R4'])
+    assert participation_frequency(modes, chunk_rows=3) == {
+        'R1': 0.75, 'R2': 0.5, 'R3': 0.25, 'R4': 0.75}
+    assert support_size_histogram(modes, chunk_rows=3).tolist() == [0, 0, 3, 1, 0]
+    (counts, _) = yield_distribution(modes, 'R1', 'R4', bins=2)
+    assert counts.tolist() == [2, 1]
+
+
+def test_mode_sort(tmp_path):
+    from cnapy.mode_sort import ModeWriter, deduplicate, sort_modes
+    fv_mat = numpy.array([[1, 1, 0], [0, 0, 1], [1, 1, 1], [0, 0, 1.0000000001]])
+    fname = str(tmp_path / "efms.bin")
+    with ModeWriter(fname, 3) as writer:
+        for row in fv_mat:
+            writer.append(row)
+    modes = sort_modes(fname, str(tmp_path / "sorted.bin"), ['R1', 'R2', 'R3'], max_memory=16)
+    assert numpy.array_equal(modes.fv_mat, fv_mat[[1, 3, 0, 2]])
+    modes = deduplicate(fname, str(tmp_path / "unique.bin"), ['R1', 'R2', 'R3'], decimals=6)
+    assert numpy.array_equal(modes.fv_mat, fv_mat[[1, 0, 2]])
+    # equal after rounding, but not before
+    fv_mat = numpy.array([[1, 2, 0], [0, 0, 1], [1, 2, 1e-12], [1 + 1e-12, 2, 0]])
+    fname = str(tmp_path / "close.bin")
+    with ModeWriter(fname, 3) as writer:
+        for row in fv_mat:
+            writer.append(row)
+    modes = deduplicate(fname, str(tmp_path / "close_unique.bin"), ['R1', 'R2', 'R3'])
+    assert numpy.array_equal(modes.fv_mat, fv_mat[[1, 0]])
+    modes = sort_modes(fname, str(tmp_path / "close_yield.bin"), ['R1', 'R2', 'R3'], key='yield',
+                       product='R2', substrate='R1', unique=True)
+    assert numpy.array_equal(modes.fv_mat, fv_mat[[0, 1]])
+    modes = sort_modes(fname, str(tmp_path / "close_input.bin"), ['R1', 'R2', 'R3'], key=None,
+                       unique=True, max_memory=48)
+    assert numpy.array_equal(modes.fv_mat, fv_mat[[0, 1]])
+
+
+def test_search_index():
+    from cnapy.search_index import ModelSearchIndex
+    model = cobra.Model()
+    a = cobra.Metabolite('glc_c', name='D-Glucose', formula='C6H12O6')
+    b = cobra.Metabolite('g6p_c', name='Glucose 6-phosphate')
+    r1 = cobra.Reaction('HEX1', name='Hexokinase')
+    r1.add_metabolites({a: -1, b: 1})
+    r1.gene_reaction_rule = 'b1234'
+    r2 = cobra.Reaction('EX_glc', name='Glucose exchange')
+    r2.add_metabolites({a: -1})
+    r2.annotation = {'sbo': 'SBO:0000627'}
+    model.add_reactions([r1, r2])
+    index = ModelSearchIndex()
+    assert index.search(model, 'glucose') == ({'EX_glc'}, {'glc_c', 'g6p_c'})
+    assert index.search(model, 'GLC_C') == ({'HEX1', 'EX_glc'}, {'glc_c'})
+    assert index.search(model, 'b123') == ({'HEX1'}, set())
+    assert index.search(model, '0627') == ({'EX_glc'}, set())
+    assert index.search(model, 'c6h1') == (set(), {'glc_c'})
+    r1.id = 'HEX2'
+    index.update_reaction(r1, 'HEX1')
+    assert index.search(model, 'hex') == ({'HEX2'}, set())
+    model.remove_reactions([r2])
+    assert index.search(model, 'glucose') == (set(), {'glc_c', 'g6p_c'})
+    # unreported changes that keep the number of reactions
+    r3 = cobra.Reaction('PGI', name='Glucose-6-phosphate isomerase')
+    r3.add_metabolites({b: -1})
+    model.add_reactions([r3])
+    model.remove_reactions([r1])
+    r3.id = 'PGI2'
+    assert index.search(model, 'isomerase') == ({'PGI2'}, set())
+    assert index.search(model, 'hex') == (set(), set())
+
+
+def test_coloring():
+    from cnapy.coloring import (heat_colors, onoff_colors, value_arrays,
+                                value_range)
+    scen_values = {'R1': (2.0, 2.0), 'R3': (0.0, 0.0)}
+    comp_values = {'R1': (1.0, 1.0), 'R2': (-4.0, 0.0), 'R4': 1.0}
+    (vl, vu) = value_arrays(['R1', 'R2', 'R3', 'R4', 'R5'], scen_values, comp_values, 3)
+    assert vl[:4].tolist() == [2.0, -4.0, 0.0, 1.0]
+    assert numpy.isnan(vl[4]) and numpy.isnan(vu[4])
+    (low, high) = value_range(scen_values, comp_values)
+    assert (low, high) == (-2.0, 2.0)
+    colors = heat_colors(vl[:4], vu[:4], low, high)
+    assert colors.tolist() == [0xff00ff00, 0xffff0000, 0xffffffff, 0xff7fff7f]
+    assert onoff_colors(vl[:4], vu[:4]).tolist() == [0xff00ff00, 0xff00ff00, 0xffff0000, 0xff00ff00]
+    colors = heat_colors(vl[:4], vu[:4], low, high, colormap="blue-red", scale="log")
+    assert colors.tolist()[:3] == [0xffff0000, 0xff0000ff, 0xffffffff]
+
+
+def mcs_test_model():
+    model = cobra.Model()
+    (s, a) = (cobra.Metabolite('S'), cobra.Metabolite('A'))
+    reactions = {'EX_S': {s: 1}, 'R1': {s: -1, a: 1}, 'R2': {s: -1, a: 1}, 'EX_A': {a: -1}}
+    for (r_id, stoichiometry) in reactions.items():
+        r = cobra.Reaction(r_id, lower_bound=0, upper_bound=10)
+        r.add_metabolites(stoichiometry)
+        model.add_reactions([r])
+    target = numpy.array([[0, 0, 0, -1.0]])  # EX_A >= 1
+    return (model, [(target, numpy.array([-1.0]))])
+
+
+def test_mcs_enumeration():
+    from cnapy.job_runner import Job
+    from cnapy.mcs_enumeration import enumerate_mcs
+    (model, targets) = mcs_test_model()
+    job = Job("MCS", enumerate_mcs, model, targets, None, 1, 3)
+    found = []
+    job.partialResult.connect(found.extend)
+    job.run()
+    assert sorted(job.result) == [('EX_A',), ('EX_S',), ('R1', 'R2')]
+    assert found == job.result
+
+
+def test_mcs_checkpoint(tmp_path):
+    from cnapy.job_runner import Job
+    from cnapy.mcs_enumeration import enumerate_mcs, prune_checkpoints
+    (model, targets) = mcs_test_model()
+    job = Job("MCS", enumerate_mcs, model, targets, None, 1, 3, 2, None, False, str(tmp_path))
+    job.run()
+    assert len(job.result) == 2
+    job = Job("MCS", enumerate_mcs, model, targets, None, 1, 3, float('inf'), None, False, str(tmp_path))
+    found = []
+    job.partialResult.connect(found.append)
+    job.run()
+    assert sorted(job.result) == [('EX_A',), ('EX_S',), ('R1', 'R2')]
+    assert len(found) == 2  # the saved cut sets and the remaining one
+    (tmp_path / "old.json").write_text("{}")
+    os.utime(tmp_path / "old.json", (0, 0))
+    prune_checkpoints(str(tmp_path), 0, keep=str(next(tmp_path.glob("[0-9a-f]*.json"))))
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_mcs_enumeration_parallel():
+    from cnapy.job_runner import Job
+    from cnapy.mcs_enumeration import enumerate_mcs_parallel
+    (model, targets) = mcs_test_model()
+    # without a sequential run first so that the partitions have to find all cut sets
+    job = Job("MCS", enumerate_mcs_parallel, model, targets, None, 1, 3,
+              float('inf'), None, False, 2, prerun_time=0)
+    job.run()
+    assert sorted(job.result) == [('EX_A',), ('EX_S',), ('R1', 'R2')]
+
+
+def test_mcs_partition_by_size():
+    from cnapy.mcs_enumeration import _init_worker, _worker_partition, cut_candidates
+    (model, targets) = mcs_test_model()
+    shared = []
+    _init_worker(model, shared, cut_candidates(model, []))
+    # the cut sets of size 2 without the smaller ones of the other partition
+    assert _worker_partition((targets, [], 1, False, [], None, 2, 2, True, None)) == 1
+    assert shared == [(1, 2)]
+
+
+def test_network_compression():
+    from cnapy.network_compression import NetworkCompression
+    (model, targets) = mcs_test_model()
+    for r in model.reactions:
+        r.upper_bound = 1000  # parallel reactions with capacity limits are not merged
+    # EX_S, EX_A and the merged parallel reactions R1, R2 are coupled
+    compression = NetworkCompression(model, targets)
+    assert len(compression.model.reactions) == 1
+    (mat, _) = compression.compress_regions(targets)[0]
+    assert mat.toarray().tolist() == [[-1.0]]
+    lumped = compression.model.reactions[0].id
+    assert sorted(compression.expand([(lumped,)])) == [('EX_A',), ('EX_S',), ('R1', 'R2')]
+    assert sorted(compression.expand([(lumped,)], max_mcs_size=1)) == [('EX_A',), ('EX_S',)]
+    compression = NetworkCompression(model, targets, no_cuts=['R2'])
+    assert sorted(compression.expand([(lumped,)])) == [('EX_A',), ('EX_S',)]
+
+
+def test_cut_set_container(tmp_path):
+    from cnapy.cut_set_container import CutSetContainer
+    from cnapy.mode_query import ModeQuery
+    reac_id = ['R1', 'R2', 'R3', 'R4']
+    # reaction, cut set and value of each entry as in the legacy results
+    mcs = CutSetContainer.from_triples([3, 0, 1, 0, 2], [0, 1, 1, 2, 2], [0, 0, 1, 0, 0], reac_id)
+    assert len(mcs) == 3
+    assert mcs[1] == {'R1': 0, 'R2': 1}
+    mcs.extend([('R3',), ('R2', 'R1')])
+    assert len(mcs) == 5
+    assert mcs[3] == {'R3': 0}
+    assert mcs.containing('R1').tolist() == [1, 2, 4]
+    assert mcs.subsets_of(['R1', 'R2']).tolist() == [1, 4]
+    assert mcs.supersets_of(['R1']).tolist() == [1, 2, 4]
+    assert mcs.minimal().tolist() == [True, True, False, True, False]
+    query = ModeQuery(mcs)
+    assert query.select('R1 !R3 size<=2').tolist() == [1, 4]
+    assert query.select('R2 size<=2').tolist() == [1, 4]
+    mcs.extend([('R2', 'R3')])  # while the cut sets are computed
+    assert query.select('R2 size<=2').tolist() == [1, 4, 5]
+    with pytest.raises(ValueError):
+        query.select('R1=0')  # the rows only mark the reactions of the cut sets
+    fname = str(tmp_path / "mcs.npz")
+    mcs.save(fname)
+    loaded = CutSetContainer(fname)
+    assert [loaded[i] for i in range(len(loaded))] == [mcs[i] for i in range(len(mcs))]
+    model = cobra.Model()
+    for (r_id, rule) in zip(reac_id, ['g1', 'g1 or g2', 'g3', 'g1 and g4']):
+        r = cobra.Reaction(r_id)
+        model.add_reactions([r])
+        r.gene_reaction_rule = rule
+    assert mcs.disabled_by_genes(model, ['g1', 'g3']).tolist() == [0, 2, 3]
+
+
+def test_read_efms_from_bin(tmp_path):
+    from cnapy.efmtool_extern import read_efms_from_bin
+    efms = numpy.arange(15, dtype=float).reshape(5, 3) - 7
+    fname = str(tmp_path / 'efms.bin')
+    with open(fname, 'wb') as fh:
+        numpy.array([5], dtype='>i8').tofile(fh)
+        numpy.array([3], dtype='>i4').tofile(fh)
+        fh.write(b'\0')
+        efms.astype('>d').tofile(fh)
+    assert numpy.array_equal(read_efms_from_bin(fname, chunk_bytes=16), efms)
+    memmap = read_efms_from_bin(fname, str(tmp_path / 'efms.mmap'))
+    assert memmap.dtype == numpy.dtype('>d')
+    assert numpy.array_equal(memmap, efms)
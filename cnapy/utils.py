@@ -46,3 +46,50 @@ class SignalThrottler(QObject):
     triggered = Signal()
     timeoutChanged = Signal(int)
     timerTypeChanged = Signal(Qt.TimerType)
+
+
+# what has changed since the last refresh of the window
+SCENARIO = "scenario"
+COMP_VALUES = "comp_values"
+MODEL = "model"
+MODES = "modes"
+MODE_VALUES = "mode_values"
+MAPS = "maps"
+ALL_CHANGES = (SCENARIO, COMP_VALUES, MODEL, MODES, MAPS)
+
+
+class RefreshScheduler(QObject):
+    '''
+    Collects what has changed and emits triggered once per event loop turn
+    with all changes and map names that were requested in the meantime.
+    '''
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.emit_triggered)
+        self.changes = set()
+        self.maps = set()
+
+    def request(self, *changes, map_name: str = None):
+        self.changes.update(changes)
+        if map_name is not None:
+            self.maps.add(map_name)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        '''Emit the pending changes right away'''
+        if self.timer.isActive():
+            self.timer.stop()
+            self.emit_triggered()
+
+    def emit_triggered(self):
+        (changes, maps) = (self.changes, self.maps)
+        self.changes = set()
+        self.maps = set()
+        self.triggered.emit(changes, maps)
+
+    triggered = Signal(object, object)